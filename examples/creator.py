@@ -4,11 +4,10 @@ import argparse
 import datetime as dti
 import logging
 import sys
-from typing import List, Union, no_type_check
+from typing import Dict, List, Union, no_type_check
 
 import suhteita
 import suhteita.cli as cli
-import suhteita.ticket_system_actions as actions
 from suhteita import (
     BASE_URL,
     IDENTITY,
@@ -22,6 +21,7 @@ from suhteita import (
     __version__ as version,
     log,
 )
+from suhteita.scenario import Executor, load_definition
 from suhteita.store import Store
 
 APPLICATION_FOR_LOG = 'CREATOR'
@@ -68,6 +68,12 @@ def setup_scenario(options: argparse.Namespace) -> object:
     return setup
 
 
+@no_type_check
+def seed_token(cfg: object, store: object) -> Dict[str, object]:
+    """Bind the secret beyond the setup."""
+    return {'token': TOKEN}
+
+
 def main(argv: Union[List[str], None] = None) -> int:
     """Drive the creation."""
     argv = sys.argv[1:] if argv is None else argv
@@ -80,9 +86,6 @@ def main(argv: Union[List[str], None] = None) -> int:
 
     cfg = setup_scenario(options=options)
 
-    # Belt and braces:
-    has_failures = False
-
     # Here we start the timer for the session:
     start_time = dti.datetime.now(tz=dti.timezone.utc)
     start_ts = start_time.strftime(suhteita.TS_FORMAT_PAYLOADS)
@@ -92,46 +95,14 @@ def main(argv: Union[List[str], None] = None) -> int:
         'project': cfg.target_project,
         'scenario': cfg.scenario,
         'identity': cfg.identity,
+        'definition': 'creator',
         'start_time': start_time,
     }
     store = Store(context=context, setup=cfg, folder_path=cfg.storage_path)
     log.info(f'# Starting 4-steps creator test execution at at ({start_ts})')
-    log.info('- Step <01> LOGIN')
-    clk, service = actions.login(cfg.target_url, cfg.user, password=TOKEN, is_cloud=cfg.is_cloud)
-    log.info(f'^ Connected to upstream service; CLK={clk}')
-    store.add('LOGIN', True, clk)
-
-    log.info('- Step <02> SERVER_INFO')
-    clk, server_info = actions.get_server_info(service)
-    log.info(f'^ Retrieved upstream server info cf. [SRV]; CLK={clk}')
-    store.add('SERVER_INFO', True, clk, str(server_info))
-
-    log.info('- Step <03> PROJECTS')
-    clk, projects = actions.get_all_projects(service)
-    log.info(f'^ Retrieved {len(projects)} unarchived projects; CLK={clk}')
-    store.add('PROJECTS', True, clk, f'count({len(projects)})')
-
-    proj_env_ok = False
-    if cfg.target_project:
-        proj_env_ok = any((cfg.target_project == project['key'] for project in projects))
-
-    if not proj_env_ok:
-        log.error('Belt and braces - verify project selection:')
-        log.info(suhteita.json.dumps(sorted([project['key'] for project in projects]), indent=2))
-        return 1
-
-    first_proj_key = cfg.target_project if proj_env_ok else projects[0]['key']
-    log.info(
-        f'Verified target project from request ({cfg.target_project}) to be'
-        f' {"" if proj_env_ok else "not "}present and set target project to ({first_proj_key})'
-    )
-
-    log.info('- Step <04> CREATE_ISSUE')
-    clk, c_key = actions.create_issue(
-        service, first_proj_key, cfg.ts, description=f'{cfg.c_rand}\n{cfg.desc_core}\nCAUSALITY={cfg.node_indicator}'
-    )
-    log.info(f'^ Created original ({c_key}); CLK={clk}')
-    store.add('CREATE_ISSUE', True, clk, 'original')
+    code, has_failures = Executor(load_definition(context['definition']), seed_token)(cfg, store)
+    if code:
+        return code
 
     # Here we stop the timer for the session:
     end_time = dti.datetime.now(tz=dti.timezone.utc)
@@ -140,10 +111,6 @@ def main(argv: Union[List[str], None] = None) -> int:
     log.info(f'Execution of 4-steps creator test took {(end_time - start_time)} h:mm:ss.uuuuuu')
     log.info('-' * 84)
 
-    log.info('# References:')
-    log.info(f'[SRV]          Server info is ({server_info})')
-    log.info('-' * 84)
-
     log.info('Dumping records to store...')
     store.dump(end_time=end_time, has_failures=has_failures)
     log.info('-' * 84)
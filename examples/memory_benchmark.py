@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+"""Benchmark the memory held by the events of a run in plain dicts versus the compact event buffer."""
+import gc
+import sys
+import time
+import tracemalloc
+from typing import List
+
+from suhteita.buffer import EventBuffer
+from suhteita.clock import Clocking
+
+EVENTS = 1_000_000
+USERS = 100
+LABELS = ('LOGIN', 'CREATE_ISSUE', 'LOAD_ISSUE', 'ADD_COMMENT', 'SET_ISSUE_STATUS', 'GET_ISSUE_STATUS')
+
+
+def event(n: int) -> dict:
+    """Mimic the events of the store for a closed model run of many virtual users."""
+    clk = Clocking(1_700_000_000_000_000_000 + n * 1_000_000, 123_456_000, 1_700_000_000_123_456_000 + n * 1_000_000)
+    return {
+        'rank': n // USERS + 1,
+        'label': LABELS[n % len(LABELS)],
+        'ok': True,
+        'start_ts': clk.start_ns,
+        'duration_usecs': clk.duration_usecs(),
+        'end_ts': clk.end_ns,
+        'comment': '' if n % 10 else f'XYZ-{n}',
+        'user': f'u{n % USERS + 1:04d}',
+        'step': n % len(LABELS) + 1,
+    }
+
+
+def held_bytes(container) -> tuple:
+    """Peak traced bytes and wall clock seconds for filling the container with the events."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for n in range(EVENTS):
+        container.append(event(n))
+    secs = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, secs
+
+
+def main(argv: List[str]) -> int:
+    """Print a markdown table of the memory held after recording the events in either form."""
+    print(f'| Buffer ({EVENTS} events) | Held [MiB] | Bytes per event | Fill [s] |')
+    print('|:------------------------|-----------:|----------------:|---------:|')
+    for name, factory in (('list of dicts', list), ('EventBuffer', EventBuffer)):
+        held, secs = held_bytes(factory())
+        print(f'| {name} | {held / 2**20 :.1f} | {held / EVENTS :.0f} | {secs :.2f} |')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
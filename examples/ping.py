@@ -4,11 +4,10 @@ import argparse
 import datetime as dti
 import logging
 import sys
-from typing import List, Union, no_type_check
+from typing import Dict, List, Union, no_type_check
 
 import suhteita
 import suhteita.cli as cli
-import suhteita.ticket_system_actions as actions
 from suhteita import (
     BASE_URL,
     IDENTITY,
@@ -22,6 +21,7 @@ from suhteita import (
     __version__ as version,
     log,
 )
+from suhteita.scenario import Executor, load_definition
 from suhteita.store import Store
 
 APPLICATION_FOR_LOG = 'PING'
@@ -62,6 +62,12 @@ def setup_scenario(options: argparse.Namespace) -> object:
     return setup
 
 
+@no_type_check
+def seed_token(cfg: object, store: object) -> Dict[str, object]:
+    """Bind the secret beyond the setup."""
+    return {'token': TOKEN}
+
+
 def main(argv: Union[List[str], None] = None) -> int:
     """Drive the ping."""
     argv = sys.argv[1:] if argv is None else argv
@@ -74,9 +80,6 @@ def main(argv: Union[List[str], None] = None) -> int:
 
     cfg = setup_scenario(options=options)
 
-    # Belt and braces:
-    has_failures = False
-
     # Here we start the timer for the session:
     start_time = dti.datetime.now(tz=dti.timezone.utc)
     start_ts = start_time.strftime(suhteita.TS_FORMAT_PAYLOADS)
@@ -86,19 +89,14 @@ def main(argv: Union[List[str], None] = None) -> int:
         'project': cfg.target_project,
         'scenario': cfg.scenario,
         'identity': cfg.identity,
+        'definition': 'ping',
         'start_time': start_time,
     }
     store = Store(context=context, setup=cfg, folder_path=cfg.storage_path)
     log.info(f'# Starting 2-steps ping test execution at at ({start_ts})')
-    log.info('- Step <01> LOGIN')
-    clk, service = actions.login(cfg.target_url, cfg.user, password=suhteita.TOKEN, is_cloud=cfg.is_cloud)
-    log.info(f'^ Connected to upstream service; CLK={clk}')
-    store.add('LOGIN', True, clk)
-
-    log.info('- Step <02> SERVER_INFO')
-    clk, server_info = actions.get_server_info(service)
-    log.info(f'^ Retrieved upstream server info cf. [SRV]; CLK={clk}')
-    store.add('SERVER_INFO', True, clk, str(server_info))
+    code, has_failures = Executor(load_definition(context['definition']), seed_token)(cfg, store)
+    if code:
+        return code
 
     # Here we stop the timer for the session:
     end_time = dti.datetime.now(tz=dti.timezone.utc)
@@ -107,10 +105,6 @@ def main(argv: Union[List[str], None] = None) -> int:
     log.info(f'Execution of 2-steps ping test took {(end_time - start_time)} h:mm:ss.uuuuuu')
     log.info('-' * 84)
 
-    log.info('# References:')
-    log.info(f'[SRV]          Server info is ({server_info})')
-    log.info('-' * 84)
-
     log.info('Dumping records to store...')
     store.dump(end_time=end_time, has_failures=has_failures)
     log.info('-' * 84)
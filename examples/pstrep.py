@@ -1,4 +1,5 @@
 """ping store grep."""
+
 import datetime as dti
 import json
 import pathlib
@@ -6,12 +7,12 @@ import sys
 
 import pandas as pd
 
+from suhteita.scenario import load_definition
+from suhteita.store import load_store
+
 pd.options.display.width = None
 
-scenario_labels_sequence = (  # Labels in scenario order:
-    'LOGIN',
-    'SERVER_INFO',
-)
+scenario_labels_sequence = tuple(load_definition('ping').labels())  # Labels in scenario order
 scenario_labels_set = set(sorted(scenario_labels_sequence))
 
 node_map = {
@@ -37,8 +38,7 @@ nodes = {}
 targets = set()
 for name in sys.argv[1:]:
     path = pathlib.Path(name)
-    with open(path, 'rt', encoding=ENCODING) as handle:
-        db = json.load(handle)
+    db = load_store(path)  # Plain or compressed (e.g. .json.gz) store files alike
     scenario = db['_meta']['scenario']
     target_class = db['_meta']['mode']
     client_node_id = db['_meta']['node_indicator']
@@ -1,7 +1,7 @@
 #! /usr/bin/env python
 """Profile the scenario data to prepare graphing and root cause analysis."""
+
 import copy
-import datetime as dti
 import glob
 import json
 import pathlib
@@ -9,59 +9,19 @@ import sys
 from statistics import fmean, geometric_mean, harmonic_mean, median_high, median_low, quantiles, stdev, variance
 from typing import Any
 
+from suhteita.archive import load_runs
+from suhteita.clock import NS_PER_SEC, NS_PER_USEC, format_ts, ts_ns
+from suhteita.histogram import DEFAULT_PERCENTILES, Histogram, merged, summary
+from suhteita.projects import CACHED_SUFFIX
+from suhteita.scenario import DEFAULT_DEFINITION, load_definition
+
 ENCODING = 'utf-8'
 HALF_SECOND_OF_USECS = 500_000
 SLOWNESS_SECS = 3 * HALF_SECOND_OF_USECS / 1_000_000
 SCENARIOS = ('single', 'twins')
-PARSE_TS_FORMAT = '%Y-%m-%d %H:%M:%S.%f UTC'
-STEP_TA_MAP = {
-    1: 'LOGIN',
-    2: 'SERVER_INFO',
-    3: 'PROJECTS',
-    4: 'CREATE_ISSUE',
-    5: 'ISSUE_EXISTS',
-    6: 'CREATE_ISSUE',
-    7: 'ISSUE_EXISTS',
-    8: 'EXECUTE_JQL',
-    9: 'AMEND_ISSUE_DESCRIPTION',
-    10: 'ADD_COMMENT',
-    11: 'UPDATE_ISSUE_FIELD',
-    12: 'UPDATE_ISSUE_FIELD',
-    13: 'CREATE_DUPLICATES_ISSUE_LINK',
-    14: 'GET_ISSUE_STATUS',
-    15: 'SET_ISSUE_STATUS',
-    16: 'SET_ISSUE_STATUS',
-    17: 'GET_ISSUE_STATUS',
-    18: 'ADD_COMMENT',
-    19: 'SET_ORIGINAL_ESTIMATE',
-    20: 'GET_ISSUE_STATUS',
-    21: 'SET_ISSUE_STATUS',
-    22: 'GET_ISSUE_STATUS',
-    23: 'CREATE_COMPONENT',
-    24: 'RELATE_ISSUE_TO_COMPONENT',
-    25: 'LOAD_ISSUE',
-    26: 'ADD_COMMENT',
-    27: 'ADD_COMMENT',
-}
-
-TA_MMAP = {
-    'ADD_COMMENT': [10, 18, 26, 27],
-    'AMEND_ISSUE_DESCRIPTION': [9],
-    'CREATE_COMPONENT': [23],
-    'CREATE_DUPLICATES_ISSUE_LINK': [13],
-    'CREATE_ISSUE': [4, 6],
-    'EXECUTE_JQL': [8],
-    'GET_ISSUE_STATUS': [14, 17, 20, 22],
-    'ISSUE_EXISTS': [5, 7],
-    'LOAD_ISSUE': [25],
-    'LOGIN': [1],
-    'PROJECTS': [3],
-    'RELATE_ISSUE_TO_COMPONENT': [24],
-    'SERVER_INFO': [2],
-    'SET_ISSUE_STATUS': [15, 16, 21],
-    'SET_ORIGINAL_ESTIMATE': [19],
-    'UPDATE_ISSUE_FIELD': [11, 12],
-}
+DEFINITION = load_definition(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DEFINITION)
+STEP_TA_MAP = DEFINITION.step_map()
+TA_MMAP = DEFINITION.label_map()
 
 STATS = {
     'geometric_mean': None,
@@ -107,10 +67,118 @@ benchmark: dict[str, int | str | list[int, float, str] | ReportDict] = {
     'probes': {},
     'targets': {},
 }
-for path in sorted(glob.glob(sys.argv[1])):
-    with open(path, 'rt', encoding=ENCODING) as handle:
-        profile = json.load(handle)
+histograms_per_target: dict[str, dict[str, Histogram]] = {}  # Merged from the stores without replaying events
+phase_histograms_per_target: dict[str, dict[str, Histogram]] = {}  # Per label and HTTP phase (e.g. LOGIN / ttfb)
+
+
+def describe(data: list[int]) -> dict[str, Any]:
+    """Derive the statistics of the latency samples."""
+    stats = copy.deepcopy(STATS)
+    qs = quantiles(data, n=100, method='inclusive')
+    stats['geometric_mean'] = geometric_mean(data)
+    stats['harmonic_mean'] = harmonic_mean(data)
+    stats['max'] = max(data)
+    stats['median_high'] = median_high(data)
+    stats['median_low'] = median_low(data)
+    stats['mean'] = fmean(data)
+    stats['min'] = min(data)
+    stats['quantiles'] = {
+        '01%': qs[0],
+        '02%': qs[1],
+        '05%': qs[4],
+        '10%': qs[9],
+        '20%': qs[19],
+        '25%': qs[24],
+        '33%': qs[32],
+        '50%': qs[49],
+        '67%': qs[66],
+        '75%': qs[74],
+        '80%': qs[79],
+        '90%': qs[89],
+        '95%': qs[94],
+        '98%': qs[97],
+        '99%': qs[98],
+    }
+    stats['stddev'] = stdev(data)
+    stats['variance'] = variance(data)
+    stats['N'] = len(data)
+    return stats
+
+
+def print_histogram_table(title: str, histograms: dict[str, Histogram]) -> None:
+    """Print the markdown table of the percentiles per label from the merged histograms."""
+    print(f'#### {title}')
+    print()
+    head = ['Transaction \\ Aspect', 'N', *(f'Q({point:g}%)' for point in DEFAULT_PERCENTILES), 'max']
+    print(f'| {" | ".join(head)} |')
+    print(f'|:----|{":|".join("-----" for _ in head[1:])}:|')
+    for row in summary(histograms):
+        print(f'| {" | ".join(str(e) for e in row)} |')
+    print()
+
+
+def print_stats_table(title: str, stats_per_label: dict[str, dict[str, Any]]) -> None:
+    """Print the markdown table of the transaction statistics per label."""
+    print(f'#### {title}')
+    print()
+    aspects = [
+        'min',
+        'Q(1%)',
+        'Q(2%)',
+        'Q(5%)',
+        'Q(10%)',
+        'Q(20%)',
+        'Q(25%)',
+        'median',
+        'mean',
+        'stddev',
+        'Q(75%)',
+        'Q(80%)',
+        'Q(90%)',
+        'Q(95%)',
+        'Q(98%)',
+        'Q(99%)',
+        'max',
+        'N',
+    ]
+    # Definition first (answers without request, e.g. PROJECT_EXISTS_CACHED, right after their step) then the rest:
+    steps = [qualified for label in TA_MMAP for qualified in (label, f'{label}{CACHED_SUFFIX}')]
+    labels = [*steps, *sorted(set(stats_per_label) - set(steps))]
+    ta_stats_table = {
+        'head': ['Transaction \\ Aspect'] + [aspect for aspect in aspects],
+        'body': {label: [] for label in labels if stats_per_label.get(label, {}).get('N')},  # Only described ones
+    }
+    for label in ta_stats_table['body']:
+        ta_stats = stats_per_label[label]
+        ta_stats_table['body'][label].append(ta_stats['min'])
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['01%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['02%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['05%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['10%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['20%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['25%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['median_low'], 0)))
+        ta_stats_table['body'][label].append(round(ta_stats['mean'], 1))
+        ta_stats_table['body'][label].append(round(ta_stats['stddev'], 2))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['75%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['80%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['90%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['95%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['98%'], 0)))
+        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['99%'], 0)))
+        ta_stats_table['body'][label].append(ta_stats['max'])
+        ta_stats_table['body'][label].append(ta_stats['N'])
 
+    print(f'| {" | ".join(ta_stats_table["head"])} |')
+    print(f'|:----|{":|".join("-----" for _ in ta_stats_table["head"][1:])}:|')
+    for row_head, row_data in ta_stats_table['body'].items():
+        print(f'| {row_head} | ', end='')
+        print(f'{" | ".join(str(e) for e in row_data)} |')
+    print()
+
+
+# Store files, SQLite databases, and columnar archives (cf. suhteita.archive) alike - the events carry nanoseconds:
+for name, profile in load_runs(sorted(glob.glob(sys.argv[1]))):
     meta = profile['_meta']
 
     scenario = meta['scenario']
@@ -129,7 +197,7 @@ for path in sorted(glob.glob(sys.argv[1])):
 
     ok = not (meta['has_failures_declared'] or meta['has_failures_detected'])
     start_ts_str = meta['start_ts']
-    total_start_ts = dti.datetime.strptime(start_ts_str, PARSE_TS_FORMAT)
+    total_start_ns = meta.get('start_ns') or ts_ns(start_ts_str)
     end_ts_str = meta['end_ts']
     total_secs = meta['total_secs']
 
@@ -142,6 +210,10 @@ for path in sorted(glob.glob(sys.argv[1])):
             'flavors': [],
             'transaction_stats': {ta: copy.deepcopy(STATS) for ta in TA_MMAP},
             'transaction_samples': {ta: [] for ta in TA_MMAP},
+            'transaction_stats_corrected': {ta: copy.deepcopy(STATS) for ta in TA_MMAP},
+            'transaction_samples_corrected': {ta: [] for ta in TA_MMAP},
+            'stage_stats': {},
+            'stage_samples': {},
             'first_start_ts': start_ts_str,
             'last_end_ts': end_ts_str,
             'sequence_count': 0,
@@ -177,26 +249,34 @@ for path in sorted(glob.glob(sys.argv[1])):
         rank = event['rank']
         label = event['label']
         ok = event['ok']
-        start_ts = dti.datetime.strptime(event['start_ts'], PARSE_TS_FORMAT)
-        end_ts = dti.datetime.strptime(event['end_ts'], PARSE_TS_FORMAT)
-        start_rel = start_ts - total_start_ts
-        end_rel = end_ts - total_start_ts
-        step_dt = end_ts - start_ts
+        start_ns, end_ns = event['start_ns'], event['end_ns']
         # duration_usecs = event['duration_usecs']
-        dt_usecs = 1_000_000 * step_dt.seconds + step_dt.microseconds
+        dt_usecs = (end_ns - start_ns) // NS_PER_USEC
         duty_secs += dt_usecs
         report['trace'].append(
             {
-                'step': rank,
+                'step': event.get('step', rank),  # Concurrent steps record out of order
                 'label': label,
                 'duration_usecs': dt_usecs,
                 'ok': ok,
-                'start_rel': start_rel.total_seconds(),
-                'start_ts': event['start_ts'],
-                'end_rel': end_rel.total_seconds(),
+                'start_rel': (start_ns - total_start_ns) / NS_PER_SEC,
+                'start_ts': format_ts(start_ns),
+                'end_rel': (end_ns - total_start_ns) / NS_PER_SEC,
             }
         )
-        benchmark['targets'][target]['transaction_samples'][label].append(dt_usecs)  # noqa
+        # Operations split off the steps (e.g. GET_ISSUE_TRANSITIONS) carry labels beyond the definition:
+        benchmark['targets'][target]['transaction_samples'].setdefault(label, []).append(dt_usecs)  # noqa
+        # Open model runs record the latency from the intended start (coordinated omission corrected):
+        corrected_usecs = event.get('corrected_usecs', dt_usecs)
+        benchmark['targets'][target]['transaction_samples_corrected'].setdefault(label, []).append(corrected_usecs)
+        # Load shape runs tag the events with the stage (ramp-up, plateau, spike, ...) they were recorded in:
+        if 'stage' in event:
+            stage_samples = benchmark['targets'][target]['stage_samples'].setdefault(event['stage'], {})
+            stage_samples.setdefault(label, []).append(corrected_usecs)
+        # Steps that sent requests carry the summed phases (dns, connect, tls, ttfb, transfer) - archives keep none:
+        for phase, phase_usecs in event.get('phases', {}).items():
+            key = f'{label} / {phase.removesuffix("_usecs")}'
+            phase_histograms_per_target.setdefault(target, {}).setdefault(key, Histogram()).record(phase_usecs)
 
     report['duty_secs'] = duty_secs / 1.0e6
     duty_cycle_percent = 100 * report['duty_secs'] / total_secs
@@ -223,6 +303,9 @@ for path in sorted(glob.glob(sys.argv[1])):
     if benchmark['targets'][target]['last_end_ts'] < end_ts_str:
         benchmark['targets'][target]['last_end_ts'] = end_ts_str
 
+    for label, histogram in merged([meta]).items():
+        histograms_per_target.setdefault(target, {}).setdefault(label, Histogram()).merge(histogram)
+
     benchmark['targets'][target]['sequence_count'] += 1
     benchmark['targets'][target]['sequence_ok_count'] += 1 if ok else 0
     benchmark['targets'][target]['zip_me_start_ts'].append(start_ts_str)
@@ -251,9 +334,9 @@ for path in sorted(glob.glob(sys.argv[1])):
                 'ta_secs': event['duration_usecs'] / 1_000_000,
                 'label': event['label'],
                 'step': event['step'],
-                'day_tag': total_start_ts.strftime('%Y-%m-%d'),
-                'month_tag': total_start_ts.strftime('%Y-%m'),
-                'year': total_start_ts.year,
+                'day_tag': start_ts_str[:10],
+                'month_tag': start_ts_str[:7],
+                'year': int(start_ts_str[:4]),
                 'sequence_start_ts': start_ts_str,
                 'event_start_ts': event['start_ts'],
                 'start_rel': event['start_rel'],
@@ -283,45 +366,22 @@ for path in sorted(glob.glob(sys.argv[1])):
             file=sys.stderr,
         )
 
-    report_name = pathlib.Path(path).name
+    report_name = pathlib.Path(name).name
     with open(pathlib.Path(pathlib.Path('out') / report_name), 'wt', encoding=ENCODING) as handle:
         json.dump(report, handle, indent=2)
 
-# benchmark['targets'][target]['transaction_samples'][label]
 for target in benchmark['targets']:
     tg = benchmark['targets'][target]
     print(target)
     for label in tg['transaction_samples']:
-        data = tg['transaction_samples'][label]
-        # print(f'- {label} -> {data}')
-        qs = quantiles(data, n=100, method='inclusive')
-        benchmark['targets'][target]['transaction_stats'][label]['geometric_mean'] = geometric_mean(data)
-        benchmark['targets'][target]['transaction_stats'][label]['harmonic_mean'] = harmonic_mean(data)
-        benchmark['targets'][target]['transaction_stats'][label]['max'] = max(data)
-        benchmark['targets'][target]['transaction_stats'][label]['median_high'] = median_high(data)
-        benchmark['targets'][target]['transaction_stats'][label]['median_low'] = median_low(data)
-        benchmark['targets'][target]['transaction_stats'][label]['mean'] = fmean(data)
-        benchmark['targets'][target]['transaction_stats'][label]['min'] = min(data)
-        benchmark['targets'][target]['transaction_stats'][label]['quantiles'] = {
-            '01%': qs[0],
-            '02%': qs[1],
-            '05%': qs[4],
-            '10%': qs[9],
-            '20%': qs[19],
-            '25%': qs[24],
-            '33%': qs[32],
-            '50%': qs[49],
-            '67%': qs[66],
-            '75%': qs[74],
-            '80%': qs[79],
-            '90%': qs[89],
-            '95%': qs[94],
-            '98%': qs[97],
-            '99%': qs[98],
+        if len(tg['transaction_samples'][label]) < 2:  # E.g. steps always answered from the catalog
+            continue
+        tg['transaction_stats'][label] = describe(tg['transaction_samples'][label])
+        tg['transaction_stats_corrected'][label] = describe(tg['transaction_samples_corrected'][label])
+    for stage, samples_per_label in tg['stage_samples'].items():
+        tg['stage_stats'][stage] = {
+            label: describe(samples) for label, samples in samples_per_label.items() if len(samples) > 1
         }
-        benchmark['targets'][target]['transaction_stats'][label]['stddev'] = stdev(data)
-        benchmark['targets'][target]['transaction_stats'][label]['variance'] = variance(data)
-        benchmark['targets'][target]['transaction_stats'][label]['N'] = len(data)
 
 with open(pathlib.Path('out') / 'benchmark.json', 'wt', encoding=ENCODING) as handle:
     json.dump(benchmark, handle, indent=2)
@@ -418,58 +478,13 @@ for target in targets:
         f' (taking longer than {benchmark["slow_means_more_than_secs"]} seconds).'
     )
     print()
-    print('#### Transaction Statistics')
-    print()
-    aspects = [
-        'min',
-        'Q(1%)',
-        'Q(2%)',
-        'Q(5%)',
-        'Q(10%)',
-        'Q(20%)',
-        'Q(25%)',
-        'median',
-        'mean',
-        'stddev',
-        'Q(75%)',
-        'Q(80%)',
-        'Q(90%)',
-        'Q(95%)',
-        'Q(98%)',
-        'Q(99%)',
-        'max',
-        'N',
-    ]
-    ta_stats_table = {
-        'head': ['Transaction \\ Aspect'] + [aspect for aspect in aspects],
-        'body': {label: [] for label in TA_MMAP},
-    }
-    for label in TA_MMAP:
-        ta_stats = benchmark['targets'][target]['transaction_stats'][label]
-        ta_stats_table['body'][label].append(ta_stats['min'])
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['01%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['02%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['05%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['10%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['20%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['25%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['median_low'], 0)))
-        ta_stats_table['body'][label].append(round(ta_stats['mean'], 1))
-        ta_stats_table['body'][label].append(round(ta_stats['stddev'], 2))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['75%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['80%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['90%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['95%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['98%'], 0)))
-        ta_stats_table['body'][label].append(int(round(ta_stats['quantiles']['99%'], 0)))
-        ta_stats_table['body'][label].append(ta_stats['max'])
-        ta_stats_table['body'][label].append(ta_stats['N'])
-
-    print(f'| {" | ".join(ta_stats_table["head"])} |')
-    print(f'|:----|{":|".join("-----" for _ in ta_stats_table["head"][1:])}:|')
-    for row_head, row_data in ta_stats_table['body'].items():
-        print(f'| {row_head} | ', end='')
-        print(f'{" | ".join(str(e) for e in row_data)} |')
-    print()
+    print_stats_table('Transaction Statistics', tg['transaction_stats'])
+    print_stats_table('Transaction Statistics (Coordinated Omission Corrected)', tg['transaction_stats_corrected'])
+    for stage, stage_stats in tg['stage_stats'].items():
+        print_stats_table(f'Transaction Statistics of Stage {stage}', stage_stats)
+    if target in histograms_per_target:
+        print_histogram_table('Transaction Percentiles of the Merged Histograms', histograms_per_target[target])
+    if target in phase_histograms_per_target:
+        print_histogram_table('HTTP Phase Percentiles per Transaction', phase_histograms_per_target[target])
 
 print()
@@ -1,42 +1,17 @@
 """store grep."""
 import datetime as dti
 import json
-import pathlib
 import sys
 
 import pandas as pd
 
+from suhteita.archive import load_runs
+from suhteita.clock import NS_PER_SEC, NS_PER_USEC, format_ts, ts_ns
+from suhteita.scenario import load_definition
+
 pd.options.display.width = None
 
-scenario_labels_sequence = (  # Labels in scenario order:
-    'LOGIN',
-    'SERVER_INFO',
-    'PROJECTS',
-    'CREATE_ISSUE',
-    'ISSUE_EXISTS',
-    'CREATE_ISSUE',
-    'ISSUE_EXISTS',
-    'EXECUTE_JQL',
-    'AMEND_ISSUE_DESCRIPTION',
-    'ADD_COMMENT',
-    'UPDATE_ISSUE_FIELD',
-    'UPDATE_ISSUE_FIELD',
-    'CREATE_DUPLICATES_ISSUE_LINK',
-    'GET_ISSUE_STATUS',
-    'SET_ISSUE_STATUS',
-    'SET_ISSUE_STATUS',
-    'GET_ISSUE_STATUS',
-    'ADD_COMMENT',
-    'SET_ORIGINAL_ESTIMATE',
-    'GET_ISSUE_STATUS',
-    'SET_ISSUE_STATUS',
-    'GET_ISSUE_STATUS',
-    'CREATE_COMPONENT',
-    'RELATE_ISSUE_TO_COMPONENT',
-    'LOAD_ISSUE',
-    'ADD_COMMENT',
-    'ADD_COMMENT',
-)
+scenario_labels_sequence = tuple(load_definition('twenty_seven').labels())  # Labels in scenario order
 scenario_labels_set = set(sorted(scenario_labels_sequence))
 molecules = ('CREATE_TWINS',)
 atomic_labels_set = set([label for label in scenario_labels_set if label not in molecules])
@@ -51,9 +26,7 @@ target_aliases = ('cloud-ref', 'cloud-prod', 'prod', 'test')
 
 ENCODING = 'utf-8'
 
-UTC_TS_FORMAT = '%Y-%m-%d %H:%M:%S.%f UTC'
-FAR_FUTURE = '3000-08-13 11:32:26.250224 UTC'
-LONG_PAST = '1000-08-13 11:32:26.250224 UTC'
+NS_PER_MSEC = 1_000_000
 
 if len(sys.argv) < 2:
     print('usage: strep file(s)')
@@ -62,10 +35,8 @@ if len(sys.argv) < 2:
 profiles = []
 nodes = {}
 targets = set()
-for name in sys.argv[1:]:
-    path = pathlib.Path(name)
-    with open(path, 'rt', encoding=ENCODING) as handle:
-        db = json.load(handle)
+# Store files, SQLite databases, and columnar archives (cf. suhteita.archive) alike - the events carry nanoseconds:
+for name, db in load_runs(sys.argv[1:]):
     scenario = db['_meta']['scenario']
     target_class = db['_meta']['mode']
     client_node_id = db['_meta']['node_indicator']
@@ -79,11 +50,11 @@ for name in sys.argv[1:]:
     if target_alias not in targets:
         targets.add(target_alias)
     start_ts = db['_meta']['start_ts']
-    start_time = dti.datetime.strptime(start_ts, UTC_TS_FORMAT)
+    start_ns = db['_meta'].get('start_ns') or ts_ns(start_ts)
 
     total_secs = db['_meta']['total_secs']
     end_ts = db['_meta']['end_ts']
-    end_time = dti.datetime.strptime(end_ts, UTC_TS_FORMAT)
+    end_ns = db['_meta'].get('end_ns') or ts_ns(end_ts)
 
     logins = [event for event in db['events'] if event['label'] == 'LOGIN']
     creates_of_issue = [event for event in db['events'] if event['label'] == 'CREATE_ISSUE']
@@ -133,32 +104,26 @@ for name in sys.argv[1:]:
     ta_usecs = 0
     steps = [event for event in db['events'] if event['label'] not in molecules]
     end_step_trigger = len(steps)
-    previous_start_time = start_time
+    previous_start_ns = start_ns
     for order, step in enumerate(steps, start=1):
         label = step['label']
-        comment = step['comment']
-        step_start_ts = step['start_ts']
-        step_end_ts = step['end_ts']
+        comment = step.get('comment', '')
+        step_start_ns, step_end_ns = step['start_ns'], step['end_ns']
+        step_start_ts, step_end_ts = format_ts(step_start_ns), format_ts(step_end_ns)
         # dt_usecs = step['duration_usecs']
-        step_start_time = dti.datetime.strptime(step_start_ts, UTC_TS_FORMAT)
-        step_end_time = dti.datetime.strptime(step_end_ts, UTC_TS_FORMAT)
-        dt = step_end_time - step_start_time
-        dt_usecs = 1_000_000 * dt.seconds + dt.microseconds
+        dt_usecs = (step_end_ns - step_start_ns) // NS_PER_USEC
         dt_secs = dt_usecs / 1.0e6
         ta_usecs += dt_usecs
         ok = '      ' if step['ok'] else '(FAIL)'
         status = 'SUCC' if step['ok'] else 'FAIL'
 
-        step_start_time = dti.datetime.strptime(step_start_ts, UTC_TS_FORMAT)
-        step_end_time = dti.datetime.strptime(step_end_ts, UTC_TS_FORMAT)
-        gap_before_millis = round(1.0e3 * (step_start_time - previous_start_time).total_seconds(), 3)
-        previous_start_time = step_end_time
+        gap_before_millis = round((step_start_ns - previous_start_ns) / NS_PER_MSEC, 3)
+        previous_start_ns = step_end_ns
         if order == end_step_trigger:
-            gap_after_millis = round(1.0e3 * (end_time - step_end_time).total_seconds(), 3)
+            gap_after_millis = round((end_ns - step_end_ns) / NS_PER_MSEC, 3)
         else:
-            peek_next_step_start_ts = steps[order]['start_ts']
-            peek_next_step_start_time = dti.datetime.strptime(peek_next_step_start_ts, UTC_TS_FORMAT)
-            gap_after_millis = round(1.0e3 * (peek_next_step_start_time - step_end_time).total_seconds(), 3)
+            peek_next_step_start_ns = steps[order]['start_ns']
+            gap_after_millis = round((peek_next_step_start_ns - step_end_ns) / NS_PER_MSEC, 3)
 
         if order == 1:
             print(f'      gap before  {gap_before_millis :7.3f} millisecs')
@@ -170,6 +135,8 @@ for name in sys.argv[1:]:
         steps_profile.append(
             [
                 order,
+                step_start_ns,
+                step_end_ns,
                 step_start_ts,
                 step_end_ts,
                 dt_usecs,
@@ -188,6 +155,8 @@ for name in sys.argv[1:]:
     dc_percent = round(100.0 * ta_secs / total_secs, 3)
     for (
         order,
+        step_start_ns,
+        step_end_ns,
         step_start_ts,
         step_end_ts,
         dt_usecs,
@@ -208,16 +177,20 @@ for name in sys.argv[1:]:
                 'target_alias': target_alias,
                 'target_class': target_class,
                 'start_ts': start_ts,
+                'start_ns': start_ns,
                 'start_rel_float_epoc': None,  # relative epoc from min of all registered start times
                 'end_ts': end_ts,
+                'end_ns': end_ns,
                 'end_rel_float_epoc': None,  # dito
                 'total_secs': total_secs,
                 'transactions_secs': ta_secs,
                 'duty_cycle_percent': dc_percent,
                 'sub_transaction': order,
                 'step_start_ts': step_start_ts,
+                'step_start_ns': step_start_ns,
                 'step_start_rel_float_epoc': None,  # dito
                 'step_end_ts': step_end_ts,
+                'step_end_ns': step_end_ns,
                 'step_end_rel_float_epoc': None,  # dito
                 # below sub_trans... = 100 * (step_start - ta_start).total_seconds() / total_secs
                 'sub_transaction_local_start_rel_float_percent': None,
@@ -231,36 +204,25 @@ for name in sys.argv[1:]:
             }
         )
 
-early_ts, late_ts = FAR_FUTURE, LONG_PAST
-early_ts = min(FAR_FUTURE, *[step['start_ts'] for step in profiles])
-late_ts = max(LONG_PAST, *[step['end_ts'] for step in profiles])
-
-early_time = dti.datetime.strptime(early_ts, UTC_TS_FORMAT)
-late_time = dti.datetime.strptime(late_ts, UTC_TS_FORMAT)
-print(early_ts, late_ts)
-print(early_time, late_time)
+early_ns = min(step['start_ns'] for step in profiles)
+late_ns = max(step['end_ns'] for step in profiles)
+print(format_ts(early_ns), format_ts(late_ns))
 
-period = late_time - early_time
+period = dti.timedelta(microseconds=(late_ns - early_ns) // NS_PER_USEC)
 print(f'{period=}')
 period_secs = period.total_seconds()
 print(f'{period_secs}')
 
 for k, profile in enumerate(profiles):
-    ta_start_ts = profile['start_ts']
-    ta_start_time = dti.datetime.strptime(ta_start_ts, UTC_TS_FORMAT)
-    ta_end_ts = profile['end_ts']
-    ta_end_time = dti.datetime.strptime(ta_end_ts, UTC_TS_FORMAT)
-    sta_start_ts = profile['step_start_ts']
-    sta_start_time = dti.datetime.strptime(sta_start_ts, UTC_TS_FORMAT)
-    sta_end_ts = profile['step_end_ts']
-    sta_end_time = dti.datetime.strptime(sta_end_ts, UTC_TS_FORMAT)
+    ta_start_ns, ta_end_ns = profile['start_ns'], profile['end_ns']
+    sta_start_ns, sta_end_ns = profile['step_start_ns'], profile['step_end_ns']
     total_secs = profile['total_secs']
-    profiles[k]['start_rel_float_epoc'] = (ta_start_time - early_time).total_seconds()
-    profiles[k]['end_rel_float_epoc'] = (ta_end_time - early_time).total_seconds()
-    profiles[k]['step_start_rel_float_epoc'] = (sta_start_time - early_time).total_seconds()
-    profiles[k]['step_end_rel_float_epoc'] = (sta_end_time - early_time).total_seconds()
+    profiles[k]['start_rel_float_epoc'] = (ta_start_ns - early_ns) / NS_PER_SEC
+    profiles[k]['end_rel_float_epoc'] = (ta_end_ns - early_ns) / NS_PER_SEC
+    profiles[k]['step_start_rel_float_epoc'] = (sta_start_ns - early_ns) / NS_PER_SEC
+    profiles[k]['step_end_rel_float_epoc'] = (sta_end_ns - early_ns) / NS_PER_SEC
     profiles[k]['sub_transaction_local_start_rel_float_percent'] = (
-        100 * (sta_start_time - ta_start_time).total_seconds() / total_secs
+        100 * (sta_start_ns - ta_start_ns) / NS_PER_SEC / total_secs
     )
 
 with open('profiles.json', 'wt', encoding=ENCODING) as handle:
@@ -7,6 +7,8 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 
+from suhteita.scenario import load_definition
+
 sns.set_theme(color_codes=True)  # style="whitegrid")
 pd.options.display.width = None
 
@@ -27,35 +29,7 @@ TWINS = 'twins'
 CLOSE = 0.1
 A_SECOND_OF_USECS = 1_000_000
 
-scenario_labels_sequence = (  # Labels in scenario order:
-    'LOGIN',
-    'SERVER_INFO',
-    'PROJECTS',
-    'CREATE_ISSUE',
-    'ISSUE_EXISTS',
-    'CREATE_ISSUE',
-    'ISSUE_EXISTS',
-    'EXECUTE_JQL',
-    'AMEND_ISSUE_DESCRIPTION',
-    'ADD_COMMENT',
-    'UPDATE_ISSUE_FIELD',
-    'UPDATE_ISSUE_FIELD',
-    'CREATE_DUPLICATES_ISSUE_LINK',
-    'GET_ISSUE_STATUS',
-    'SET_ISSUE_STATUS',
-    'SET_ISSUE_STATUS',
-    'GET_ISSUE_STATUS',
-    'ADD_COMMENT',
-    'SET_ORIGINAL_ESTIMATE',
-    'GET_ISSUE_STATUS',
-    'SET_ISSUE_STATUS',
-    'GET_ISSUE_STATUS',
-    'CREATE_COMPONENT',
-    'RELATE_ISSUE_TO_COMPONENT',
-    'LOAD_ISSUE',
-    'ADD_COMMENT',
-    'ADD_COMMENT',
-)
+scenario_labels_sequence = tuple(load_definition('twenty_seven').labels())  # Labels in scenario order
 
 atomic_labels_set = set(sorted(scenario_labels_sequence))
 
@@ -144,7 +118,18 @@ def main(argv=None):
 
     group = {
         'all': sorted(atomic_labels_set),
-        'read': sorted(['SERVER_INFO', 'PROJECTS', 'ISSUE_EXISTS', 'EXECUTE_JQL', 'GET_ISSUE_STATUS', 'LOAD_ISSUE']),
+        'read': sorted(
+            [
+                'SERVER_INFO',
+                'PROJECTS',
+                'PROJECT_EXISTS',
+                'PROJECT_EXISTS_CACHED',
+                'ISSUE_EXISTS',
+                'EXECUTE_JQL',
+                'GET_ISSUE_STATUS',
+                'LOAD_ISSUE',
+            ]
+        ),
         'write': sorted(
             [
                 'LOGIN',
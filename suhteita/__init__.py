@@ -1,5 +1,6 @@
 """Relationships (Finnish: suhteita) maintained across distances as load test core."""
 
+import copy
 import datetime as dti
 import logging
 import os
@@ -29,6 +30,7 @@ DEFAULT_CONFIG_NAME = f'.{APP_ALIAS}.json'
 
 NODE_INDICATOR = str(uuid.uuid3(uuid.NAMESPACE_DNS, platform.node()))
 STORE = os.getenv(f'{APP_ENV}_STORE', '')  # default 'store' per argparse
+CACHE = os.getenv(f'{APP_ENV}_CACHE', '')  # default per XDG_CACHE_HOME (cf. suhteita.projects)
 
 USER = os.getenv(f'{APP_ENV}_USER', '')
 TOKEN = os.getenv(f'{APP_ENV}_TOKEN', '')
@@ -37,6 +39,8 @@ IS_CLOUD = bool(os.getenv(f'{APP_ENV}_IS_CLOUD', ''))
 PROJECT = os.getenv(f'{APP_ENV}_PROJECT', '')
 IDENTITY = os.getenv(f'{APP_ENV}_IDENTITY', '')  # default 'adhoc' per argparse
 WORDS = os.getenv(f'{APP_ENV}_WORDS', '/usr/share/dict/words')
+BACKENDS = ('threads', 'asyncio')
+COPY_RESPONSES = bool(os.getenv(f'{APP_ENV}_COPY_RESPONSES', ''))
 
 
 log = logging.getLogger()  # Module level logger is sufficient
@@ -48,8 +52,6 @@ LOG_LEVEL = logging.INFO
 TS_FORMAT_LOG = '%Y-%m-%dT%H:%M:%S'
 TS_FORMAT_PAYLOADS = '%Y-%m-%d %H:%M:%S.%f UTC'
 
-Clocking = Tuple[str, float, str]
-
 
 def two_sentences(word_count: int = 4) -> Tuple[str, str]:
     """DRY."""
@@ -61,6 +63,12 @@ def two_sentences(word_count: int = 4) -> Tuple[str, str]:
     return wun, two
 
 
+@no_type_check
+def detach(data):
+    """Return the client data as is or (if asked to per COPY_RESPONSES) a deep copy taken outside the clocking."""
+    return copy.deepcopy(data) if COPY_RESPONSES else data
+
+
 @no_type_check
 def extract_fields(data, fields):
     """DRY."""
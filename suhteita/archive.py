@@ -0,0 +1,334 @@
+#! /usr/bin/env python
+"""Compact store files into a columnar archive of one file per day that is read memory mapped.
+
+Layout of a day file: magic line, header length (8 bytes little endian), JSON header (dictionaries,
+run meta data, and column offsets), and then the columns as packed arrays aligned to eight bytes.
+Labels, targets, nodes, and stages are dictionary encoded, timestamps and durations are int64
+nanoseconds since the epoch, so reading an archive parses no events and no timestamp strings.
+"""
+
+import argparse
+import array
+import json
+import mmap
+import os
+import pathlib
+import re
+import struct
+import sys
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Union, no_type_check
+
+import suhteita.database as database
+from suhteita import ENCODING, log
+from suhteita.clock import NS_PER_USEC, ts_ns
+from suhteita.codec import plain_suffix
+from suhteita.store import CATALOG_NAME, JsonLinesStore, Store, is_later_segment, load_store
+
+ARCHIVE_SUFFIX = '.cols'
+MAGIC = b'SUHTEITA-COLS-1\n'
+HEADER_LENGTH = struct.Struct('<Q')
+ALIGNMENT = 8
+COLUMNS = (
+    ('run', 'i'),
+    ('rank', 'q'),
+    ('step', 'q'),
+    ('label', 'i'),
+    ('ok', 'b'),
+    ('start_ns', 'q'),
+    ('duration_ns', 'q'),
+    ('corrected_ns', 'q'),
+    ('target', 'i'),
+    ('node', 'i'),
+    ('stage', 'i'),
+)
+DICTIONARIES = ('label', 'target', 'node', 'stage')
+STORE_SUFFIXES = (Store.suffix, JsonLinesStore.suffix)
+STAMP_PATTERN = re.compile(r'-(\d{4})(\d{2})(\d{2})T\d{6}\.\d{6}Z-')  # Start of the run in the store file name
+
+
+@no_type_check
+def padded(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+@no_type_check
+class Day:
+    """Memory mapped view on the columns of one day file - use as context manager or close explicitly.
+
+    Usage:
+
+        with Day(path) as day:
+            labels, durations = day.dictionaries['label'], day.column('duration_ns')
+            slow = sum(1 for ns in durations if ns > 1_000_000_000)
+    """
+
+    @no_type_check
+    def __init__(self, path: Union[pathlib.Path, str]):
+        self.path = pathlib.Path(path)
+        self.views = {}
+        self.handle = open(self.path, 'rb')
+        self.mapped = mmap.mmap(self.handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mapped[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'archive file ({self.path}) lacks the magic line')
+        (length,) = HEADER_LENGTH.unpack_from(self.mapped, len(MAGIC))
+        start = len(MAGIC) + HEADER_LENGTH.size
+        header = json.loads(self.mapped[start : start + length].decode(ENCODING))
+        body_start = padded(start + length)
+        if header['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(f'archive file ({self.path}) has byte order ({header["byteorder"]}) of another machine')
+        self.count = header['count']
+        self.dictionaries = header['dictionaries']
+        self.runs = header['runs']
+        self.offsets = {name: (code, body_start + relative) for name, code, relative in header['columns']}
+
+    @no_type_check
+    def column(self, name: str) -> memoryview:
+        """Zero-copy view of the column (indexable and iterable like a list of ints)."""
+        if name not in self.views:
+            code, offset = self.offsets[name]
+            size = array.array(code).itemsize
+            self.views[name] = memoryview(self.mapped)[offset : offset + self.count * size].cast(code)
+        return self.views[name]
+
+    @no_type_check
+    def stores(self) -> Iterator[Dict[str, object]]:
+        """Rebuild the runs of the day as meta data and events (with nanosecond integers instead of timestamps)."""
+        columns = {name: self.column(name) for name, _ in COLUMNS}
+        labels, stages = self.dictionaries['label'], self.dictionaries['stage']
+        runs = [{'_meta': meta, 'events': []} for meta in self.runs]
+        for n in range(self.count):
+            start_ns, duration_ns = columns['start_ns'][n], columns['duration_ns'][n]
+            event = {
+                'rank': columns['rank'][n],
+                'step': columns['step'][n],
+                'label': labels[columns['label'][n]],
+                'ok': bool(columns['ok'][n]),
+                'start_ns': start_ns,
+                'duration_usecs': duration_ns // NS_PER_USEC,
+                'end_ns': start_ns + duration_ns,
+                'corrected_usecs': columns['corrected_ns'][n] // NS_PER_USEC,
+            }
+            if stages[columns['stage'][n]]:
+                event['stage'] = stages[columns['stage'][n]]
+            runs[columns['run'][n]]['events'].append(event)
+        yield from runs
+
+    @no_type_check
+    def close(self):
+        for view in self.views.values():
+            view.release()
+        self.views = {}
+        self.mapped.close()
+        self.handle.close()
+
+    def __enter__(self) -> 'Day':
+        return self
+
+    def __exit__(self, *exc_info: object) -> bool:
+        self.close()
+        return False
+
+
+@no_type_check
+def day_path(folder: Union[pathlib.Path, str], day: str) -> pathlib.Path:
+    return pathlib.Path(folder) / f'{day}{ARCHIVE_SUFFIX}'
+
+
+@no_type_check
+def write_day(path: pathlib.Path, columns: Dict[str, array.array], dictionaries: Dict[str, List[str]], runs) -> None:
+    """Write the day file next to the target and replace the target only when complete."""
+    count = len(columns['run'])
+    layout, offset = [], 0
+    for name, code in COLUMNS:
+        layout.append([name, code, offset])
+        offset = padded(offset + count * columns[name].itemsize)
+    header = {'byteorder': sys.byteorder, 'count': count, 'dictionaries': dictionaries, 'runs': runs, 'columns': layout}
+    encoded = json.dumps(header).encode(ENCODING)
+    partial = path.with_suffix(f'{ARCHIVE_SUFFIX}.partial')
+    with open(partial, 'wb') as handle:
+        handle.write(MAGIC)
+        handle.write(HEADER_LENGTH.pack(len(encoded)))
+        handle.write(encoded)
+        body_start = padded(handle.tell())
+        for name, _, relative in layout:
+            handle.write(b'\0' * (body_start + relative - handle.tell()))
+            columns[name].tofile(handle)
+    os.replace(partial, path)
+
+
+@no_type_check
+def append_stores(path: pathlib.Path, stores: Iterable[Dict[str, object]]) -> int:
+    """Merge the stores into the day file (runs already archived are skipped) and answer the events added."""
+    columns = {name: array.array(code) for name, code in COLUMNS}
+    dictionaries = {name: [] for name in DICTIONARIES}
+    runs = []
+    if path.is_file():
+        with Day(path) as day:
+            for name, _ in COLUMNS:
+                columns[name].frombytes(day.column(name).cast('B'))
+            dictionaries, runs = day.dictionaries, day.runs
+    codes = {name: {value: n for n, value in enumerate(values)} for name, values in dictionaries.items()}
+
+    @no_type_check
+    def code_of(name: str, value: str) -> int:
+        if value not in codes[name]:
+            codes[name][value] = len(dictionaries[name])
+            dictionaries[name].append(value)
+        return codes[name][value]
+
+    archived = {meta['db_name'] for meta in runs}
+    added = 0
+    for data in stores:
+        meta = {key: value for key, value in data['_meta'].items() if key != 'setup'}
+        if meta['db_name'] in archived:
+            log.info(f'Skipping run ({meta["db_name"]}) already in the archive ({path})')
+            continue
+        archived.add(meta['db_name'])
+        meta['start_ns'], meta['end_ns'] = ts_ns(meta.get('start_ts')), ts_ns(meta.get('end_ts'))
+        run = len(runs)
+        target, node = code_of('target', meta.get('target', '')), code_of('node', meta['node_indicator'])
+        runs.append(meta)
+        for event in data['events']:
+            duration_ns = event['duration_usecs'] * NS_PER_USEC
+            columns['run'].append(run)
+            columns['rank'].append(event['rank'])
+            columns['step'].append(event.get('step', event['rank']))
+            columns['label'].append(code_of('label', event['label']))
+            columns['ok'].append(1 if event['ok'] else 0)
+            columns['start_ns'].append(ts_ns(event['start_ts']))
+            columns['duration_ns'].append(duration_ns)
+            columns['corrected_ns'].append(event.get('corrected_usecs', event['duration_usecs']) * NS_PER_USEC)
+            columns['target'].append(target)
+            columns['node'].append(node)
+            columns['stage'].append(code_of('stage', event.get('stage', '')))
+            added += 1
+    write_day(path, columns, dictionaries, runs)
+    return added
+
+
+@no_type_check
+def store_paths(paths: Iterable[Union[pathlib.Path, str]]) -> List[pathlib.Path]:
+    """Expand folders into the store files (and the SQLite database) they hold - once per run of many segments."""
+    found = []
+    for path in map(pathlib.Path, paths):
+        if not path.is_dir():
+            found.append(path)
+            continue
+        for candidate in sorted(path.iterdir()):
+            if candidate.name == CATALOG_NAME or is_later_segment(candidate):
+                continue
+            if plain_suffix(candidate) in STORE_SUFFIXES or candidate.name == database.DATABASE_NAME:
+                found.append(candidate)
+    return found
+
+
+@no_type_check
+def read_stores(path: pathlib.Path, run_ids: Union[Set[int], None] = None) -> Iterator[Dict[str, object]]:
+    """Yield the runs of a store file or of all (or the selected) runs in the SQLite database."""
+    if path.name != database.DATABASE_NAME:
+        yield load_store(path)
+        return
+    connection = database.connect(path)
+    try:
+        yield from database.stores(connection, run_ids)
+    finally:
+        connection.close()
+
+
+@no_type_check
+def day_of(path: pathlib.Path) -> str:
+    """Day (UTC) the run of the store file started on - per the stamp in its name and else per its meta data."""
+    match = STAMP_PATTERN.search(path.name)
+    if match:
+        return '-'.join(match.groups())
+    return load_store(path)['_meta']['start_ts'][:10]
+
+
+@no_type_check
+def runs_per_day(paths: Iterable[pathlib.Path]) -> Dict[str, Dict[pathlib.Path, Union[Set[int], None]]]:
+    """Group the store files (and the run ids of SQLite databases) per day without loading the events."""
+    per_day = {}
+    for path in paths:
+        if path.name != database.DATABASE_NAME:
+            per_day.setdefault(day_of(path), {})[path] = None
+            continue
+        connection = database.connect(path)
+        try:
+            for run_id, meta in database.metas(connection):
+                per_day.setdefault(meta['start_ts'][:10], {}).setdefault(path, set()).add(run_id)
+        finally:
+            connection.close()
+    return per_day
+
+
+@no_type_check
+def compact(paths: Iterable[Union[pathlib.Path, str]], folder: Union[pathlib.Path, str]) -> Dict[str, int]:
+    """Compact the store files (or folders of store files) into the archive and answer the events added per day.
+
+    Runs belong to the day they started on (UTC) so that a run never spans two files. The stores are grouped
+    per day first and then loaded one at a time, so only a day of columns and a single store sit in memory.
+    """
+    folder = pathlib.Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    added = {}
+    for day, sources in sorted(runs_per_day(store_paths(paths)).items()):
+        stores = (data for path, run_ids in sources.items() for data in read_stores(path, run_ids))
+        added[day] = append_stores(day_path(folder, day), stores)
+    return added
+
+
+@no_type_check
+def days(folder: Union[pathlib.Path, str], since: str = '', until: str = '') -> List[pathlib.Path]:
+    """Day files of the archive in order (optionally from the since day through the until day - YYYY-MM-DD)."""
+    paths = sorted(pathlib.Path(folder).glob(f'*{ARCHIVE_SUFFIX}'))
+    return [path for path in paths if since <= path.stem and (not until or path.stem <= until)]
+
+
+@no_type_check
+def load_archive(folder: Union[pathlib.Path, str], since: str = '', until: str = '') -> Iterator[Dict[str, object]]:
+    """Yield the archived runs as meta data and events - day by day so that a year never sits in memory at once."""
+    for path in days(folder, since, until):
+        with Day(path) as day:
+            yield from day.stores()
+
+
+@no_type_check
+def load_runs(paths: Iterable[Union[pathlib.Path, str]]) -> Iterator[Tuple[str, Dict[str, object]]]:
+    """Yield name and run from archive folders, day files, and store files alike.
+
+    The events carry start_ns and end_ns (nanoseconds since the epoch) in any case, so that consumers
+    share one code path - only runs from store files pay for parsing the timestamps.
+    """
+    for path in map(pathlib.Path, paths):
+        if path.is_dir() and days(path):
+            for day in days(path):
+                with Day(day) as archive:
+                    for data in archive.stores():
+                        yield data['_meta']['db_name'], data
+        elif path.suffix == ARCHIVE_SUFFIX:
+            with Day(path) as archive:
+                for data in archive.stores():
+                    yield data['_meta']['db_name'], data
+        else:
+            for store_path in store_paths([path]):
+                for data in read_stores(store_path):
+                    for event in data['events']:
+                        event['start_ns'], event['end_ns'] = ts_ns(event['start_ts']), ts_ns(event['end_ts'])
+                    yield data['_meta']['db_name'], data
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    """Compact the store files of the given paths into the archive folder."""
+    parser = argparse.ArgumentParser(description='compact suhteita stores into a columnar archive of day files')
+    parser.add_argument('archive', help='archive folder receiving one file per day')
+    parser.add_argument('paths', nargs='+', help='store files or folders of store files')
+    options = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    for day, added in compact(options.paths, options.archive).items():
+        print(f'{day_path(options.archive, day)}: {added} events added')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
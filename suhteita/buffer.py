@@ -0,0 +1,179 @@
+"""Keep the events of a run in parallel typed arrays and materialize the event dicts only on demand."""
+
+import array
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Union, no_type_check
+
+from suhteita.clock import ts_ns
+
+CORE_KEYS = ('rank', 'label', 'ok', 'start_ts', 'duration_usecs', 'end_ts', 'comment')
+TIMING_TAGS = ('scheduled_ts', 'intended_ts', 'corrected_usecs')
+MEASURE_TAGS = ('response_bytes',)
+SLOT_KEYS = frozenset(CORE_KEYS + TIMING_TAGS + MEASURE_TAGS + ('phases',))
+MISSING = -(2**63)
+
+
+@no_type_check
+class Interned:
+    """Table of distinct values answering a small integer code per value (and the value per code)."""
+
+    __slots__ = ('values', 'codes')
+
+    @no_type_check
+    def __init__(self):
+        self.values: List[object] = []
+        self.codes: Dict[object, int] = {}
+
+    @no_type_check
+    def code(self, value: object) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+@no_type_check
+class EventBuffer(Sequence):
+    """Compact in memory event buffer - a sequence of event dicts to the outside.
+
+    Every event occupies a slot in each of the parallel typed arrays (rank, label code, ok, start, duration,
+    end, tag set code) instead of a dict with string keys and timestamps. Labels and the tag sets of the
+    virtual users (user, iteration, step, stage, worker, ...) are interned, the comments are kept sparse,
+    and the open model timings (scheduled and intended start, corrected latency) as well as the HTTP phases
+    of the requests (dns, connect, tls, ttfb, transfer) and the response bytes get own arrays only once the
+    first event carries them.
+
+    Indexing and iterating materialize fresh dicts (changing them does not change the buffer).
+    """
+
+    __slots__ = (
+        'ranks',
+        'label_codes',
+        'oks',
+        'starts',
+        'durations',
+        'ends',
+        'tag_codes',
+        'comments',
+        'labels',
+        'tag_sets',
+        'timings',
+        'phases',
+        'measures',
+    )
+
+    @no_type_check
+    def __init__(self):
+        self.ranks = array.array('q')
+        self.label_codes = array.array('i')
+        self.oks = array.array('b')
+        self.starts = array.array('q')
+        self.durations = array.array('q')
+        self.ends = array.array('q')
+        self.tag_codes = array.array('i')
+        self.comments: Dict[int, str] = {}
+        self.labels = Interned()
+        self.tag_sets = Interned()
+        self.timings: Dict[str, array.array] = {}
+        self.phases: Dict[str, array.array] = {}
+        self.measures: Dict[str, array.array] = {}
+
+    @no_type_check
+    def append(self, event: Dict[str, object]):
+        """Decompose the event into the slots (dumped timestamp strings are accepted, e.g. from worker shards)."""
+        index = len(self.ranks)
+        start_ts, end_ts = event['start_ts'], event['end_ts']
+        self.ranks.append(event['rank'])
+        self.label_codes.append(self.labels.code(event['label']))
+        self.oks.append(1 if event['ok'] else 0)
+        self.starts.append(start_ts if isinstance(start_ts, int) else ts_ns(start_ts))
+        self.durations.append(event['duration_usecs'])
+        self.ends.append(end_ts if isinstance(end_ts, int) else ts_ns(end_ts))
+        if event.get('comment'):
+            self.comments[index] = event['comment']
+        self.tag_codes.append(self.tag_sets.code(tuple(item for item in event.items() if item[0] not in SLOT_KEYS)))
+        if self.timings or TIMING_TAGS[-1] in event:
+            self.append_timings(index, event)
+        if self.phases or event.get('phases'):
+            self.append_sparse(self.phases, index, event.get('phases') or {})
+        if self.measures or MEASURE_TAGS[0] in event:
+            self.append_sparse(self.measures, index, {key: event[key] for key in MEASURE_TAGS if key in event})
+
+    @no_type_check
+    def append_timings(self, index: int, event: Dict[str, object]):
+        """Extend the open model timing columns (created on first use and padded for the earlier events)."""
+        for key in TIMING_TAGS:
+            value = event.get(key)
+            column = self.timings.get(key)
+            if column is None:
+                if value is None:
+                    continue
+                column = self.timings[key] = array.array('q', [MISSING]) * index
+            column.append(MISSING if value is None else ts_ns(value))
+
+    @no_type_check
+    def append_sparse(self, columns: Dict[str, array.array], index: int, values: Dict[str, int]):
+        """Extend the columns of optional integers (created per key on first use and padded for the earlier events)."""
+        for key in values:
+            if key not in columns:
+                columns[key] = array.array('q', [MISSING]) * index
+        for key, column in columns.items():
+            column.append(values.get(key, MISSING))
+
+    @no_type_check
+    def event(self, index: int) -> Dict[str, object]:
+        """Materialize the event dict of the slot."""
+        event = {
+            'rank': self.ranks[index],
+            'label': self.labels.values[self.label_codes[index]],
+            'ok': bool(self.oks[index]),
+            'start_ts': self.starts[index],
+            'duration_usecs': self.durations[index],
+            'end_ts': self.ends[index],
+            'comment': self.comments.get(index, ''),
+            **dict(self.tag_sets.values[self.tag_codes[index]]),
+        }
+        for key, column in (*self.timings.items(), *self.measures.items()):
+            if column[index] != MISSING:
+                event[key] = column[index]
+        phases = {key: column[index] for key, column in self.phases.items() if column[index] != MISSING}
+        if phases:
+            event['phases'] = phases
+        return event
+
+    @no_type_check
+    def has_failures(self) -> bool:
+        return 0 in self.oks
+
+    def __len__(self) -> int:
+        return len(self.ranks)
+
+    @no_type_check
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict[str, object], List[Dict[str, object]]]:
+        if isinstance(index, slice):
+            return [self.event(n) for n in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('event index out of range')
+        return self.event(index)
+
+    @no_type_check
+    def __iter__(self) -> Iterator[Dict[str, object]]:
+        for index in range(len(self)):
+            yield self.event(index)
+
+    @no_type_check
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (list, tuple, EventBuffer)):
+            return NotImplemented
+        return len(self) == len(other) and all(mine == theirs for mine, theirs in zip(self, other))
+
+    __hash__ = None
+
+    @no_type_check
+    def __repr__(self) -> str:
+        return (
+            f'EventBuffer(events={len(self)}, labels={len(self.labels.values)}, tag_sets={len(self.tag_sets.values)})'
+        )
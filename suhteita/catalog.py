@@ -0,0 +1,153 @@
+#! /usr/bin/env python
+"""Select runs from the catalog of a store folder without opening the store files.
+
+The catalog holds one JSON line per run (scenario, target, mode, identity, start, event count,
+failure flags, and the store file name). Stores append their row when the dump completes, so the
+catalog is current without scanning the folder - and a rebuild regenerates it from the store files.
+
+Usage (all twins runs against the prod target in the week from 2026-10-05):
+
+    for path in paths('store', scenario='twins', target='*prod*', since='2026-10-05', until='2026-10-11'):
+        data = load_store(path)
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import pathlib
+import sys
+from typing import Dict, Iterable, List, Union, no_type_check
+
+import suhteita.database as database
+from suhteita import ENCODING, log
+from suhteita.codec import plain_suffix
+from suhteita.store import CATALOG_NAME, JsonLinesStore, Store, catalog_row, is_later_segment, load_store
+
+PATTERN_KEYS = ('scenario', 'target', 'mode', 'identity', 'node_indicator')
+
+
+@no_type_check
+def catalog_path(folder: Union[pathlib.Path, str]) -> pathlib.Path:
+    return pathlib.Path(folder) / CATALOG_NAME
+
+
+@no_type_check
+def read_catalog(folder: Union[pathlib.Path, str]) -> List[Dict[str, object]]:
+    """Rows of the catalog in order of completion (the last row of a run wins, torn lines are skipped)."""
+    path = catalog_path(folder)
+    if not path.is_file():
+        return []
+    rows = {}
+    with open(path, 'rt', encoding=ENCODING) as handle:
+        for line in handle:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                log.warning(f'Skipping torn line of catalog ({path})')
+                continue
+            rows.pop(row['db_name'], None)
+            rows[row['db_name']] = row
+    return list(rows.values())
+
+
+@no_type_check
+def scanned_rows(folder: pathlib.Path) -> Iterable[Dict[str, object]]:
+    """Catalog rows of all runs in the store files and the SQLite database of the folder."""
+    for path in sorted(folder.iterdir()):
+        if path.name == CATALOG_NAME or is_later_segment(path):
+            continue
+        if plain_suffix(path) in (Store.suffix, JsonLinesStore.suffix):
+            data = load_store(path)
+            meta = {'event_count': len(data['events']), **data['_meta']}
+            row = catalog_row(meta)
+            row['path'] = path.name
+            yield row
+        elif path.name == database.DATABASE_NAME:
+            connection = database.connect(path)
+            try:
+                for _, meta in database.metas(connection):
+                    row = catalog_row(meta)
+                    row['path'] = path.name
+                    yield row
+            finally:
+                connection.close()
+
+
+@no_type_check
+def rebuild(folder: Union[pathlib.Path, str]) -> int:
+    """Regenerate the catalog from the store files and answer the number of runs (replaces the catalog at once)."""
+    folder = pathlib.Path(folder)
+    path = catalog_path(folder)
+    partial = path.with_suffix(f'{path.suffix}.partial')
+    count = 0
+    with open(partial, 'wt', encoding=ENCODING) as handle:
+        for row in scanned_rows(folder):
+            handle.write(f'{json.dumps(row)}\n')
+            count += 1
+    os.replace(partial, path)
+    return count
+
+
+@no_type_check
+def matches(row: Dict[str, object], since: str, until: str, ok: Union[bool, None], patterns: Dict[str, str]) -> bool:
+    """Answer if the row matches - since and until compare against the leading characters of the start timestamp."""
+    start_ts = row.get('start_ts') or ''
+    if since and start_ts[: len(since)] < since:
+        return False
+    if until and start_ts[: len(until)] > until:
+        return False
+    if ok is not None:
+        failed = bool(row.get('has_failures_declared') or row.get('has_failures_detected'))
+        if failed == ok:
+            return False
+    return all(fnmatch.fnmatchcase(str(row.get(key) or ''), pattern) for key, pattern in patterns.items())
+
+
+@no_type_check
+def select(
+    folder: Union[pathlib.Path, str], since: str = '', until: str = '', ok: Union[bool, None] = None, **patterns: str
+) -> List[Dict[str, object]]:
+    """Catalog rows of the runs matching all criteria (patterns are shell style, e.g. target='*prod*')."""
+    unknown = sorted(set(patterns) - set(PATTERN_KEYS))
+    if unknown:
+        raise ValueError(f'catalog selection keys ({", ".join(unknown)}) are not in ({", ".join(PATTERN_KEYS)})')
+    patterns = {key: pattern for key, pattern in patterns.items() if pattern}
+    return [row for row in read_catalog(folder) if matches(row, since, until, ok, patterns)]
+
+
+@no_type_check
+def paths(
+    folder: Union[pathlib.Path, str], since: str = '', until: str = '', ok: Union[bool, None] = None, **patterns: str
+) -> List[pathlib.Path]:
+    """Store files holding the selected runs (each once, in order of completion)."""
+    folder = pathlib.Path(folder)
+    found = {}
+    for row in select(folder, since, until, ok, **patterns):
+        found.setdefault(folder / row['path'], None)
+    return list(found)
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    """Print the store files of the runs matching the criteria (optionally rebuilding the catalog first)."""
+    parser = argparse.ArgumentParser(description='select suhteita runs from the catalog of a store folder')
+    parser.add_argument('folder', help='store folder holding the catalog')
+    parser.add_argument('--rebuild', action='store_true', help='regenerate the catalog from the store files first')
+    for key in PATTERN_KEYS:
+        parser.add_argument(f'--{key.replace("_", "-")}', default='', help=f'shell style pattern for the {key}')
+    parser.add_argument('--since', default='', help='earliest start (prefix of the timestamp, e.g. 2026-10-05)')
+    parser.add_argument('--until', default='', help='latest start (prefix of the timestamp, e.g. 2026-10-11)')
+    outcome = parser.add_mutually_exclusive_group()
+    outcome.add_argument('--failed', dest='ok', action='store_false', default=None, help='only runs with failures')
+    outcome.add_argument('--ok', dest='ok', action='store_true', default=None, help='only runs without failures')
+    options = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    if options.rebuild:
+        log.info(f'Rebuilt catalog of ({rebuild(options.folder)}) runs in ({options.folder})')
+    patterns = {key: getattr(options, key) for key in PATTERN_KEYS}
+    for path in paths(options.folder, options.since, options.until, options.ok, **patterns):
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,19 @@
 #! /usr/bin/env python
 """CLI operations for relationships (Finnish: suhteita) maintained across distances as load test core."""
+
 import argparse
 import sys
 from typing import List, Union
 
 import suhteita.suhteita as api
-from suhteita import APP_ALIAS, APP_ENV, BASE_URL, IDENTITY, IS_CLOUD, PROJECT, STORE, USER
+from suhteita import APP_ALIAS, APP_ENV, BACKENDS, BASE_URL, IDENTITY, IS_CLOUD, PROJECT, STORE, USER
+from suhteita.codec import available
+from suhteita.issue_pool import ISSUE_ORDERS
+from suhteita.pool import DEFAULT_KEEPALIVE_SECS, DEFAULT_POOL_CONNECTIONS, POOL_SCOPES
+from suhteita.projects import DEFAULT_TTL_SECS
+from suhteita.scenario import DEFAULT_DEFINITION, available_definitions
+from suhteita.scheduler import ARRIVAL_PROCESSES, ARRIVAL_SCOPES
+from suhteita.store import STORE_FORMATS, WRITER_QUEUE
 
 
 def parse_request(argv: List[str]) -> argparse.Namespace:
@@ -69,6 +77,217 @@ def parse_request(argv: List[str]) -> argparse.Namespace:
             f' (default: {STORE if STORE else f"store, set {APP_ENV}_STORE for default"})'
         ),
     )
+    parser.add_argument(
+        '--users',
+        '-n',
+        dest='users',
+        type=int,
+        default=1,
+        help='number of virtual users executing the scenario in parallel (default: 1)',
+    )
+    parser.add_argument(
+        '--backend',
+        '-b',
+        dest='backend',
+        choices=BACKENDS,
+        default=BACKENDS[0],
+        help=f'execution backend for the virtual users (default: {BACKENDS[0]})',
+    )
+    parser.add_argument(
+        '--processes',
+        '-P',
+        dest='processes',
+        type=int,
+        default=1,
+        help='number of worker processes sharing the virtual users (default: 1)',
+    )
+    parser.add_argument(
+        '--arrival-rate',
+        '-r',
+        dest='arrival_rate',
+        type=float,
+        default=0.0,
+        help='open model target rate in arrivals per second (default: 0 meaning closed model)',
+    )
+    parser.add_argument(
+        '--arrival-process',
+        dest='arrival_process',
+        choices=ARRIVAL_PROCESSES,
+        default=ARRIVAL_PROCESSES[0],
+        help=f'distribution of the open model arrivals (default: {ARRIVAL_PROCESSES[0]})',
+    )
+    parser.add_argument(
+        '--arrival-scope',
+        dest='arrival_scope',
+        choices=ARRIVAL_SCOPES,
+        default=ARRIVAL_SCOPES[0],
+        help=(
+            f'unit of the open model arrivals (default: {ARRIVAL_SCOPES[0]}) - scenario starts the virtual users'
+            ' at the rate, transaction paces the steps of every virtual user at the rate'
+        ),
+    )
+    parser.add_argument(
+        '--load-shape',
+        '-L',
+        dest='load_shape',
+        default='',
+        help=(
+            'path to a TOML or JSON file with the stages (name, duration_secs, and users or rate target,'
+            ' optional ramp) the load follows (default: no shape) - with rate targets the users option'
+            ' caps the concurrent virtual users'
+        ),
+    )
+    parser.add_argument(
+        '--definition',
+        '-D',
+        dest='definition',
+        default=DEFAULT_DEFINITION,
+        help=(
+            f'name of a shipped scenario definition ({", ".join(available_definitions())})'
+            f' or path to a TOML or JSON definition file (default: {DEFAULT_DEFINITION})'
+        ),
+    )
+    parser.add_argument(
+        '--concurrent-steps',
+        '-C',
+        dest='concurrent_steps',
+        default=False,
+        action='store_true',
+        help=(
+            'start every step as soon as the steps it depends on (per the bindings they reference) returned'
+            ' instead of one after the other (default: False)'
+        ),
+    )
+    parser.add_argument(
+        '--store-format',
+        dest='store_format',
+        choices=tuple(STORE_FORMATS),
+        default='json',
+        help=(
+            'format of the store file (default: json) - json writes all events at the end of the run,'
+            ' jsonl streams every event as line when recorded, sqlite inserts the events in batches into the'
+            ' shared database of the output folder'
+        ),
+    )
+    parser.add_argument(
+        '--fsync-every',
+        dest='fsync_every',
+        type=int,
+        default=0,
+        help='force the jsonl store onto the disk after every n-th event (default: 0 meaning on close only)',
+    )
+    parser.add_argument(
+        '--segment-events',
+        dest='segment_events',
+        type=int,
+        default=0,
+        help='roll the jsonl store over to a new segment file after n events (default: 0 meaning never)',
+    )
+    parser.add_argument(
+        '--segment-bytes',
+        dest='segment_bytes',
+        type=int,
+        default=0,
+        help='roll the jsonl store over to a new segment file after n bytes of lines (default: 0 meaning never)',
+    )
+    parser.add_argument(
+        '--segment-secs',
+        dest='segment_secs',
+        type=float,
+        default=0,
+        help='roll the jsonl store over to a new segment file after n seconds (default: 0 meaning never)',
+    )
+    parser.add_argument(
+        '--compress',
+        dest='compression',
+        choices=tuple(available()),
+        default='',
+        help=(
+            'compress the json and jsonl store files while writing them (default: no compression)'
+            ' - zstd needs Python 3.14 or the zstandard package'
+        ),
+    )
+    parser.add_argument(
+        '--pool-scope',
+        dest='pool_scope',
+        choices=POOL_SCOPES,
+        default='user',
+        help=(
+            'who shares the keep-alive connections to the target (default: user) - user pools per login,'
+            ' shared pools for all virtual users of a process'
+        ),
+    )
+    parser.add_argument(
+        '--pool-connections',
+        dest='pool_connections',
+        type=int,
+        default=DEFAULT_POOL_CONNECTIONS,
+        help=f'hosts to keep connection pools for (default: {DEFAULT_POOL_CONNECTIONS})',
+    )
+    parser.add_argument(
+        '--pool-maxsize',
+        dest='pool_maxsize',
+        type=int,
+        default=0,
+        help='connections to keep alive per host (default: 0 meaning 10 per user pool and one per user if shared)',
+    )
+    parser.add_argument(
+        '--keepalive-secs',
+        dest='keepalive_secs',
+        type=float,
+        default=DEFAULT_KEEPALIVE_SECS,
+        help=(
+            'idle seconds before kept-alive connections expire with the asyncio backend'
+            f' (default: {DEFAULT_KEEPALIVE_SECS})'
+        ),
+    )
+    parser.add_argument(
+        '--lean-reads',
+        dest='lean_reads',
+        default=False,
+        action='store_true',
+        help=(
+            'request only the fields the scenario uses for searches and loads of issues instead of the full'
+            ' issues (default: False)'
+        ),
+    )
+    parser.add_argument(
+        '--projects-ttl-secs',
+        dest='projects_ttl_secs',
+        type=float,
+        default=DEFAULT_TTL_SECS,
+        help=(
+            'seconds the local project catalog answers the check for the target project before it is requested again'
+            f' (default: {DEFAULT_TTL_SECS}) - 0 requests the project on every run'
+        ),
+    )
+    parser.add_argument(
+        '--issue-pool',
+        dest='issue_pool',
+        type=int,
+        default=0,
+        help=(
+            'pre-provision a pool of tagged issues in the target project and bind one per scenario run as pooled_key'
+            ' for read-heavy definitions like reader (default: 0 meaning no pool)'
+        ),
+    )
+    parser.add_argument(
+        '--issue-order',
+        dest='issue_order',
+        choices=ISSUE_ORDERS,
+        default=ISSUE_ORDERS[0],
+        help=f'order the pool hands out the issues to the scenario runs (default: {ISSUE_ORDERS[0]})',
+    )
+    parser.add_argument(
+        '--writer-queue',
+        dest='writer_queue',
+        type=int,
+        default=WRITER_QUEUE,
+        help=(
+            f'capacity of the queue a writer thread drains for the jsonl and sqlite stores (default: {WRITER_QUEUE})'
+            ' - events meeting a full queue are dropped and counted, 0 writes on the virtual user threads'
+        ),
+    )
     return parser.parse_args(argv)
 
 
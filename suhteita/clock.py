@@ -0,0 +1,87 @@
+"""Clock the actions on the monotonic nanosecond counter and format the wall clock anchors only when dumping."""
+
+import datetime as dti
+import time
+from typing import NamedTuple, Union
+
+from suhteita import TS_FORMAT_PAYLOADS
+
+EPOCH = dti.datetime(1970, 1, 1, tzinfo=dti.timezone.utc)
+NS_PER_SEC = 1_000_000_000
+NS_PER_USEC = 1_000
+
+
+def format_ts(ns: int) -> str:
+    """Format the wall clock nanoseconds since the epoch as payload timestamp (microsecond resolution)."""
+    secs, nanos = divmod(ns, NS_PER_SEC)
+    moment = dti.datetime.fromtimestamp(secs, tz=dti.timezone.utc).replace(microsecond=nanos // NS_PER_USEC)
+    return moment.strftime(TS_FORMAT_PAYLOADS)
+
+
+def parse_ts(ts: str) -> dti.datetime:
+    """Parse a payload timestamp into an aware UTC datetime."""
+    return dti.datetime.strptime(ts, TS_FORMAT_PAYLOADS).replace(tzinfo=dti.timezone.utc)
+
+
+def ns_of(moment: dti.datetime) -> int:
+    """Wall clock nanoseconds since the epoch of an aware datetime."""
+    return (moment - EPOCH) // dti.timedelta(microseconds=1) * NS_PER_USEC
+
+
+def ts_ns(value: Union[int, str, None]) -> Union[int, None]:
+    """Nanoseconds since the epoch of an in memory (int) or dumped (payload string) timestamp."""
+    if value is None or isinstance(value, int):
+        return value
+    return ns_of(parse_ts(value))
+
+
+def usecs_of(delta: Union[dti.timedelta, None]) -> int:
+    """Total microseconds of the time delta (zero if none) - unlike the microseconds component of the delta."""
+    return 0 if delta is None else delta // dti.timedelta(microseconds=1)
+
+
+class Clocking(NamedTuple):
+    """Start and end of a timed call as wall clock nanoseconds since the epoch and the monotonic duration.
+
+    The start is the wall clock anchor for correlation, the duration stems from the monotonic counter,
+    and the end is the anchor plus the duration (so the end never precedes the start).
+    """
+
+    start_ns: int
+    duration_ns: int
+    end_ns: int
+
+    def duration_usecs(self) -> int:
+        return self.duration_ns // NS_PER_USEC
+
+    def start_ts(self) -> str:
+        return format_ts(self.start_ns)
+
+    def end_ts(self) -> str:
+        return format_ts(self.end_ns)
+
+    def __str__(self) -> str:
+        return f"('{self.start_ts()}', {self.duration_usecs()}, '{self.end_ts()}')"
+
+
+class Stopwatch:
+    """Clock the enclosed block (also when it raises) - the clocking is available after the block.
+
+    Usage:
+
+        with Stopwatch() as watch:
+            data = service.get_server_info(True)
+        return watch.clocking, data
+    """
+
+    __slots__ = ('anchor_ns', 'start_ns', 'clocking')
+
+    def __enter__(self) -> 'Stopwatch':
+        self.anchor_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info: object) -> bool:
+        duration_ns = time.perf_counter_ns() - self.start_ns
+        self.clocking = Clocking(self.anchor_ns, duration_ns, self.anchor_ns + duration_ns)
+        return False
@@ -0,0 +1,51 @@
+"""Open store files plain or compressed (gzip, and zstd when available) as streaming text handles.
+
+The compression follows from the file name (e.g. run.jsonl.gz), so readers never need to be told.
+"""
+
+import gzip
+import pathlib
+from typing import IO, List, Tuple, Union, no_type_check
+
+from suhteita import ENCODING
+
+try:
+    from compression import zstd  # type: ignore  # Python 3.14+
+except ImportError:  # pragma: no cover
+    try:
+        import zstandard as zstd  # type: ignore
+    except ImportError:
+        zstd = None
+
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+TRUNCATED: Tuple[type, ...] = (EOFError,) if zstd is None else (EOFError, zstd.ZstdError)
+
+
+def available() -> List[str]:
+    """Compressions usable here (zstd needs Python 3.14 or the zstandard package)."""
+    return [name for name in COMPRESSIONS if name != 'zstd' or zstd is not None]
+
+
+def compression_of(path: Union[pathlib.Path, str]) -> str:
+    """Compression of the file by suffix ('' for plain files)."""
+    suffix = pathlib.Path(path).suffix
+    return next((name for name, known in COMPRESSIONS.items() if known == suffix), '')
+
+
+def plain_suffix(path: Union[pathlib.Path, str]) -> str:
+    """Suffix of the file without the compression suffix (e.g. .jsonl for run.jsonl.gz)."""
+    path = pathlib.Path(path)
+    return path.with_suffix('').suffix if compression_of(path) else path.suffix
+
+
+@no_type_check
+def open_text(path: Union[pathlib.Path, str], mode: str = 'rt') -> IO[str]:
+    """Open the file in text mode (rt, wt, or at) and compress or decompress per suffix on the fly."""
+    compression = compression_of(path)
+    if compression == 'gzip':
+        return gzip.open(path, mode, encoding=ENCODING)
+    if compression == 'zstd':
+        if zstd is None:
+            raise ValueError(f'compression ({compression}) of ({path}) needs Python 3.14 or the zstandard package')
+        return zstd.open(path, mode, encoding=ENCODING)
+    return open(path, mode, encoding=ENCODING)
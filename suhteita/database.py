@@ -0,0 +1,285 @@
+"""Keep runs and events of many stores in a local SQLite database (WAL mode) and query the latencies."""
+
+import json
+import pathlib
+import sqlite3
+from typing import Dict, Iterable, Iterator, List, Sequence, Set, Tuple, Union, no_type_check
+
+from suhteita.clock import ts_ns
+
+DATABASE_NAME = 'suhteita.sqlite'
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+RUN_COLUMNS = (
+    'db_name',
+    'identity',
+    'scenario',
+    'definition',
+    'target',
+    'mode',
+    'project',
+    'node_indicator',
+    'worker',
+    'users',
+    'start_ns',
+    'end_ns',
+    'total_secs',
+    'has_failures_declared',
+    'has_failures_detected',
+    'meta',
+)
+EVENT_COLUMNS = (
+    'run_id',
+    'target',
+    'node_indicator',
+    'scenario',
+    'rank',
+    'label',
+    'ok',
+    'start_ns',
+    'duration_usecs',
+    'end_ns',
+    'comment',
+    'tags',
+)
+EVENT_KEYS = ('rank', 'label', 'ok', 'start_ts', 'duration_usecs', 'end_ts', 'comment')
+FILTERS = ('target', 'node_indicator', 'scenario')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    db_name TEXT NOT NULL UNIQUE,
+    identity TEXT,
+    scenario TEXT,
+    definition TEXT,
+    target TEXT,
+    mode TEXT,
+    project TEXT,
+    node_indicator TEXT,
+    worker TEXT,
+    users INTEGER,
+    start_ns INTEGER,
+    end_ns INTEGER,
+    total_secs REAL,
+    has_failures_declared INTEGER,
+    has_failures_detected INTEGER,
+    meta TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    target TEXT,
+    node_indicator TEXT,
+    scenario TEXT,
+    rank INTEGER,
+    label TEXT,
+    ok INTEGER,
+    start_ns INTEGER,
+    duration_usecs INTEGER,
+    end_ns INTEGER,
+    comment TEXT,
+    tags TEXT
+);
+CREATE INDEX IF NOT EXISTS events_target_label_start ON events (target, label, start_ns);
+CREATE INDEX IF NOT EXISTS events_node_scenario ON events (node_indicator, scenario);
+CREATE INDEX IF NOT EXISTS events_run ON events (run_id);
+CREATE INDEX IF NOT EXISTS events_label_ok_duration ON events (label, ok, duration_usecs);
+"""
+
+
+@no_type_check
+def connect(path: Union[pathlib.Path, str]) -> sqlite3.Connection:
+    """Open (and create if needed) the database in WAL mode - usable from the threads of the virtual users."""
+    connection = sqlite3.connect(str(path), check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+@no_type_check
+def insert_run(connection: sqlite3.Connection, meta: Dict[str, object]) -> int:
+    """Register the run per its meta data and answer the run identifier."""
+    row = {key: meta.get(key) for key in RUN_COLUMNS}
+    row['start_ns'], row['end_ns'] = ts_ns(meta.get('start_ts')), ts_ns(meta.get('end_ts'))
+    row['meta'] = json.dumps(meta)
+    columns = ', '.join(RUN_COLUMNS)
+    cursor = connection.execute(
+        f'INSERT INTO runs ({columns}) VALUES ({", ".join("?" for _ in RUN_COLUMNS)})',  # nosec - fixed columns
+        tuple(row[key] for key in RUN_COLUMNS),
+    )
+    connection.commit()
+    return cursor.lastrowid
+
+
+@no_type_check
+def update_run(connection: sqlite3.Connection, run_id: int, meta: Dict[str, object]) -> None:
+    """Store the totals of the concluded run."""
+    connection.execute(
+        'UPDATE runs SET end_ns = ?, total_secs = ?, has_failures_declared = ?, has_failures_detected = ?, meta = ?'
+        ' WHERE run_id = ?',
+        (
+            ts_ns(meta.get('end_ts')),
+            meta.get('total_secs'),
+            meta.get('has_failures_declared'),
+            meta.get('has_failures_detected'),
+            json.dumps(meta),
+            run_id,
+        ),
+    )
+    connection.commit()
+
+
+@no_type_check
+def event_rows(run_id: int, meta: Dict[str, object], events: Iterable[Dict[str, object]]) -> List[Tuple[object, ...]]:
+    """Rows of the events - the tags beyond the common keys are kept as JSON."""
+    target, node, scenario = meta.get('target'), meta.get('node_indicator'), meta.get('scenario')
+    return [
+        (
+            run_id,
+            target,
+            node,
+            scenario,
+            event['rank'],
+            event['label'],
+            event['ok'],
+            ts_ns(event['start_ts']),
+            event['duration_usecs'],
+            ts_ns(event['end_ts']),
+            event.get('comment', ''),
+            json.dumps({key: value for key, value in event.items() if key not in EVENT_KEYS}),
+        )
+        for event in events
+    ]
+
+
+@no_type_check
+def insert_events(connection: sqlite3.Connection, rows: Sequence[Tuple[object, ...]]) -> None:
+    """Insert a batch of event rows in one transaction."""
+    with connection:
+        connection.executemany(
+            f'INSERT INTO events ({", ".join(EVENT_COLUMNS)}) VALUES ({", ".join("?" for _ in EVENT_COLUMNS)})',
+            rows,
+        )
+
+
+@no_type_check
+def import_store(connection: sqlite3.Connection, data: Dict[str, object]) -> int:
+    """Import a loaded store (cf. suhteita.store.load_store) as run with its events and answer the run id."""
+    meta = data['_meta']
+    run_id = insert_run(connection, meta)
+    insert_events(connection, event_rows(run_id, meta, data['events']))
+    return run_id
+
+
+@no_type_check
+def metas(connection: sqlite3.Connection) -> Iterator[Tuple[int, Dict[str, object]]]:
+    """Yield run id and meta data of the runs in order of registration."""
+    for run_id, meta in connection.execute('SELECT run_id, meta FROM runs ORDER BY run_id').fetchall():
+        yield run_id, json.loads(meta)
+
+
+@no_type_check
+def stores(connection: sqlite3.Connection, run_ids: Union[Set[int], None] = None) -> Iterator[Dict[str, object]]:
+    """Yield the runs (all or the selected) as meta data and events like loaded stores.
+
+    The timestamps stay nanoseconds since the epoch.
+    """
+    for run_id, meta in metas(connection):
+        if run_ids is not None and run_id not in run_ids:
+            continue
+        query = (
+            'SELECT rank, label, ok, start_ns, duration_usecs, end_ns, comment, tags FROM events'
+            ' WHERE run_id = ? ORDER BY rank'
+        )
+        events = [
+            {
+                'rank': rank,
+                'label': label,
+                'ok': bool(ok),
+                'start_ts': start_ns,
+                'duration_usecs': duration_usecs,
+                'end_ts': end_ns,
+                'comment': comment,
+                **json.loads(tags),
+            }
+            for rank, label, ok, start_ns, duration_usecs, end_ns, comment, tags in connection.execute(query, (run_id,))
+        ]
+        yield {'_meta': meta, 'events': events}
+
+
+@no_type_check
+def where(filters: Dict[str, Union[str, None]]) -> Tuple[List[str], List[object]]:
+    """Build the conditions and parameters for filtering the events per target, node, and scenario."""
+    unknown = sorted(set(filters) - set(FILTERS))
+    if unknown:
+        raise ValueError(f'unknown filters ({", ".join(unknown)}) - use {FILTERS}')
+    keys = [key for key in FILTERS if filters.get(key) is not None]
+    return [f'{key} = ?' for key in keys], [filters[key] for key in keys]
+
+
+@no_type_check
+def matching(
+    label: str, since_ns: Union[int, None], until_ns: Union[int, None], ok_only: bool, filters: Dict[str, str]
+) -> Tuple[str, List[object]]:
+    """Build the condition and parameters for the events with the label in the time window."""
+    clauses, params = where(filters)
+    clauses, params = ['label = ?', *clauses], [label, *params]
+    if since_ns is not None:
+        clauses.append('start_ns >= ?')
+        params.append(since_ns)
+    if until_ns is not None:
+        clauses.append('start_ns < ?')
+        params.append(until_ns)
+    if ok_only:
+        clauses.append('ok = 1')
+    return ' AND '.join(clauses), params
+
+
+@no_type_check
+def durations(
+    connection: sqlite3.Connection,
+    label: str,
+    since_ns: Union[int, None] = None,
+    until_ns: Union[int, None] = None,
+    ok_only: bool = True,
+    **filters: str,
+) -> List[int]:
+    """Sorted durations in microseconds of the events with the label (filter per target, node, and scenario)."""
+    condition, params = matching(label, since_ns, until_ns, ok_only, filters)
+    query = f'SELECT duration_usecs FROM events WHERE {condition} ORDER BY duration_usecs'  # nosec - fixed keys
+    return [row[0] for row in connection.execute(query, params)]
+
+
+@no_type_check
+def percentiles(
+    connection: sqlite3.Connection,
+    label: str,
+    points: Sequence[float] = DEFAULT_PERCENTILES,
+    since_ns: Union[int, None] = None,
+    until_ns: Union[int, None] = None,
+    **filters: str,
+) -> Dict[str, Union[int, None]]:
+    """Nearest rank percentiles of the durations in microseconds (None without matching events).
+
+    Every percentile selects the one duration at its rank along the (label, ok, duration) index - the
+    durations are neither sorted nor loaded.
+    """
+    condition, params = matching(label, since_ns, until_ns, True, filters)
+    count = connection.execute(f'SELECT COUNT(*) FROM events WHERE {condition}', params).fetchone()[0]  # nosec
+    query = f'SELECT duration_usecs FROM events WHERE {condition} ORDER BY duration_usecs LIMIT 1 OFFSET ?'  # nosec
+    answer = {}
+    for point in points:
+        if not count:
+            answer[f'p{point:g}'] = None
+            continue
+        rank = max(1, -(-count * point // 100))  # Ceiling without floats
+        answer[f'p{point:g}'] = connection.execute(query, [*params, int(rank) - 1]).fetchone()[0]
+    return answer
+
+
+@no_type_check
+def labels(connection: sqlite3.Connection, **filters: str) -> List[str]:
+    """Distinct labels of the events (filter per target, node, and scenario)."""
+    clauses, params = where(filters)
+    condition = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+    query = f'SELECT DISTINCT label FROM events{condition} ORDER BY label'  # nosec - fixed keys
+    return [row[0] for row in connection.execute(query, params)]
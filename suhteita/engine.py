@@ -0,0 +1,409 @@
+"""Drive scenarios for many virtual users concurrently against one store."""
+
+import asyncio
+import concurrent.futures
+import copy
+import datetime as dti
+import itertools
+import math
+import pathlib
+import threading
+import time
+import types
+from typing import Awaitable, Callable, Dict, Iterator, List, Sequence, Tuple, Union, no_type_check
+
+import suhteita.pool as pool
+from suhteita import log
+from suhteita.clock import ns_of
+from suhteita.scheduler import Schedule
+from suhteita.shape import LoadShape, parse_stages
+from suhteita.store import Recorder, Store, load_store, open_store
+
+Outcome = Tuple[int, bool]  # (return code, has failures)
+Scenario = Callable[[object, Recorder], Outcome]
+AsyncScenario = Callable[[object, Recorder], Awaitable[Outcome]]
+
+USER_ID_PREFIX = 'u'
+USER_ID_DIGITS = 4
+WORKER_ID_PREFIX = 'w'
+WORKER_ID_DIGITS = 2
+SHARDS_FOLDER = 'shards'
+SHAPE_TICK_SECS = 0.5
+
+
+def nth_user_id(k: int, prefix: str = USER_ID_PREFIX) -> str:
+    """Derive the stable identifier of the k-th virtual user (1-based and zero padded)."""
+    return f'{prefix}{k :0{USER_ID_DIGITS}d}'
+
+
+def user_ids(users: int, prefix: str = USER_ID_PREFIX) -> List[str]:
+    """Derive stable identifiers for the virtual users (1-based and zero padded)."""
+    return [nth_user_id(k, prefix) for k in range(1, users + 1)]
+
+
+def worker_ids(workers: int, prefix: str = WORKER_ID_PREFIX) -> List[str]:
+    """Derive stable identifiers for the worker processes (1-based and zero padded)."""
+    return [f'{prefix}{k :0{WORKER_ID_DIGITS}d}' for k in range(1, workers + 1)]
+
+
+def shard_users(identifiers: List[str], workers: int) -> List[List[str]]:
+    """Distribute the virtual users round-robin across the workers (dropping workers without users)."""
+    return [shard for shard in (identifiers[k::workers] for k in range(workers)) if shard]
+
+
+def merge_outcomes(outcomes: List[Outcome]) -> Outcome:
+    """Reduce the outcomes of all virtual users to the worst code and any failures."""
+    code = max((code for code, _ in outcomes), default=0)
+    has_failures = any(has_failures for _, has_failures in outcomes)
+    return code, has_failures
+
+
+def collect_outcomes(identifiers: Sequence[str], results: Sequence[Union[Outcome, BaseException]]) -> Outcome:
+    """Log the virtual users that failed with an exception and merge the outcomes."""
+    outcomes = []
+    for user_id, result in zip(identifiers, results):
+        if isinstance(result, BaseException):
+            log.error(f'Virtual user ({user_id}) failed executing the scenario with ({result})')
+            outcomes.append((1, True))
+        else:
+            outcomes.append(result)
+
+    return merge_outcomes(outcomes)
+
+
+@no_type_check
+def pacing(cfg: object) -> Tuple[float, str, str]:
+    """Extract the open model parameters (rate, process, scope) of the setup - a zero rate means closed model."""
+    return (
+        getattr(cfg, 'arrival_rate', 0.0),
+        getattr(cfg, 'arrival_process', 'constant'),
+        getattr(cfg, 'arrival_scope', 'scenario'),
+    )
+
+
+@no_type_check
+def user_setup(cfg: object, user_id: str) -> object:
+    """Provide an own copy of the setup per virtual user."""
+    user_cfg = copy.copy(cfg)
+    user_cfg.user_id = user_id
+    return user_cfg
+
+
+@no_type_check
+def user_recorder(cfg: object, store: Store, user_id: str) -> Recorder:
+    """Provide the recorder per virtual user - pacing the transactions if the setup asks for it."""
+    rate, process, scope = pacing(cfg)
+    pacer = Schedule(rate, process) if rate and scope == 'transaction' else None
+    return store.recorder(pacer=pacer, user=user_id)
+
+
+@no_type_check
+def run_user(scenario: Scenario, cfg: object, store: Store, user_id: str) -> Outcome:
+    """Execute the scenario for a single virtual user with an own copy of the setup."""
+    return scenario(user_setup(cfg, user_id), user_recorder(cfg, store, user_id))
+
+
+@no_type_check
+def run_arrival(
+    scenario: Scenario, cfg: object, store: Store, user_id: str, scheduled: dti.datetime, **tags: object
+) -> Outcome:
+    """Execute the scenario for the virtual user of an arrival and record when it was scheduled and started."""
+    started = dti.datetime.now(tz=dti.timezone.utc)
+    recorder = store.recorder(
+        lag=started - scheduled,
+        user=user_id,
+        scheduled_ts=ns_of(scheduled),
+        started_ts=ns_of(started),
+        **tags,
+    )
+    return scenario(user_setup(cfg, user_id), recorder)
+
+
+@no_type_check
+def results_of(futures: List[concurrent.futures.Future]) -> List[Union[Outcome, BaseException]]:
+    """Harvest the outcomes or exceptions of the completed futures in submission order."""
+    return [future.exception() or future.result() for future in futures]
+
+
+@no_type_check
+def run_users(
+    scenario: Scenario, cfg: object, store: Store, users: int = 1, identifiers: Union[List[str], None] = None
+) -> Outcome:
+    """Execute the scenario for the virtual users in parallel on a thread pool."""
+    identifiers = user_ids(users) if identifiers is None else identifiers
+    users = len(identifiers)
+    if users == 1:
+        return run_user(scenario, cfg, store, identifiers[0])
+
+    log.info(f'Fanning out the scenario to {users} virtual users on a thread pool')
+    with concurrent.futures.ThreadPoolExecutor(max_workers=users, thread_name_prefix='user') as executor:
+        futures = [executor.submit(run_user, scenario, cfg, store, user_id) for user_id in identifiers]
+
+    return collect_outcomes(identifiers, results_of(futures))
+
+
+@no_type_check
+def run_arrivals(
+    scenario: Scenario, cfg: object, store: Store, users: int = 1, identifiers: Union[List[str], None] = None
+) -> Outcome:
+    """Start the scenario for the virtual users at the arrival rate no matter how long earlier arrivals take."""
+    identifiers = user_ids(users) if identifiers is None else identifiers
+    rate, process, _ = pacing(cfg)
+    log.info(f'Starting {len(identifiers)} scenario arrivals at {rate} per second ({process}) on a thread pool')
+    schedule = Schedule(rate, process)
+    futures = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(identifiers), thread_name_prefix='arrival') as executor:
+        for user_id in identifiers:
+            schedule.wait()
+            futures.append(executor.submit(run_arrival, scenario, cfg, store, user_id, schedule.intended()))
+            schedule.advance()
+
+    return collect_outcomes(identifiers, results_of(futures))
+
+
+@no_type_check
+def load_shape_of(cfg: object) -> Union[LoadShape, None]:
+    """Build the load shape the setup asks for (if any)."""
+    definition = getattr(cfg, 'load_shape', None)
+    return parse_stages(definition) if definition else None
+
+
+@no_type_check
+def run_session(
+    scenario: Scenario,
+    cfg: object,
+    store: Store,
+    shape: LoadShape,
+    user_id: str,
+    iterations: Iterator[int],
+    retired: threading.Event,
+) -> Outcome:
+    """Repeat the scenario for the virtual user until the shape ends or retires the user (after the iteration)."""
+    outcomes = []
+    while not retired.is_set() and not shape.finished():
+        iteration = next(iterations)
+        recorder = store.recorder(user=user_id, iteration=iteration, stage=shape.stage_name)
+        try:
+            outcomes.append(scenario(user_setup(cfg, user_id), recorder))
+        except Exception as err:  # noqa
+            log.error(f'Virtual user ({user_id}) failed executing iteration ({iteration}) with ({err})')
+            outcomes.append((1, True))
+        if outcomes[-1][0]:
+            break  # Failing the preconditions (e.g. the project) will not improve by repetition
+
+    return merge_outcomes(outcomes)
+
+
+@no_type_check
+def run_user_shape(scenario: Scenario, cfg: object, store: Store, shape: LoadShape) -> Outcome:
+    """Start and retire looping virtual users so that their number follows the stages of the shape."""
+    identifiers = user_ids(max(1, math.ceil(shape.peak())))
+    iterations = {user_id: itertools.count(1) for user_id in identifiers}
+    retirements = {user_id: threading.Event() for user_id in identifiers}
+    sessions: Dict[str, concurrent.futures.Future] = {}
+    futures, owners = [], []
+    log.info(f'Following the load shape of {len(shape.stages)} stages with up to {len(identifiers)} virtual users')
+    shape.start()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(identifiers), thread_name_prefix='user') as executor:
+        while not shape.finished():
+            target = round(shape.level())
+            for user_id in identifiers[:target]:
+                retirements[user_id].clear()
+                session = sessions.get(user_id)
+                if session is None or session.done() and not session.result()[0]:
+                    sessions[user_id] = executor.submit(
+                        run_session, scenario, cfg, store, shape, user_id, iterations[user_id], retirements[user_id]
+                    )
+                    futures.append(sessions[user_id])
+                    owners.append(user_id)
+            for user_id in identifiers[target:]:
+                retirements[user_id].set()
+            time.sleep(min(SHAPE_TICK_SECS, max(0.0, shape.total_secs - shape.elapsed())))
+
+    return collect_outcomes(owners, results_of(futures))
+
+
+@no_type_check
+def run_rate_shape(scenario: Scenario, cfg: object, store: Store, shape: LoadShape) -> Outcome:
+    """Start the scenario for fresh virtual users at the arrival rate following the stages of the shape."""
+    _, process, _ = pacing(cfg)
+    concurrency = max(1, getattr(cfg, 'users', 1))
+    log.info(
+        f'Following the load shape of {len(shape.stages)} stages with ({process}) arrivals'
+        f' for up to {concurrency} concurrent virtual users'
+    )
+    schedule = Schedule(gaps=shape.gaps(process))
+    shape.origin = schedule.origin_mono
+    schedule.advance()
+    futures, identifiers = [], []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='arrival') as executor:
+        while not schedule.exhausted:
+            schedule.wait()
+            identifiers.append(nth_user_id(len(identifiers) + 1))
+            futures.append(
+                executor.submit(
+                    run_arrival, scenario, cfg, store, identifiers[-1], schedule.intended(), stage=shape.stage_name
+                )
+            )
+            schedule.advance()
+
+    return collect_outcomes(identifiers, results_of(futures))
+
+
+@no_type_check
+async def gather_users(
+    scenario: AsyncScenario, cfg: object, store: Store, users: int = 1, identifiers: Union[List[str], None] = None
+) -> Outcome:
+    """Await the scenario for all virtual users concurrently on the running event loop."""
+    identifiers = user_ids(users) if identifiers is None else identifiers
+    results = await asyncio.gather(
+        *(scenario(user_setup(cfg, user_id), store.recorder(user=user_id)) for user_id in identifiers),
+        return_exceptions=True,
+    )
+    return collect_outcomes(identifiers, results)
+
+
+@no_type_check
+async def gather_arrivals(
+    scenario: AsyncScenario, cfg: object, store: Store, users: int = 1, identifiers: Union[List[str], None] = None
+) -> Outcome:
+    """Start the scenario tasks for the virtual users at the arrival rate and await all of them."""
+    identifiers = user_ids(users) if identifiers is None else identifiers
+    rate, process, _ = pacing(cfg)
+    schedule = Schedule(rate, process)
+    tasks = []
+    for user_id in identifiers:
+        await schedule.wait_async()
+        scheduled, started = schedule.intended(), dti.datetime.now(tz=dti.timezone.utc)
+        recorder = store.recorder(
+            lag=started - scheduled,
+            user=user_id,
+            scheduled_ts=ns_of(scheduled),
+            started_ts=ns_of(started),
+        )
+        tasks.append(asyncio.create_task(scenario(user_setup(cfg, user_id), recorder)))
+        schedule.advance()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return collect_outcomes(identifiers, results)
+
+
+@no_type_check
+async def pooled(virtual_users: Awaitable[Outcome]) -> Outcome:
+    """Await the virtual users and close the connections they shared before the event loop ends."""
+    try:
+        return await virtual_users
+    finally:
+        await pool.aclose()
+
+
+@no_type_check
+def run_users_async(
+    scenario: AsyncScenario, cfg: object, store: Store, users: int = 1, identifiers: Union[List[str], None] = None
+) -> Outcome:
+    """Execute the scenario for the virtual users as tasks of a single asyncio event loop."""
+    identifiers = user_ids(users) if identifiers is None else identifiers
+    rate, process, _ = pacing(cfg)
+    if rate:
+        log.info(f'Starting {len(identifiers)} scenario arrivals at {rate} per second ({process}) on an event loop')
+        return asyncio.run(pooled(gather_arrivals(scenario, cfg, store, identifiers=identifiers)))
+
+    log.info(f'Fanning out the scenario to {len(identifiers)} virtual users on an asyncio event loop')
+    return asyncio.run(pooled(gather_users(scenario, cfg, store, identifiers=identifiers)))
+
+
+@no_type_check
+def dispatch(
+    scenario: Union[Scenario, AsyncScenario],
+    cfg: object,
+    store: Store,
+    users: int = 1,
+    identifiers: Union[List[str], None] = None,
+    backend: str = 'threads',
+) -> Outcome:
+    """Execute the virtual users with the backend and the (closed or open) model the setup asks for."""
+    settings = pool.configure(cfg, len(identifiers) if identifiers else users)
+    log.info(f'Connection pools per {settings["scope"]} keep up to {settings["maxsize"]} connections per target')
+    if backend == 'asyncio':
+        return run_users_async(scenario, cfg, store, users, identifiers)
+    try:
+        return run_threads(scenario, cfg, store, users, identifiers)
+    finally:
+        pool.close()
+
+
+@no_type_check
+def run_threads(
+    scenario: Scenario, cfg: object, store: Store, users: int = 1, identifiers: Union[List[str], None] = None
+) -> Outcome:
+    """Execute the virtual users on threads following the load shape or the (closed or open) model."""
+    shape = load_shape_of(cfg)
+    if shape is not None and shape.kind == 'users':
+        return run_user_shape(scenario, cfg, store, shape)
+    if shape is not None:
+        return run_rate_shape(scenario, cfg, store, shape)
+
+    rate, _, scope = pacing(cfg)
+    if rate and scope == 'scenario':
+        return run_arrivals(scenario, cfg, store, users, identifiers)
+
+    return run_users(scenario, cfg, store, users, identifiers)
+
+
+@no_type_check
+def run_shard(
+    scenario: Union[Scenario, AsyncScenario],
+    backend: str,
+    settings: Dict[str, object],
+    context: Dict[str, object],
+    worker_id: str,
+    identifiers: List[str],
+) -> Tuple[str, Outcome]:
+    """Execute the virtual users of one worker process and dump the records into an own store shard."""
+    cfg = types.SimpleNamespace(**settings)
+    shard_context = {**context, 'worker': worker_id}
+    shard = open_store(context=shard_context, setup=cfg, folder_path=pathlib.Path(cfg.storage_path) / SHARDS_FOLDER)
+    log.info(f'Worker ({worker_id}) starts executing the scenario for {len(identifiers)} virtual users')
+    outcome = dispatch(scenario, cfg, shard, identifiers=identifiers, backend=backend)
+    shard.dump(end_time=dti.datetime.now(tz=dti.timezone.utc), has_failures=outcome[1])
+    return shard.db['_meta']['db_path'], outcome
+
+
+@no_type_check
+def run_processes(
+    scenario: Union[Scenario, AsyncScenario],
+    cfg: object,
+    store: Store,
+    users: int = 1,
+    processes: int = 1,
+    backend: str = 'threads',
+) -> Outcome:
+    """Shard the virtual users across a process pool and merge the worker shards into the store."""
+    shards = shard_users(user_ids(users), processes)
+    settings = {**cfg.__dict__, 'store_format': store.shard_format}
+    rate, _, scope = pacing(cfg)
+    if rate and scope == 'scenario':
+        settings['arrival_rate'] = rate / len(shards)  # The workers share the total arrival rate
+    log.info(f'Fanning out {users} virtual users to {len(shards)} worker processes using the {backend} backend')
+    outcomes = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        futures = {
+            executor.submit(run_shard, scenario, backend, settings, store.context, worker_id, identifiers): worker_id
+            for worker_id, identifiers in zip(worker_ids(len(shards)), shards)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                shard_path, outcome = future.result()
+            except Exception as err:  # noqa
+                log.error(f'Worker ({futures[future]}) failed executing the scenario with ({err})')
+                outcomes.append((1, True))
+                continue
+            outcomes.append(outcome)
+            store.absorb(load_store(shard_path))
+            pathlib.Path(shard_path).unlink()
+
+    store.db['_meta'].setdefault('workers', []).sort(key=lambda worker: worker['worker'])
+    try:
+        (pathlib.Path(cfg.storage_path) / SHARDS_FOLDER).rmdir()
+    except OSError:
+        log.warning('Kept the shards folder as it is not empty (e.g. due to failed workers or concurrent runs)')
+    return merge_outcomes(outcomes)
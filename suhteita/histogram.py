@@ -0,0 +1,134 @@
+"""Log-bucketed latency histograms (HDR style) of fixed memory that merge exactly across runs and nodes."""
+
+import math
+from typing import Dict, Iterable, List, Sequence, Union
+
+SUB_BUCKET_BITS = 7  # 128 linear sub-buckets per power of two - below 0.8 % relative error
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Histogram:
+    """Count non-negative integer values (microseconds) in log-linear buckets.
+
+    Values below two times the sub-bucket count are counted exactly, above that every power of two
+    is split into the same number of linear sub-buckets, so the relative error stays below
+    2 ** -SUB_BUCKET_BITS while a 64 bit range needs less than 8k buckets (kept sparse).
+    Percentiles answer the highest value equivalent to the bucket they fall into (never optimistic).
+    Histograms with the same sub-bucket bits merge exactly (bucket counts add up).
+    """
+
+    __slots__ = ('sub_bucket_bits', 'counts', 'count', 'min', 'max', 'total')
+
+    def __init__(self, sub_bucket_bits: int = SUB_BUCKET_BITS):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.min = 0
+        self.max = 0
+        self.total = 0
+
+    def index(self, value: int) -> int:
+        """Bucket index of the value."""
+        shift = max(0, value.bit_length() - self.sub_bucket_bits - 1)
+        return (shift << self.sub_bucket_bits) + (value >> shift)
+
+    def highest(self, index: int) -> int:
+        """Highest value equivalent to the bucket index."""
+        shift = max(0, (index >> self.sub_bucket_bits) - 1)
+        mantissa = index - (shift << self.sub_bucket_bits)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError(f'histogram value ({value}) is negative')
+        index = self.index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.min = value if not self.count else min(self.min, value)
+        self.max = max(self.max, value)
+        self.count += count
+        self.total += value * count
+
+    def merge(self, other: 'Histogram') -> 'Histogram':
+        """Add the counts of the other histogram (in place) and answer self."""
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError(
+                f'histogram sub-bucket bits ({other.sub_bucket_bits}) differ from ({self.sub_bucket_bits})'
+            )
+        if not other.count:
+            return self
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.min = other.min if not self.count else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+        return self
+
+    def percentile(self, point: float) -> Union[int, None]:
+        """Value at the percentile (nearest rank) - None for an empty histogram."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(round(self.count * point / 100, 9)))  # Rounding guards fractional points
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.highest(index), self.max)
+        return self.max
+
+    def percentiles(self, points: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Union[int, None]]:
+        return {f'p{point:g}': self.percentile(point) for point in points}
+
+    def mean(self) -> Union[float, None]:
+        return self.total / self.count if self.count else None
+
+    def as_dict(self) -> Dict[str, object]:
+        """Serializable form (buckets as sorted pairs of index and count)."""
+        return {
+            'sub_bucket_bits': self.sub_bucket_bits,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'total': self.total,
+            'buckets': [[index, self.counts[index]] for index in sorted(self.counts)],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> 'Histogram':
+        histogram = cls(data['sub_bucket_bits'])
+        histogram.counts = {index: count for index, count in data['buckets']}
+        histogram.count, histogram.min, histogram.max = data['count'], data['min'], data['max']
+        histogram.total = data['total']
+        return histogram
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Histogram):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    __hash__ = None  # type: ignore
+
+
+def merged(metas: Iterable[Dict[str, object]]) -> Dict[str, Histogram]:
+    """Merge the per label histograms of the meta data of many stores (runs, workers, nodes)."""
+    per_label: Dict[str, Histogram] = {}
+    for meta in metas:
+        for label, data in meta.get('histograms', {}).items():
+            histogram = Histogram.from_dict(data)
+            if label in per_label:
+                per_label[label].merge(histogram)
+            else:
+                per_label[label] = histogram
+    return per_label
+
+
+def as_dicts(histograms: Dict[str, Histogram]) -> Dict[str, Dict[str, object]]:
+    return {label: histograms[label].as_dict() for label in sorted(histograms)}
+
+
+def summary(histograms: Dict[str, Histogram], points: Sequence[float] = DEFAULT_PERCENTILES) -> List[List[object]]:
+    """Rows of label, count, percentiles, and max in microseconds."""
+    return [
+        [label, histogram.count, *histogram.percentiles(points).values(), histogram.max]
+        for label, histogram in sorted(histograms.items())
+    ]
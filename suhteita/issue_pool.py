@@ -0,0 +1,98 @@
+"""Pre-provision a pool of tagged issues so that read-heavy scenarios measure reads without creating issues.
+
+The scenarios creating their own issues tie the reads to the write throughput and to the freshness of the
+search index. The pool manager provides a configurable number of issues per target and project before the
+run - the keys kept locally first (if still tagged), then issues found per their POOL_LABEL tag, and finally
+new issues created with the tag - and persists the keys in the cache folder (cf. suhteita.projects). Every
+scenario run binds one key of the pool as pooled_key, handed out round-robin (per process) or at random.
+
+Provisioning is setup, so the requests it sends are logged but not recorded as events.
+"""
+
+import itertools
+import os
+import secrets
+import threading
+from typing import Dict, Iterator, List, no_type_check
+
+import suhteita.projects as projects
+from suhteita import log
+
+POOL_NAME = 'issues.json'
+POOL_LABEL = 'suhteita-pool'
+POOLED_KEY = 'pooled_key'  # The binding of the key handed out per scenario run
+ISSUE_ORDERS = ('round-robin', 'random')
+PAGE_SIZE = 100  # Issues per search request when listing the tagged issues
+
+TURNS: Dict[int, Iterator[int]] = {}  # Process id -> turns (forked processes start their own)
+LOCK = threading.Lock()
+
+
+def load(target: str, project: str) -> List[str]:
+    """Keys of the pool persisted for the project on the target."""
+    return list(projects.read_catalog(POOL_NAME).get(target, {}).get(project, []))
+
+
+def persist(target: str, project: str, keys: List[str]) -> None:
+    with projects.LOCK:
+        catalog = projects.read_catalog(POOL_NAME)
+        catalog.setdefault(target, {})[project] = keys
+        projects.write_catalog(catalog, POOL_NAME)
+
+
+@no_type_check
+def tagged(service: object, project: str) -> List[str]:
+    """Keys of all issues tagged for the pool (the oldest first) - paging through the search results."""
+    query = f'project = "{project}" AND labels = "{POOL_LABEL}" ORDER BY key ASC'
+    keys = []
+    while True:
+        found = service.jql(query, fields='key', start=len(keys), limit=PAGE_SIZE)
+        page = [issue['key'] for issue in found.get('issues', [])] if found else []
+        keys.extend(page)
+        if len(page) < PAGE_SIZE:
+            return keys
+
+
+@no_type_check
+def create(service: object, project: str, ts: str) -> str:
+    fields = {
+        'project': {'key': project},
+        'issuetype': {'name': 'Task'},
+        'summary': f'From REST we create for the read pool at {ts}',
+        'description': 'Kept for read-heavy workload mixes - please do not change.',
+        'labels': [POOL_LABEL],
+    }
+    return service.issue_create(fields=fields)['key']
+
+
+@no_type_check
+def provision(service: object, target: str, project: str, size: int, ts: str) -> List[str]:
+    """Provide the pool of size issues - the persisted keys first, then the tagged issues, and else new ones.
+
+    Persisted keys of issues no longer existing or no longer tagged are dropped (the search lists neither).
+    """
+    persisted, found = load(target, project), tagged(service, project)
+    existing = set(found)
+    keys = [key for key in persisted if key in existing]
+    if len(keys) < len(persisted):
+        stale = ', '.join(key for key in persisted if key not in existing)
+        log.warning(f'Issue pool of ({project}) dropped persisted keys no longer tagged or existing ({stale})')
+    if len(keys) < size:
+        keys.extend(key for key in found if key not in keys)
+        log.info(f'Issue pool of ({project}) adopted tagged issues up to ({min(len(keys), size)}) of ({size}) keys')
+    while len(keys) < size:
+        keys.append(create(service, project, ts))
+        log.info(f'Issue pool of ({project}) created ({keys[-1]}) as key ({len(keys)}) of ({size})')
+    persist(target, project, keys)
+    return keys[:size]
+
+
+def pick(keys: List[str], order: str = ISSUE_ORDERS[0]) -> str:
+    """Hand out the next key of the pool in the order (round-robin starts per process at an own offset)."""
+    if order not in ISSUE_ORDERS:
+        raise ValueError(f'issue order ({order}) is not one of {ISSUE_ORDERS}')
+    if order == 'random':
+        return secrets.choice(keys)
+    with LOCK:
+        turn = next(TURNS.setdefault(os.getpid(), itertools.count(os.getpid())))
+    return keys[turn % len(keys)]
@@ -0,0 +1,351 @@
+"""Pool the HTTP connections of the virtual users and tally the connections every step had to open.
+
+The scope decides who shares the keep-alive connections: every login its own pool (user - default)
+or all virtual users of a process one pool per target (shared). The pool size follows the virtual users
+unless given, so that the pool never silently caps the parallelism of a shared session.
+
+The tally of a step counts the requests and the new connections (TCP and TLS handshakes) of the step,
+so that the events tell if the step reused a kept-alive connection or paid for the handshakes.
+The tally also counts the bytes of the response bodies received on the wire (before any decoding).
+Actions may split the requests tallied so far off as own operation of the step (e.g. a lookup preceding
+the request the step measures), which the step records as separate event.
+The tally also sums the phases of the requests in microseconds - name resolution (dns), TCP connect,
+TLS handshake, time to the first byte of the response (ttfb) and body transfer - for the phases
+sub-fields of the events. The asyncio backend takes them from the httpx trace, where the connect
+phase includes the name resolution.
+"""
+
+import contextlib
+import contextvars
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Tuple, Union, no_type_check
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.connection import allowed_gai_family
+
+from suhteita.clock import NS_PER_USEC, Clocking
+
+POOL_SCOPES = ('user', 'shared')
+DEFAULT_POOL_CONNECTIONS = 10  # Hosts to keep pools for (cf. requests.adapters.DEFAULT_POOLSIZE)
+DEFAULT_POOL_MAXSIZE = 10  # Connections to keep alive per host
+DEFAULT_KEEPALIVE_SECS = 5.0  # Idle connections expire after (asyncio backend only - urllib3 keeps them)
+PHASES = ('dns_usecs', 'connect_usecs', 'tls_usecs', 'ttfb_usecs', 'transfer_usecs')
+HANDSHAKE_PHASES = PHASES[:3]
+TRACE_STARTS = {
+    'connect_tcp': 'connect_usecs',
+    'start_tls': 'tls_usecs',
+    'send_request_headers': 'ttfb_usecs',
+    'receive_response_body': 'transfer_usecs',
+}
+TRACE_ENDS = {
+    'connect_tcp': 'connect_usecs',
+    'start_tls': 'tls_usecs',
+    'receive_response_headers': 'ttfb_usecs',
+    'receive_response_body': 'transfer_usecs',
+}
+
+SETTINGS: Dict[str, object] = {
+    'scope': 'user',
+    'connections': DEFAULT_POOL_CONNECTIONS,
+    'maxsize': DEFAULT_POOL_MAXSIZE,
+    'keepalive_secs': DEFAULT_KEEPALIVE_SECS,
+}
+SHARED: Dict[object, object] = {}
+LOCK = threading.Lock()
+
+
+class Tally:
+    """Requests, new connections, and the phase durations (nanoseconds) of one step."""
+
+    __slots__ = ('requests', 'connections', 'received', 'phases', 'marks', 'operations', 'suffix')
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.connections = 0
+        self.received = 0
+        self.phases: Dict[str, int] = {}
+        self.marks: Dict[str, int] = {}
+        self.operations: List[Tuple[str, Clocking, str, Dict[str, object]]] = []
+        self.suffix = ''  # Qualifies the label of the step event (e.g. answers from a local cache)
+
+    def split_off(self, label: str, clocking: Clocking, comment: str = '') -> None:
+        """Set the requests tallied so far apart as own operation (label, clocking, comment, and tags)."""
+        self.operations.append((label, clocking, comment, self.tags()))
+        self.requests = self.connections = self.received = 0
+        self.phases = {}
+
+    def add(self, phase: str, duration_ns: int) -> None:
+        self.phases[phase] = self.phases.get(phase, 0) + max(0, duration_ns)
+
+    def handshakes_ns(self) -> int:
+        return sum(self.phases.get(phase, 0) for phase in HANDSHAKE_PHASES)
+
+    def tags(self) -> Dict[str, object]:
+        """Event tags telling if the requests of the step reused connections (none for steps without requests)."""
+        if not self.requests:
+            return {}
+        tags: Dict[str, object] = {
+            'reused': not self.connections,
+            'new_connections': self.connections,
+            'response_bytes': self.received,
+        }
+        if self.phases:
+            tags['phases'] = {phase: self.phases[phase] // NS_PER_USEC for phase in PHASES if phase in self.phases}
+        return tags
+
+
+TALLY: contextvars.ContextVar[Union[Tally, None]] = contextvars.ContextVar('tally', default=None)
+
+
+def track() -> Tally:
+    """Start a fresh tally for the step executing in the current thread or task."""
+    tally = Tally()
+    TALLY.set(tally)
+    return tally
+
+
+@contextlib.contextmanager
+def untracked() -> Iterator[None]:
+    """Keep the requests of the block out of the tally of the current step (e.g. follow-ups outside the clocking)."""
+    token = TALLY.set(None)
+    try:
+        yield
+    finally:
+        TALLY.reset(token)
+
+
+def count_request() -> None:
+    tally = TALLY.get()
+    if tally is not None:
+        tally.requests += 1
+
+
+def count_connection() -> None:
+    tally = TALLY.get()
+    if tally is not None:
+        tally.connections += 1
+
+
+def count_bytes(received: int) -> None:
+    tally = TALLY.get()
+    if tally is not None:
+        tally.received += received
+
+
+def split_off(label: str, clocking: Clocking, comment: str = '') -> None:
+    """Record the requests of the current step so far as own operation (nothing is recorded outside of steps)."""
+    tally = TALLY.get()
+    if tally is not None:
+        tally.split_off(label, clocking, comment)
+
+
+def qualify(suffix: str) -> None:
+    """Record the event of the current step under its label with the suffix (nothing happens outside of steps)."""
+    tally = TALLY.get()
+    if tally is not None:
+        tally.suffix = suffix
+
+
+def add_phase(phase: str, duration_ns: int) -> None:
+    tally = TALLY.get()
+    if tally is not None:
+        tally.add(phase, duration_ns)
+
+
+@no_type_check
+class TimedConnection:
+    """Connection mixin resolving the host itself to time the name resolution apart from the TCP connect.
+
+    The TLS handshake is the remainder of the connect after resolution and TCP connect.
+    """
+
+    encrypted = False
+
+    @no_type_check
+    def connect(self) -> None:
+        count_connection()
+        self.resolve_ns = self.tcp_ns = 0
+        started = time.perf_counter_ns()
+        super().connect()
+        if self.encrypted:
+            add_phase('tls_usecs', time.perf_counter_ns() - started - self.resolve_ns - self.tcp_ns)
+
+    @no_type_check
+    def _new_conn(self):
+        host = self._dns_host
+        started = time.perf_counter_ns()
+        try:
+            addresses = socket.getaddrinfo(host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError:
+            return super()._new_conn()  # Let urllib3 raise its name resolution error
+        resolved = time.perf_counter_ns()
+        self.resolve_ns = resolved - started
+        add_phase('dns_usecs', self.resolve_ns)
+        error = None
+        try:
+            for ip in dict.fromkeys(address[4][0] for address in addresses):
+                self._dns_host = ip
+                try:
+                    return super()._new_conn()
+                except OSError as err:
+                    error = err
+            raise error
+        finally:
+            self._dns_host = host
+            self.tcp_ns = time.perf_counter_ns() - resolved
+            add_phase('connect_usecs', self.tcp_ns)
+
+
+class TallyingHTTPConnection(TimedConnection, HTTPConnection):
+    pass
+
+
+class TallyingHTTPSConnection(TimedConnection, HTTPSConnection):
+    encrypted = True
+
+
+class TallyingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TallyingHTTPConnection
+
+
+class TallyingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TallyingHTTPSConnection
+
+
+@no_type_check
+class TallyingAdapter(HTTPAdapter):
+    """Transport adapter of the requests sessions counting the requests and the connections opened for them."""
+
+    @no_type_check
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TallyingHTTPConnectionPool,
+            'https': TallyingHTTPSConnectionPool,
+        }
+
+    @no_type_check
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        """Send the request and time the first byte (less any handshakes) and the body transfer (unless streamed)."""
+        count_request()
+        tally = TALLY.get()
+        if tally is None:
+            return super().send(request, stream, timeout, verify, cert, proxies)
+        handshakes_ns = tally.handshakes_ns()
+        started = time.perf_counter_ns()
+        response = super().send(request, stream, timeout, verify, cert, proxies)
+        first_byte = time.perf_counter_ns()
+        tally.add('ttfb_usecs', first_byte - started - (tally.handshakes_ns() - handshakes_ns))
+        if not stream:
+            response.content  # Read here (as the session would right after) to time the transfer
+            tally.add('transfer_usecs', time.perf_counter_ns() - first_byte)
+            tally.received += response.raw.tell()  # Bytes pulled over the wire (e.g. before decompressing)
+        return response
+
+
+@no_type_check
+async def trace(event_name: str, info: Dict[str, object]) -> None:
+    """Trace hook of the httpx requests (cf. the trace extension) counting the connections and timing the phases.
+
+    The events are named per layer and step with the state last (e.g. http11.send_request_headers.started).
+    """
+    tally = TALLY.get()
+    if tally is None:
+        return
+    if event_name == 'connection.connect_tcp.complete':
+        tally.connections += 1
+    name, _, state = event_name.rpartition('.')
+    step = name.rpartition('.')[2]
+    if state == 'started' and step in TRACE_STARTS:
+        tally.marks[TRACE_STARTS[step]] = time.perf_counter_ns()
+    elif state == 'complete' and TRACE_ENDS.get(step) in tally.marks:
+        phase = TRACE_ENDS[step]
+        tally.add(phase, time.perf_counter_ns() - tally.marks.pop(phase))
+
+
+@no_type_check
+def configure(cfg: object, users: int = 1) -> Dict[str, object]:
+    """Take the pool settings of the setup for the virtual users of this process and answer them.
+
+    Without a pool_maxsize the shared pool keeps a connection per virtual user (at least the default),
+    and the pool of a single virtual user keeps the default of connections (for concurrent steps).
+    """
+    scope = getattr(cfg, 'pool_scope', 'user') or 'user'
+    if scope not in POOL_SCOPES:
+        raise ValueError(f'pool scope ({scope}) is not one of {POOL_SCOPES}')
+    maxsize = getattr(cfg, 'pool_maxsize', 0)
+    if not maxsize:
+        maxsize = max(DEFAULT_POOL_MAXSIZE, users) if scope == 'shared' else DEFAULT_POOL_MAXSIZE
+    SETTINGS.update(
+        scope=scope,
+        connections=getattr(cfg, 'pool_connections', 0) or DEFAULT_POOL_CONNECTIONS,
+        maxsize=maxsize,
+        keepalive_secs=getattr(cfg, 'keepalive_secs', 0) or DEFAULT_KEEPALIVE_SECS,
+    )
+    return dict(SETTINGS)
+
+
+@no_type_check
+def is_shared() -> bool:
+    return SETTINGS['scope'] == 'shared'
+
+
+@no_type_check
+def new_session() -> requests.Session:
+    """Session with the tallying adapter sized per settings (never blocking on a depleted pool)."""
+    session = requests.Session()
+    adapter = TallyingAdapter(pool_connections=SETTINGS['connections'], pool_maxsize=SETTINGS['maxsize'])
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+@no_type_check
+def session(target_url: str) -> requests.Session:
+    """Session for a login - the one of the target shared within the process or a new one per scope."""
+    if not is_shared():
+        return new_session()
+    with LOCK:
+        if target_url not in SHARED:
+            SHARED[target_url] = new_session()
+        return SHARED[target_url]
+
+
+@no_type_check
+def limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=SETTINGS['maxsize'],
+        max_keepalive_connections=SETTINGS['maxsize'],
+        keepalive_expiry=SETTINGS['keepalive_secs'],
+    )
+
+
+@no_type_check
+def async_client(key: Tuple[str, ...], connect: Callable[[], httpx.AsyncClient]) -> httpx.AsyncClient:
+    """Client of the key shared within the event loop or a new one per scope (cf. aclose for the shared)."""
+    if not is_shared():
+        return connect()
+    if key not in SHARED:
+        SHARED[key] = connect()
+    return SHARED[key]
+
+
+@no_type_check
+def close() -> None:
+    """Close the shared sessions (the threads backend calls this when the virtual users are done)."""
+    with LOCK:
+        for key in [key for key, pooled in SHARED.items() if isinstance(pooled, requests.Session)]:
+            SHARED.pop(key).close()
+
+
+@no_type_check
+async def aclose() -> None:
+    """Close the shared clients of the event loop (the asyncio backend awaits this before the loop ends)."""
+    for key in [key for key, pooled in SHARED.items() if isinstance(pooled, httpx.AsyncClient)]:
+        await SHARED.pop(key).aclose()
@@ -0,0 +1,96 @@
+"""Keep a local catalog of the project keys per target so that runs verify the target project without listing all.
+
+Listing all projects (PROJECTS) returns thousands of projects on large instances and dominates the client CPU
+of short runs. The catalog file holds the project keys per target with the time they were last seen. The
+PROJECT_EXISTS check answers from the catalog while the key was seen within the TTL, and else refreshes the
+key conditionally - requesting the one project (never the list). Answers from the catalog are recorded as
+PROJECT_EXISTS_CACHED, so that the percentiles of the label only cover the requests. Listing all projects
+refreshes the keys of the target as side effect (outside the clocking).
+
+The catalog lives in the cache folder (SUHTEITA_CACHE, else suhteita below XDG_CACHE_HOME or ~/.cache)
+and is replaced at once on every update, so concurrent processes at worst repeat a refresh.
+"""
+
+import json
+import os
+import pathlib
+import threading
+import time
+from typing import Any, Dict, Iterable, Union
+
+from suhteita import CACHE, ENCODING, log
+
+CATALOG_NAME = 'projects.json'
+CACHED_SUFFIX = '_CACHED'  # Qualifies the labels of the checks answered from the catalog (no request)
+DEFAULT_TTL_SECS = 86_400.0  # A day
+
+CACHE_FOLDER = pathlib.Path(
+    CACHE or pathlib.Path(os.getenv('XDG_CACHE_HOME', '') or pathlib.Path.home() / '.cache') / 'suhteita'
+)
+MEMO: Dict[str, Dict[str, float]] = {}  # Target -> project key -> seen (epoch seconds)
+LOCK = threading.Lock()
+
+
+def catalog_path(name: str = CATALOG_NAME) -> pathlib.Path:
+    return CACHE_FOLDER / name
+
+
+def read_catalog(name: str = CATALOG_NAME) -> Dict[str, Dict[str, Any]]:
+    """Entries per target of the named catalog, per default the project keys with the time they were last seen.
+
+    A missing or unreadable catalog reads as empty.
+    """
+    path = catalog_path(name)
+    try:
+        with open(path, 'rt', encoding=ENCODING) as handle:
+            return dict(json.load(handle).get('targets', {}))
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, AttributeError) as err:
+        log.warning(f'Ignoring unreadable catalog ({path}) with ({err})')
+        return {}
+
+
+def write_catalog(catalog: Dict[str, Dict[str, Any]], name: str = CATALOG_NAME) -> None:
+    """Replace the catalog file at once (the partial file never shows as catalog)."""
+    path = catalog_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(f'{path.suffix}.{os.getpid()}.partial')
+    with open(partial, 'wt', encoding=ENCODING) as handle:
+        json.dump({'targets': catalog}, handle)
+    os.replace(partial, path)
+
+
+def seen(target: str, key: str) -> Union[float, None]:
+    """Time the project was last seen on the target (None if never)."""
+    with LOCK:
+        if not MEMO:
+            MEMO.update(read_catalog())
+        return MEMO.get(target, {}).get(key)
+
+
+def is_fresh(target: str, key: str, ttl_secs: float = DEFAULT_TTL_SECS) -> bool:
+    """Answer if the project was seen on the target within the TTL (never with a TTL of zero)."""
+    when = seen(target, key)
+    return ttl_secs > 0 and when is not None and time.time() - when < ttl_secs
+
+
+def update(target: str, found: Iterable[str] = (), missing: Iterable[str] = (), complete: bool = False) -> None:
+    """Merge the keys found (and drop the missing) into the catalog - a complete listing replaces the target."""
+    now = time.time()
+    with LOCK:
+        catalog = read_catalog()
+        known = {} if complete else catalog.get(target, {})
+        known.update((key, now) for key in found)
+        for key in missing:
+            known.pop(key, None)
+        catalog[target] = known
+        write_catalog(catalog)
+        MEMO.clear()
+        MEMO.update(catalog)
+
+
+def forget() -> None:
+    """Drop the catalog kept in memory (the next check reads the file again)."""
+    with LOCK:
+        MEMO.clear()
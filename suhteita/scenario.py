@@ -0,0 +1,478 @@
+"""Declarative scenarios - steps referencing actions by name with variable bindings and expected outcomes."""
+
+import asyncio
+import concurrent.futures
+import importlib
+import json
+import pathlib
+import string
+import sys
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Set, Tuple, Union, no_type_check
+
+import suhteita.pool as pool
+from suhteita import ENCODING, extract_fields, log
+from suhteita.clock import Clocking
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:  # pragma: no cover
+    import tomli as tomllib
+
+SCENARIOS_FOLDER = pathlib.Path(__file__).parent / 'scenarios'
+DEFAULT_DEFINITION = 'twenty_seven'
+REFERENCE_MARKER = '$'
+COUNT_MARKER = '#'
+ACTIONS = 'suhteita.ticket_system_actions'
+ACTIONS_ASYNC = 'suhteita.ticket_system_actions_async'
+
+Outcome = Tuple[int, bool]  # (return code, has failures)
+Seed = Callable[[object, object], Dict[str, object]]
+
+
+class Bindings(dict):
+    """Variables of a scenario run - the key #name resolves to the length of the value bound to name."""
+
+    def __missing__(self, key: str) -> object:
+        if key.startswith(COUNT_MARKER):
+            return len(self[key[1:]])
+        raise KeyError(key)
+
+
+Resolver = Callable[[Bindings], object]
+
+
+class Step(NamedTuple):
+    """A step calls the action with the resolved args and binds the results (after the clocking) to names."""
+
+    label: str
+    action: str
+    args: Dict[str, object]
+    bind: List[str]
+    expect: Dict[str, object]
+    require: Dict[str, object]
+    note: str
+    comment: str
+    critical: bool
+    debug: str
+
+
+class Reference(NamedTuple):
+    """A reference logs (fields of) a bound value once all steps passed."""
+
+    tag: str
+    text: str
+    binding: str
+    fields: List[str]
+
+
+class Definition(NamedTuple):
+    """A scenario as data - the single source of the label sequence for execution and analysis.
+
+    Shared bindings (e.g. the service) are only read by the steps and do not order steps referencing them.
+    """
+
+    name: str
+    description: str
+    steps: List[Step]
+    references: List[Reference]
+    shared: List[str] = []
+
+    def labels(self) -> List[str]:
+        """Labels of the steps in scenario order."""
+        return [step.label for step in self.steps]
+
+    def step_map(self) -> Dict[int, str]:
+        """Map the 1-based step ranks to the labels."""
+        return {rank: step.label for rank, step in enumerate(self.steps, start=1)}
+
+    def label_map(self) -> Dict[str, List[int]]:
+        """Map the labels (sorted) to the ranks of the steps carrying them."""
+        ranks: Dict[str, List[int]] = {}
+        for rank, label in self.step_map().items():
+            ranks.setdefault(label, []).append(rank)
+        return {label: ranks[label] for label in sorted(ranks)}
+
+
+def parse_definition(data: Dict[str, object]) -> Definition:
+    """Validate the scenario definition (mapping with a name and steps each having a label and an action)."""
+    steps = []
+    for rank, entry in enumerate(data.get('steps', []), start=1):
+        if not entry.get('label') or not entry.get('action'):
+            raise ValueError(f'step {rank} requires a label and an action')
+        steps.append(
+            Step(
+                label=entry['label'],
+                action=entry['action'],
+                args=dict(entry.get('args', {})),
+                bind=list(entry.get('bind', [])),
+                expect=dict(entry.get('expect', {})),
+                require=dict(entry.get('require', {})),
+                note=entry.get('note', ''),
+                comment=entry.get('comment', ''),
+                critical=bool(entry.get('critical', False)),
+                debug=entry.get('debug', ''),
+            )
+        )
+    if not steps:
+        raise ValueError('scenario definition requires at least one step')
+    references = [
+        Reference(entry['tag'], entry.get('text', ''), entry['binding'], list(entry.get('fields', [])))
+        for entry in data.get('references', [])
+    ]
+    name = str(data.get('name', 'unknown'))
+    description = str(data.get('description', f'{len(steps)}-steps {name}'))
+    return Definition(name, description, steps, references, list(data.get('shared', [])))
+
+
+def available_definitions() -> List[str]:
+    """Names of the scenario definitions shipped with the package."""
+    return sorted(path.stem for path in SCENARIOS_FOLDER.glob('*.toml'))
+
+
+def load_definition(name_or_path: Union[pathlib.Path, str] = DEFAULT_DEFINITION) -> Definition:
+    """Load the scenario definition from a TOML or JSON file or by the name of a shipped definition."""
+    path = pathlib.Path(name_or_path)
+    if not path.is_file():
+        path = SCENARIOS_FOLDER / f'{name_or_path}.toml'
+        if not path.is_file():
+            raise ValueError(
+                f'scenario definition ({name_or_path}) is neither a file nor one of {available_definitions()}'
+            )
+    if path.suffix.lower() == '.json':
+        with open(path, 'rt', encoding=ENCODING) as handle:
+            return parse_definition(json.load(handle))
+    with open(path, 'rb') as handle:
+        return parse_definition(tomllib.load(handle))
+
+
+@no_type_check
+def references_of(value: object) -> Set[str]:
+    """Names of the bindings a value of the definition references ($name, {name}, {#name}, or {name[key]})."""
+    if isinstance(value, str) and value.startswith(REFERENCE_MARKER):
+        return {value[len(REFERENCE_MARKER) :]}
+    if isinstance(value, str):
+        fields = (field for _, field, _, _ in string.Formatter().parse(value) if field)
+        return {field.lstrip(COUNT_MARKER).split('.')[0].split('[')[0] for field in fields}
+    if isinstance(value, list):
+        return set().union(*(references_of(item) for item in value))
+    if isinstance(value, dict):
+        return set().union(*(references_of(item) for item in value.values()))
+    return set()
+
+
+@no_type_check
+def dependencies(definition: Definition) -> List[FrozenSet[int]]:
+    """Derive the ranks of the steps each step has to wait for from the bindings the steps reference.
+
+    A step waits for the steps producing the bindings it references and - unless the binding is shared -
+    for the latest earlier step referencing the same produced binding (e.g. all steps acting on the issue
+    c_key keep their order). Bindings of the setup are read only and do not order any steps.
+    Steps with a precondition are barriers separating all earlier from all later steps.
+    """
+    afters, producers, touches, barrier = [], {}, {}, None
+    for rank, step in enumerate(definition.steps, start=1):
+        names = references_of([step.args, step.expect, step.require, step.note, step.comment])
+        after = {producers[name] for name in names if name in producers}
+        after.update(touches[name] for name in names if name in touches and name not in definition.shared)
+        if barrier is not None:
+            after.add(barrier)
+        if step.require:
+            after, barrier = set(range(1, rank)), rank
+        afters.append(frozenset(after))
+        for name in step.bind:
+            producers[name] = rank
+        touches.update((name, rank) for name in names.union(step.bind) if name in producers)
+    return afters
+
+
+def width(afters: List[FrozenSet[int]]) -> int:
+    """Most steps that can run at the same time - the largest antichain of the dependencies (cf. Dilworth).
+
+    Running steps never depend on each other, so the width bounds the threads a virtual user needs. The
+    largest antichain has as many steps as the fewest chains covering all steps - the steps less the
+    maximum matching of every step with a later step depending on it (directly or transitively).
+    """
+    ancestors: List[Set[int]] = []
+    for after in afters:
+        ancestors.append(set(after).union(*(ancestors[rank - 1] for rank in after)))
+    successor_of: Dict[int, int] = {}  # Matched later step -> earlier step
+
+    def augment(rank: int, seen: Set[int]) -> bool:
+        for later, earlier in enumerate(ancestors, start=1):
+            if rank in earlier and later not in seen:
+                seen.add(later)
+                if later not in successor_of or augment(successor_of[later], seen):
+                    successor_of[later] = rank
+                    return True
+        return False
+
+    return len(afters) - sum(augment(rank, set()) for rank in range(1, len(afters) + 1))
+
+
+@no_type_check
+def compile_value(value: object) -> Resolver:
+    """Turn a value of the definition into a resolver ($name references, {name} templates, or literals)."""
+    if isinstance(value, str) and value.startswith(REFERENCE_MARKER):
+        name = value[len(REFERENCE_MARKER) :]
+        return lambda bindings: bindings[name]
+    if isinstance(value, str) and '{' in value:
+        return lambda bindings: value.format_map(bindings)
+    if isinstance(value, list):
+        resolvers = [compile_value(item) for item in value]
+        return lambda bindings: [resolver(bindings) for resolver in resolvers]
+    if isinstance(value, dict):
+        resolvers = {key: compile_value(item) for key, item in value.items()}
+        return lambda bindings: {key: resolver(bindings) for key, resolver in resolvers.items()}
+    return lambda bindings: value
+
+
+@no_type_check
+def compile_expect(expect: Dict[str, object]) -> Callable[[Bindings], bool]:
+    """Turn the expected outcome into a predicate (truthy binding or case insensitive equality)."""
+    if not expect:
+        return lambda bindings: True
+    actual = compile_value(f'{REFERENCE_MARKER}{expect["binding"]}')
+    if 'equals' not in expect:
+        return lambda bindings: bool(actual(bindings))
+    expected = compile_value(expect['equals'])
+    return lambda bindings: str(actual(bindings)).lower() == str(expected(bindings)).lower()
+
+
+@no_type_check
+def compile_require(require: Dict[str, object]) -> Callable[[Bindings], Tuple[bool, object, List[object]]]:
+    """Turn the precondition into a check answering if it holds for the value and the candidates checked."""
+    if not require:
+        return lambda bindings: (True, None, [])
+    items = compile_value(f'{REFERENCE_MARKER}{require["binding"]}')
+    if 'contains' not in require:
+        return lambda bindings: (bool(items(bindings)), items(bindings), [])
+    wanted = compile_value(require['contains'])
+    key = require.get('key')
+
+    def check(bindings: Bindings) -> Tuple[bool, object, List[object]]:
+        candidates = [item[key] if key else item for item in items(bindings)]
+        value = wanted(bindings)
+        return bool(value) and value in candidates, value, candidates
+
+    return check
+
+
+class CompiledStep(NamedTuple):
+    """A step with the action resolved and all values of the definition turned into resolvers."""
+
+    rank: int
+    step: Step
+    after: FrozenSet[int]
+    function: Callable[..., object]
+    args: Dict[str, Resolver]
+    expect: Callable[[Bindings], bool]
+    require: Callable[[Bindings], Tuple[bool, object, List[object]]]
+    note: Resolver
+    comment: Resolver
+
+
+@no_type_check
+def compile_steps(definition: Definition, actions: object) -> List[CompiledStep]:
+    """Resolve the actions and the values of all steps once so that executing them needs no interpretation."""
+    compiled = []
+    for (rank, step), after in zip(enumerate(definition.steps, start=1), dependencies(definition)):
+        function = getattr(actions, step.action, None)
+        if not callable(function):
+            raise ValueError(f'step {rank} references unknown action ({step.action}) of {actions.__name__}')
+        compiled.append(
+            CompiledStep(
+                rank=rank,
+                step=step,
+                after=after,
+                function=function,
+                args={name: compile_value(value) for name, value in step.args.items()},
+                expect=compile_expect(step.expect),
+                require=compile_require(step.require),
+                note=compile_value(step.note),
+                comment=compile_value(step.comment),
+            )
+        )
+    return compiled
+
+
+@no_type_check
+def split_result(result: object) -> Tuple[Clocking, Tuple[object, ...]]:
+    """Separate the clocking from the values an action returns (some actions only return the clocking)."""
+    if isinstance(result, Clocking):
+        return result, ()
+    return result[0], tuple(result[1:])
+
+
+@no_type_check
+def settle(
+    compiled: CompiledStep, bindings: Bindings, result: object, store: object, tally: Union[pool.Tally, None] = None
+) -> Tuple[bool, bool]:
+    """Bind the results, record the event, and answer if the scenario must stop and if the step failed.
+
+    The tally of the step tags the event with the connections its requests opened (cf. suhteita.pool),
+    and the operations the action split off (e.g. lookups) are recorded as own events before the step.
+    Actions answering without requests may qualify the label of the event (e.g. PROJECT_EXISTS_CACHED).
+    """
+    step = compiled.step
+    clk, values = split_result(result)
+    bindings.update(zip(step.bind, values))
+    ok = compiled.expect(bindings)
+    scope = Bindings(bindings, ok=ok)  # Concurrent steps must not see the outcome of each other
+    log.info(f'^ {compiled.note(scope)}; CLK={clk}')
+    tags = tally.tags() if tally is not None else {}
+    for label, op_clk, op_comment, op_tags in tally.operations if tally is not None else ():
+        store.add_operation(label, op_clk, op_comment, step=compiled.rank, **op_tags)
+    label = f'{step.label}{tally.suffix}' if tally is not None else step.label
+    store.add(label, ok, clk, compiled.comment(scope), step=compiled.rank, **tags)
+    if step.debug:
+        log.debug(json.dumps(bindings[step.debug], indent=2))
+
+    holds, value, candidates = compiled.require(bindings)
+    if not holds and 'contains' not in step.require:
+        log.error(f'Belt and braces - the {step.require["binding"]} ({value}) does not hold')
+        return True, True
+    if not holds:
+        log.error(f'Belt and braces - verify the selection ({value}) against the {step.require["binding"]}:')
+        log.info(json.dumps(sorted(candidates), indent=2))
+        return True, True
+    if step.require and 'contains' not in step.require:
+        log.info(f'Verified the {step.require["binding"]} ({value}) to hold')
+    elif step.require:
+        log.info(f'Verified the selection ({value}) to be present in the {step.require["binding"]}')
+    return False, step.critical and not ok
+
+
+@no_type_check
+def log_references(definition: Definition, bindings: Bindings) -> None:
+    """Log the references (fields of bound values) of the definition."""
+    log.info('# References:')
+    for reference in definition.references:
+        value = bindings[reference.binding]
+        extract = extract_fields(value, fields=reference.fields) if reference.fields else value
+        log.info(f'[{reference.tag}]{" " * max(1, 13 - len(reference.tag))}{reference.text} ({extract})')
+    log.info('-' * 84)
+
+
+class Executor:
+    """Execute the compiled steps of a definition for one virtual user per call (the scenario for the engine).
+
+    The actions are given as module name and the executor pickles as its definition, so that worker
+    processes compile their own steps. If the setup asks for concurrent steps, every step starts as soon
+    as the steps it depends on completed, so the wall time of the scenario follows the critical path.
+    """
+
+    actions_module = ACTIONS
+
+    @no_type_check
+    def __init__(self, definition: Definition, seed: Seed, actions_module: Union[str, None] = None):
+        self.definition = definition
+        self.seed = seed
+        self.actions_module = actions_module if actions_module else self.actions_module
+        self.steps = compile_steps(definition, importlib.import_module(self.actions_module))
+        self.width = width([compiled.after for compiled in self.steps])
+
+    @no_type_check
+    def __reduce__(self):
+        return self.__class__, (self.definition, self.seed, self.actions_module)
+
+    @no_type_check
+    def bindings(self, cfg: object, store: object) -> Bindings:
+        """Seed the variables of the run from the setup and the seed function."""
+        return Bindings({**vars(cfg), **self.seed(cfg, store)})
+
+    @no_type_check
+    def execute(self, compiled: CompiledStep, bindings: Bindings, store: object) -> Tuple[bool, bool]:
+        """Call the action of the step and settle the result."""
+        log.info(f'- Step <{compiled.rank :02d}> {compiled.step.label}')
+        tally = pool.track()
+        result = compiled.function(**{name: resolver(bindings) for name, resolver in compiled.args.items()})
+        return settle(compiled, bindings, result, store, tally)
+
+    @no_type_check
+    def __call__(self, cfg: object, store: object) -> Outcome:
+        bindings = self.bindings(cfg, store)
+        if getattr(cfg, 'concurrent_steps', False):
+            outcomes = self.run_graph(bindings, store)
+        else:
+            outcomes = []
+            for compiled in self.steps:
+                outcomes.append(self.execute(compiled, bindings, store))
+                if outcomes[-1][0]:
+                    break
+        if any(stop for stop, _ in outcomes):
+            return 1, True
+
+        log_references(self.definition, bindings)
+        return 0, any(failed for _, failed in outcomes)
+
+    @no_type_check
+    def run_graph(self, bindings: Bindings, store: object) -> List[Tuple[bool, bool]]:
+        """Start every step once its dependencies completed on a pool as wide as the graph (no starts after a stop)."""
+        pending = {compiled.rank: compiled for compiled in self.steps}
+        running, completed, outcomes = {}, set(), []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.width, thread_name_prefix='step') as executor:
+            while running or pending and not any(stop for stop, _ in outcomes):
+                for rank in [rank for rank, compiled in pending.items() if compiled.after <= completed]:
+                    running[executor.submit(self.execute, pending.pop(rank), bindings, store)] = rank
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    completed.add(running.pop(future))
+                    outcomes.append(future.result())
+        return outcomes
+
+
+class AsyncExecutor(Executor):
+    """Await the compiled steps of a definition against the asyncio actions and close the bound service."""
+
+    actions_module = ACTIONS_ASYNC
+
+    @no_type_check
+    async def execute(self, compiled: CompiledStep, bindings: Bindings, store: object) -> Tuple[bool, bool]:
+        """Await the action of the step and settle the result."""
+        log.info(f'- Step <{compiled.rank :02d}> {compiled.step.label}')
+        args = {name: resolver(bindings) for name, resolver in compiled.args.items()}
+        tally = pool.track()
+        return settle(compiled, bindings, await compiled.function(**args), store, tally)
+
+    @no_type_check
+    async def __call__(self, cfg: object, store: object) -> Outcome:
+        bindings = self.bindings(cfg, store)
+        try:
+            if getattr(cfg, 'concurrent_steps', False):
+                outcomes = await self.run_graph(bindings, store)
+            else:
+                outcomes = []
+                for compiled in self.steps:
+                    outcomes.append(await self.execute(compiled, bindings, store))
+                    if outcomes[-1][0]:
+                        break
+        finally:
+            if 'service' in bindings:
+                await bindings['service'].close()
+        if any(stop for stop, _ in outcomes):
+            return 1, True
+
+        log_references(self.definition, bindings)
+        return 0, any(failed for _, failed in outcomes)
+
+    @no_type_check
+    async def run_graph(self, bindings: Bindings, store: object) -> List[Tuple[bool, bool]]:
+        """Start every step as task awaiting the tasks of its dependencies (no new starts after a stop)."""
+        tasks, stopped = {}, asyncio.Event()
+
+        async def step_task(compiled: CompiledStep) -> Union[Tuple[bool, bool], None]:
+            await asyncio.gather(*(tasks[rank] for rank in compiled.after))
+            if stopped.is_set():
+                return None
+            outcome = await self.execute(compiled, bindings, store)
+            if outcome[0]:
+                stopped.set()
+            return outcome
+
+        for compiled in self.steps:
+            tasks[compiled.rank] = asyncio.ensure_future(step_task(compiled))
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return [result for result in results if result is not None]
@@ -0,0 +1,73 @@
+"""Schedule arrivals of scenarios or transactions at target rates independent of response times (open model)."""
+
+import asyncio
+import datetime as dti
+import random
+import time
+from typing import Iterator, Union
+
+ARRIVAL_PROCESSES = ('constant', 'poisson')
+ARRIVAL_SCOPES = ('scenario', 'transaction')
+
+
+def inter_arrival_gaps(
+    rate: float, process: str = 'constant', rng: Union[random.Random, None] = None
+) -> Iterator[float]:
+    """Yield the gaps in seconds between consecutive arrivals for the rate given in arrivals per second."""
+    if rate <= 0:
+        raise ValueError(f'arrival rate must be positive but is ({rate})')
+    if process not in ARRIVAL_PROCESSES:
+        raise ValueError(f'arrival process ({process}) is not one of {ARRIVAL_PROCESSES}')
+
+    if process == 'constant':
+        gap = 1.0 / rate
+        while True:
+            yield gap
+
+    rng = random.Random() if rng is None else rng  # nosec - load shaping, not cryptography
+    while True:
+        yield rng.expovariate(rate)
+
+
+class Schedule:
+    """Track the intended arrival times on a monotonic clock anchored to the wall clock for reporting."""
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        process: str = 'constant',
+        rng: Union[random.Random, None] = None,
+        gaps: Union[Iterator[float], None] = None,
+    ):
+        self.gaps = inter_arrival_gaps(rate, process, rng) if gaps is None else gaps
+        self.origin_wall = dti.datetime.now(tz=dti.timezone.utc)
+        self.origin_mono = time.monotonic()
+        self.offset = 0.0  # The first arrival is due at the origin
+        self.exhausted = False
+
+    def intended(self) -> dti.datetime:
+        """Wall clock time the current arrival is due."""
+        return self.origin_wall + dti.timedelta(seconds=self.offset)
+
+    def remaining(self) -> float:
+        """Seconds until the current arrival is due (negative when behind schedule)."""
+        return self.offset - (time.monotonic() - self.origin_mono)
+
+    def advance(self) -> None:
+        """Move on to the next arrival no matter how long the current one took (finite gaps may run out)."""
+        try:
+            self.offset += next(self.gaps)
+        except StopIteration:
+            self.exhausted = True
+
+    def wait(self) -> None:
+        """Block until the current arrival is due."""
+        remaining = self.remaining()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    async def wait_async(self) -> None:
+        """Yield to the event loop until the current arrival is due."""
+        remaining = self.remaining()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
@@ -0,0 +1,147 @@
+"""Load shapes as sequences of stages (ramp-up, plateau, step, spike, ramp-down) the engine follows."""
+
+import json
+import pathlib
+import random
+import sys
+import time
+from typing import Dict, Iterator, List, NamedTuple, Tuple, Union
+
+from suhteita import ENCODING
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:  # pragma: no cover
+    import tomli as tomllib
+
+SHAPE_KINDS = ('users', 'rate')
+
+
+class Stage(NamedTuple):
+    """A stage moves the load level to the target (users or arrivals per second) within the duration.
+
+    Ramping stages interpolate linearly from the level the previous stage ended with (starting at zero),
+    non-ramping stages jump to the target at their start and hold it (step and spike stages).
+    """
+
+    name: str
+    duration_secs: float
+    target: float
+    ramp: bool = True
+
+
+class LoadShape:
+    """Follow the stages on a monotonic clock and answer the current stage and load level."""
+
+    def __init__(self, stages: List[Stage], kind: str = 'users'):
+        if not stages:
+            raise ValueError('load shape requires at least one stage')
+        if kind not in SHAPE_KINDS:
+            raise ValueError(f'load shape kind ({kind}) is not one of {SHAPE_KINDS}')
+        self.stages = stages
+        self.kind = kind
+        self.total_secs = sum(stage.duration_secs for stage in stages)
+        self.origin = time.monotonic()
+
+    def start(self) -> None:
+        """Reset the clock of the shape to now."""
+        self.origin = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.origin
+
+    def at(self, elapsed: float) -> Tuple[str, float]:
+        """Name of the stage and load level at the elapsed seconds (the last stage wins after the end)."""
+        begin, level = 0.0, 0.0
+        for stage in self.stages:
+            end = begin + stage.duration_secs
+            if elapsed < end:
+                if not stage.ramp:
+                    return stage.name, stage.target
+                fraction = (elapsed - begin) / stage.duration_secs
+                return stage.name, level + fraction * (stage.target - level)
+            begin, level = end, stage.target
+        return self.stages[-1].name, self.stages[-1].target
+
+    def stage_name(self) -> str:
+        """Name of the current stage - usable as dynamic tag of the recorded events."""
+        return self.at(self.elapsed())[0]
+
+    def level(self) -> float:
+        return self.at(self.elapsed())[1]
+
+    def finished(self) -> bool:
+        return self.elapsed() >= self.total_secs
+
+    def peak(self) -> float:
+        return max(stage.target for stage in self.stages)
+
+    def as_dict(self) -> Dict[str, object]:
+        """Round trip representation of the shape (e.g. for the setup in the meta data of the store)."""
+        return {
+            'stages': [
+                {'name': stage.name, 'duration_secs': stage.duration_secs, self.kind: stage.target, 'ramp': stage.ramp}
+                for stage in self.stages
+            ]
+        }
+
+    def arrival_at(self, arrivals: float) -> Union[float, None]:
+        """Elapsed seconds when the cumulative rate (the integral of the rate) reaches the arrivals (None if never).
+
+        Within a ramp the rate is linear, so the cumulative rate is quadratic and inverts in closed form.
+        """
+        begin, level = 0.0, 0.0
+        for stage in self.stages:
+            start = level if stage.ramp else stage.target
+            slope = (stage.target - start) / (2 * stage.duration_secs)
+            total = (start + slope * stage.duration_secs) * stage.duration_secs
+            if arrivals <= total:
+                root = start + (start * start + 4 * slope * arrivals) ** 0.5
+                return begin + (2 * arrivals / root if root > 0 else 0.0)
+            arrivals -= total
+            begin, level = begin + stage.duration_secs, stage.target
+        return None
+
+    def gaps(self, process: str = 'constant', rng: Union[random.Random, None] = None) -> Iterator[float]:
+        """Yield the gaps between arrivals following the rate level of the stages (idle while the rate is zero).
+
+        The arrivals are placed where the cumulative rate reaches the next whole arrival (constant) or the
+        next sum of exponential unit gaps (poisson), so ramps receive the arrivals due per their average rate.
+        """
+        rng = random.Random() if rng is None else rng  # nosec - load shaping, not cryptography
+        arrivals, previous = 0.0, 0.0
+        while True:
+            arrivals += 1.0 if process == 'constant' else rng.expovariate(1.0)
+            offset = self.arrival_at(arrivals)
+            if offset is None or offset >= self.total_secs:
+                return
+            yield offset - previous
+            previous = offset
+
+
+def parse_stages(data: Dict[str, object]) -> LoadShape:
+    """Validate the shape definition (mapping with stages each having a users or a rate target)."""
+    stages, kinds = [], set()
+    for slot, entry in enumerate(data.get('stages', []), start=1):
+        kind = [kind for kind in SHAPE_KINDS if kind in entry]
+        if len(kind) != 1:
+            raise ValueError(f'stage {slot} requires exactly one target of {SHAPE_KINDS}')
+        kinds.add(kind[0])
+        duration_secs = float(entry.get('duration_secs', 0))
+        if duration_secs <= 0:
+            raise ValueError(f'stage {slot} requires a positive duration_secs')
+        name = str(entry.get('name', f'stage-{slot}'))
+        stages.append(Stage(name, duration_secs, float(entry[kind[0]]), bool(entry.get('ramp', True))))
+    if len(kinds) > 1:
+        raise ValueError('load shape cannot mix users and rate targets across stages')
+    return LoadShape(stages, kind=kinds.pop() if kinds else 'users')
+
+
+def load_shape(path: Union[pathlib.Path, str]) -> LoadShape:
+    """Load the shape definition from a TOML or JSON file."""
+    path = pathlib.Path(path)
+    if path.suffix.lower() == '.json':
+        with open(path, 'rt', encoding=ENCODING) as handle:
+            return parse_stages(json.load(handle))
+    with open(path, 'rb') as handle:
+        return parse_stages(tomllib.load(handle))
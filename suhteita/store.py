@@ -1,39 +1,106 @@
-"""Provide a simple JSON store for event records."""
+"""Provide simple JSON, streaming JSON lines, and SQLite stores for event records."""
 
+import abc
 import copy
 import datetime as dti
 import json
+import os
 import pathlib
-from typing import Dict, Union, no_type_check
+import queue
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple, Union, no_type_check
 
-from suhteita import ENCODING, NODE_INDICATOR, STORE, TS_FORMAT_PAYLOADS, Clocking
+import suhteita.database as database
+from suhteita import ENCODING, NODE_INDICATOR, STORE, TS_FORMAT_PAYLOADS, log
+from suhteita.buffer import EventBuffer
+from suhteita.clock import NS_PER_USEC, Clocking, format_ts, ns_of, parse_ts, usecs_of
+from suhteita.codec import COMPRESSIONS, TRUNCATED, open_text, plain_suffix
+from suhteita.histogram import Histogram, as_dicts, merged
 
 TS_FORMAT_STORE = '%Y%m%dT%H%M%S.%fZ'
+TRAILER_KEYS = (
+    'end_ts',
+    'total_secs',
+    'has_failures_declared',
+    'has_failures_detected',
+    'event_count',
+    'dropped_events',
+    'workers',
+    'segments',
+    'histograms',
+)
+RECORD_MARKERS = ('_meta', '_trailer', '_rollover')
+SEGMENT_PATTERN = re.compile(r'\.\d{4,}\.jsonl(\.[a-z]+)?$')  # Later segments e.g. run.0001.jsonl.gz
+CATALOG_NAME = 'catalog.jsonl'
+CATALOG_KEYS = (
+    'db_name',
+    'scenario',
+    'definition',
+    'target',
+    'mode',
+    'project',
+    'identity',
+    'node_indicator',
+    'users',
+    'start_ts',
+    'end_ts',
+    'total_secs',
+    'event_count',
+    'dropped_events',
+    'segments',
+    'has_failures_declared',
+    'has_failures_detected',
+    'recovered',
+)
+WRITER_QUEUE = 10_000
+WRITER_BLOCK_SECS = 0.1
+WRITER_POLL_SECS = 0.005  # Pause between the attempts to enqueue into a full queue (without holding the lock)
+STOP = object()  # Marks the end of the events for the writer thread
 
 
 @no_type_check
 class Store:
+    suffix = '.json'
+    shard_format = 'json'
+    compressible = True
+
     @no_type_check
     def __init__(
         self, context: Dict[str, Union[str, dti.datetime]], setup: object, folder_path: Union[pathlib.Path, str] = STORE
     ):
         self.store = pathlib.Path(folder_path)
+        self.context = context
         self.identity = context['identity']
         self.start_time = context['start_time']
         self.end_ts = None
         self.total_secs = 0.0
         self.node_indicator = NODE_INDICATOR
+        self.worker = context.get('worker', '')
         self.store.mkdir(parents=True, exist_ok=True)
-        self.db_name = f'{self.identity}-{self.start_time.strftime(TS_FORMAT_STORE)}-{self.node_indicator}.json'
+        self.compression = getattr(setup, 'compression', '') if self.compressible and not self.worker else ''
+        if self.compression and self.compression not in COMPRESSIONS:
+            raise ValueError(f'compression ({self.compression}) is not one of {tuple(COMPRESSIONS)}')
+        worker_suffix = f'-{self.worker}' if self.worker else ''
+        stamp = self.start_time.strftime(TS_FORMAT_STORE)
+        compressed = COMPRESSIONS.get(self.compression, '')
+        self.db_name = f'{self.identity}-{stamp}-{self.node_indicator}{worker_suffix}{self.suffix}{compressed}'
         self.rank = 0
+        self.ranks: Dict[Tuple[Union[str, None], Union[int, None]], int] = {}
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
         self.db = {
             '_meta': {
                 'scenario': context.get('scenario', 'unknown'),
+                'definition': context.get('definition', 'unknown'),
                 'identity': self.identity,
                 'node_indicator': str(self.node_indicator),
                 'target': context.get('target', 'unknown'),
                 'mode': context.get('mode', 'unknown'),
                 'project': context.get('project', 'unknown'),
+                'users': context.get('users', 1),
+                'worker': self.worker,
                 'db_name': self.db_name,
                 'db_path': str(self.store / self.db_name),
                 'start_ts': self.start_time.strftime(TS_FORMAT_PAYLOADS),
@@ -43,34 +110,616 @@ class Store:
                 'has_failures_detected': None,
                 'setup': copy.deepcopy(setup.__dict__),
             },
-            'events': [],
+            'events': EventBuffer(),
         }
 
     @no_type_check
-    def add(self, label: str, ok: bool, clk: Clocking, comment: str = ''):
-        self.rank += 1
-        self.db['events'].append(
-            {
-                'rank': self.rank,
-                'label': label,
-                'ok': ok,
-                'start_ts': clk[0],
-                'duration_usecs': clk[1],
-                'end_ts': clk[2],
-                'comment': comment,
-            }
-        )
+    def add(self, label: str, ok: bool, clk: Clocking, comment: str = '', **tags: str):
+        """Append the event - the rank counts per virtual user (and iteration) if tagged so.
+
+        Timestamps stay nanoseconds since the epoch until the store is dumped. Events the append defers
+        (streaming stores meeting a full queue) are enqueued after the lock is released.
+        """
+        session = (tags.get('user'), tags.get('iteration'))
+        duration_usecs = clk.duration_usecs()
+        with self.lock:
+            self.rank += 1
+            self.ranks[session] = self.ranks.get(session, 0) + 1
+            self.histogram(label).record(duration_usecs)
+            deferred = self.append(
+                {
+                    'rank': self.ranks[session],
+                    'label': label,
+                    'ok': ok,
+                    'start_ts': clk.start_ns,
+                    'duration_usecs': duration_usecs,
+                    'end_ts': clk.end_ns,
+                    'comment': comment,
+                    **tags,
+                }
+            )
+        if deferred is not None:
+            self.enqueue(deferred)
 
     @no_type_check
-    def dump(self, end_time: dti.datetime, has_failures: bool = False):
+    def add_operation(self, label: str, clk: Clocking, comment: str = '', **tags: str):
+        """Append the event of an operation an action split off its step (e.g. a lookup preceding the request)."""
+        self.add(label, True, clk, comment, **tags)
+
+    @no_type_check
+    def append(self, event: Dict[str, object]):
+        """Keep the event (the caller holds the lock) - returns the event if it still needs enqueueing."""
+        self.db['events'].append(event)
+        return None
+
+    @no_type_check
+    def enqueue(self, event: Dict[str, object]):
+        """Hand on an event the append deferred (the caller does not hold the lock) - never the case in memory."""
+        with self.lock:
+            self.db['events'].append(event)
+
+    @no_type_check
+    def histogram(self, label: str) -> Histogram:
+        """Latency histogram of the label (created on first use)."""
+        if label not in self.histograms:
+            self.histograms[label] = Histogram()
+        return self.histograms[label]
+
+    @no_type_check
+    def recorder(self, pacer: object = None, lag: Union[dti.timedelta, None] = None, **tags: object) -> 'Recorder':
+        """Provide a view on the store that tags all added events (e.g. with the virtual user or the stage)."""
+        return Recorder(self, pacer=pacer, lag=lag, **tags)
+
+    @no_type_check
+    def absorb(self, shard: Dict[str, object]):
+        """Merge the events of a worker shard and register the worker in the meta data."""
+        meta = shard['_meta']
+        deferred = []
+        with self.lock:
+            for event in shard['events']:
+                self.rank += 1
+                deferred.append(self.append({**event, 'worker': meta['worker']}))
+                if 'histograms' not in meta:
+                    self.histogram(event['label']).record(event['duration_usecs'])
+            for label, histogram in merged([meta]).items():  # Exact merge - no replay of the events
+                self.histogram(label).merge(histogram)
+            self.db['_meta'].setdefault('workers', []).append(
+                {
+                    'worker': meta['worker'],
+                    'node_indicator': meta['node_indicator'],
+                    'db_name': meta['db_name'],
+                    'event_count': len(shard['events']),
+                    'total_secs': meta['total_secs'],
+                    'has_failures_declared': meta['has_failures_declared'],
+                    'has_failures_detected': meta['has_failures_detected'],
+                }
+            )
+        for event in deferred:
+            if event is not None:
+                self.enqueue(event)
+
+    @no_type_check
+    def failures_detected(self) -> bool:
+        return self.db['events'].has_failures()
+
+    @no_type_check
+    def conclude(self, end_time: dti.datetime, has_failures: bool = False):
+        """Complete the meta data with the totals of the run."""
         self.end_time = end_time
         self.db['_meta']['end_ts'] = self.end_time.strftime(TS_FORMAT_PAYLOADS)
         self.db['_meta']['total_secs'] = (self.end_time - self.start_time).total_seconds()
         self.db['_meta']['has_failures_declared'] = has_failures
-        detect_failures = False
-        for event in self.db['events']:
-            if not event['ok']:
-                detect_failures = True
-        self.db['_meta']['has_failures_detected'] = detect_failures
-        with open(self.store / self.db_name, 'wt', encoding=ENCODING) as handle:
-            json.dump(self.db, handle)
+        self.db['_meta']['has_failures_detected'] = self.failures_detected()
+        self.db['_meta']['event_count'] = len(self.db['events'])
+        self.db['_meta']['histograms'] = as_dicts(self.histograms)
+
+    @no_type_check
+    def dump(self, end_time: dti.datetime, has_failures: bool = False):
+        self.conclude(end_time, has_failures)
+        with open_text(self.store / self.db_name, 'wt') as handle:  # Compresses on the fly if asked for
+            handle.write(f'{{"_meta": {json.dumps(self.db["_meta"])}, "events": [')
+            for index, event in enumerate(self.db['events']):  # Materialize the event dicts one by one
+                handle.write(f'{", " if index else ""}{json.dumps(formatted(event))}')
+            handle.write(']}')
+        self.register()
+
+    @no_type_check
+    def register(self):
+        """Add the run to the catalog of the store folder (worker shards are absorbed instead)."""
+        if not self.worker:
+            register_run(self.store, self.db['_meta'])
+
+
+@no_type_check
+class StreamingStore(Store, abc.ABC):
+    """Hand every event on instead of keeping it in memory - only counting events and failures.
+
+    The virtual users put the events into a bounded queue (writer_queue of the setup) and a writer thread
+    drains the queue in batches (cf. emit_batch), so that serialization and disk writes never happen on
+    the timed path. When the queue is full the virtual user waits without holding the lock of the store and
+    drops (and counts) the event if the queue stays full for WRITER_BLOCK_SECS. A writer failing to emit a
+    batch records the error and ends - the events from there on are dropped and counted.
+    Without a writer queue (0) the events are emitted on the virtual user threads.
+    """
+
+    batch_size = 500
+
+    @no_type_check
+    def __init__(
+        self, context: Dict[str, Union[str, dti.datetime]], setup: object, folder_path: Union[pathlib.Path, str] = STORE
+    ):
+        super().__init__(context, setup, folder_path)
+        self.event_count = 0
+        self.dropped_events = 0
+        self.has_failures = False
+        self.closed = False
+        queue_size = max(0, getattr(setup, 'writer_queue', WRITER_QUEUE))
+        self.queue = queue.Queue(maxsize=queue_size) if queue_size else None
+        self.writer = None
+        self.writer_error = None
+
+    @no_type_check
+    def append(self, event: Dict[str, object]):
+        """Count and enqueue the event (the caller holds the lock) - defer it when the queue is full."""
+        self.has_failures = self.has_failures or not event['ok']
+        if self.closed or self.writer_error is not None:
+            self.dropped_events += 1
+            return None
+        if self.queue is None:
+            self.event_count += 1
+            self.emit_batch([event])
+            return None
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.drain, name=f'{self.__class__.__name__}-writer', daemon=True)
+            self.writer.start()
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            return event
+        self.event_count += 1
+        return None
+
+    @no_type_check
+    def enqueue(self, event: Dict[str, object]):
+        """Retry the deferred event until the queue has room or WRITER_BLOCK_SECS passed (without the lock)."""
+        deadline = time.monotonic() + WRITER_BLOCK_SECS
+        while True:
+            time.sleep(WRITER_POLL_SECS)
+            with self.lock:
+                if not self.closed and self.writer_error is None:
+                    try:
+                        self.queue.put_nowait(event)
+                        self.event_count += 1
+                        return
+                    except queue.Full:
+                        pass
+                if self.closed or self.writer_error is not None or time.monotonic() >= deadline:
+                    self.dropped_events += 1
+                    return
+
+    @no_type_check
+    def drain(self):
+        """Emit the queued events in batches until the stop marker arrives (runs in the writer thread)."""
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            events = [event for event in batch if event is not STOP]
+            try:
+                if events:
+                    self.emit_batch(events)
+            except Exception as err:  # noqa
+                log.error(f'Writer failed to emit ({len(events)}) events with ({err}) - dropping the events from here')
+                with self.lock:
+                    self.writer_error = err
+                    self.event_count -= len(events)
+                    self.dropped_events += len(events)
+                return
+            if len(events) < len(batch):
+                return
+
+    @no_type_check
+    def stop_writer(self):
+        """Let the writer emit all queued events and end (the caller does not hold the lock).
+
+        The stop marker only waits for room while the writer is alive - events a failed writer left behind
+        count as dropped.
+        """
+        with self.lock:
+            self.closed = True
+        if self.writer is None:
+            return
+        while self.writer.is_alive():
+            try:
+                self.queue.put(STOP, timeout=WRITER_BLOCK_SECS)
+                break
+            except queue.Full:
+                continue
+        self.writer.join()
+        self.writer = None
+        left = 0
+        while True:
+            try:
+                left += self.queue.get_nowait() is not STOP
+            except queue.Empty:
+                break
+        with self.lock:
+            self.event_count -= left
+            self.dropped_events += left
+
+    @abc.abstractmethod
+    @no_type_check
+    def emit_batch(self, events: List[Dict[str, object]]):
+        """Write the batch of events to the storage."""
+
+    @abc.abstractmethod
+    @no_type_check
+    def finish(self):
+        """Complete the storage after the last batch."""
+
+    @no_type_check
+    def failures_detected(self) -> bool:
+        return self.has_failures
+
+    @no_type_check
+    def conclude(self, end_time: dti.datetime, has_failures: bool = False):
+        super().conclude(end_time, has_failures)
+        self.db['_meta']['event_count'] = self.event_count
+        self.db['_meta']['dropped_events'] = self.dropped_events
+
+    @no_type_check
+    def dump(self, end_time: dti.datetime, has_failures: bool = False):
+        """Flush the queued events, conclude the meta data, and finish the output (later events are dropped)."""
+        self.stop_writer()
+        self.conclude(end_time, has_failures or self.writer_error is not None)
+        if self.writer_error is not None:
+            log.error(f'Store writer failed with ({self.writer_error}) - the store misses the dropped events')
+        if self.dropped_events:
+            log.warning(f'Store dropped ({self.dropped_events}) events the writer could not keep up with')
+        self.finish()
+        self.register()
+
+
+@no_type_check
+class JsonLinesStore(StreamingStore):
+    """Stream the meta data as header line and then every event as own line into the store file (append only).
+
+    Every line reaches the operating system when its batch is written, so a killed run leaves the events behind.
+    The fsync policy (fsync_every of the setup) forces the lines onto the disk after every event (1),
+    after every n-th event (n), or only when the store is dumped (0 - default) - checked per written batch.
+    The dump appends the totals of the meta data as trailer line - load_store recovers files without trailer.
+    Compressed files (compression of the setup) reach the operating system only per fsync policy and dump,
+    as every flush of the compressor costs ratio.
+
+    Long runs roll over to a new segment file after segment_events events, segment_bytes bytes of lines
+    (before compression), or segment_secs seconds (checked per written batch) when the setup asks for it.
+    The segments share the run id (the db_name of the first segment), carry their sequence number in the
+    header line, and end with a rollover line naming the next segment - load_store and run_events follow
+    the links, so a run reads as one event stream (also while it is still recording).
+    """
+
+    suffix = '.jsonl'
+    shard_format = 'jsonl'
+
+    @no_type_check
+    def __init__(
+        self, context: Dict[str, Union[str, dti.datetime]], setup: object, folder_path: Union[pathlib.Path, str] = STORE
+    ):
+        super().__init__(context, setup, folder_path)
+        self.fsync_every = max(0, getattr(setup, 'fsync_every', 0))
+        self.written = 0
+        limits = ('segment_events', 'segment_bytes', 'segment_secs')
+        self.segment_limits = {key: 0 if self.worker else max(0, getattr(setup, key, 0)) for key in limits}
+        self.segmented = any(self.segment_limits.values())
+        self.segment = 0
+        if self.segmented:
+            self.db['_meta']['run_id'] = self.db_name
+        self.open_segment()
+
+    @no_type_check
+    def segment_name(self, segment: int) -> str:
+        """File name of the segment (the first one is the db_name)."""
+        if not segment:
+            return self.db_name
+        stem = self.db_name[: -len(self.suffix + COMPRESSIONS.get(self.compression, ''))]
+        return f'{stem}.{segment:04d}{self.db_name[len(stem):]}'
+
+    @no_type_check
+    def open_segment(self):
+        self.handle = open_text(self.store / self.segment_name(self.segment), 'wt')
+        self.segment_count, self.segment_size, self.segment_start = 0, 0, time.monotonic()
+        self.write({'_meta': {**self.db['_meta'], 'segment': self.segment} if self.segmented else self.db['_meta']})
+
+    @no_type_check
+    def segment_full(self) -> bool:
+        limits = self.segment_limits
+        return bool(
+            (limits['segment_events'] and self.segment_count >= limits['segment_events'])
+            or (limits['segment_bytes'] and self.segment_size >= limits['segment_bytes'])
+            or (limits['segment_secs'] and time.monotonic() - self.segment_start >= limits['segment_secs'])
+        )
+
+    @no_type_check
+    def roll_over(self):
+        """Link the full segment to the next one, force it onto the disk, and continue in the next one."""
+        self.segment += 1
+        self.write({'_rollover': {'next': self.segment_name(self.segment), 'event_count': self.segment_count}})
+        self.sync()
+        self.handle.close()
+        self.open_segment()
+
+    @no_type_check
+    def write(self, record: Dict[str, object]):
+        line = f'{json.dumps(record)}\n'
+        self.handle.write(line)
+        self.segment_size += len(line)
+        self.flush()
+
+    @no_type_check
+    def flush(self):
+        if not self.compression:
+            self.handle.flush()
+
+    @no_type_check
+    def sync(self):
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+
+    @no_type_check
+    def emit_batch(self, events: List[Dict[str, object]]):
+        """Roll over per segment limits, write the events as lines, and sync per policy."""
+        while events:
+            if self.segmented and self.segment_count and self.segment_full():
+                self.roll_over()  # Only when events follow - so that no run ends with an empty segment
+            limit = self.segment_limits['segment_events']
+            room = max(1, limit - self.segment_count) if limit else len(events)
+            chunk, events = events[:room], events[room:]
+            lines = ''.join(f'{json.dumps(formatted(event))}\n' for event in chunk)
+            self.handle.write(lines)
+            self.flush()
+            self.segment_count += len(chunk)
+            self.segment_size += len(lines)
+            before, self.written = self.written, self.written + len(chunk)
+            if self.fsync_every and before // self.fsync_every != self.written // self.fsync_every:
+                self.sync()
+
+    @no_type_check
+    def conclude(self, end_time: dti.datetime, has_failures: bool = False):
+        super().conclude(end_time, has_failures)
+        if self.segmented:
+            self.db['_meta']['segments'] = self.segment + 1
+
+    @no_type_check
+    def finish(self):
+        self.write({'_trailer': {key: self.db['_meta'][key] for key in TRAILER_KEYS if key in self.db['_meta']}})
+        self.sync()
+        self.handle.close()
+
+
+@no_type_check
+class SqliteStore(StreamingStore):
+    """Insert the run and its events in batches into the SQLite database (WAL mode) of the store folder.
+
+    All runs recorded into the folder share the database, so that queries across runs and months
+    (cf. suhteita.database.percentiles) use the indexes instead of loading files.
+    Worker processes record into JSON lines shards, which the store absorbs.
+    """
+
+    suffix = ''
+    shard_format = 'jsonl'
+    compressible = False
+
+    @no_type_check
+    def __init__(
+        self, context: Dict[str, Union[str, dti.datetime]], setup: object, folder_path: Union[pathlib.Path, str] = STORE
+    ):
+        super().__init__(context, setup, folder_path)
+        self.db['_meta']['db_path'] = str(self.store / database.DATABASE_NAME)
+        self.connection = database.connect(self.store / database.DATABASE_NAME)
+        self.run_id = database.insert_run(self.connection, self.db['_meta'])
+        self.pending = []
+
+    @no_type_check
+    def emit_batch(self, events: List[Dict[str, object]]):
+        self.pending.extend(events)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    @no_type_check
+    def flush(self):
+        """Insert the pending events in one transaction."""
+        database.insert_events(self.connection, database.event_rows(self.run_id, self.db['_meta'], self.pending))
+        self.pending = []
+
+    @no_type_check
+    def finish(self):
+        self.flush()
+        database.update_run(self.connection, self.run_id, self.db['_meta'])
+        self.connection.close()
+
+
+STORE_FORMATS = {'json': Store, 'jsonl': JsonLinesStore, 'sqlite': SqliteStore}
+
+
+@no_type_check
+def open_store(
+    context: Dict[str, Union[str, dti.datetime]], setup: object, folder_path: Union[pathlib.Path, str] = STORE
+) -> Store:
+    """Open the store in the format the setup asks for (store_format with json as default)."""
+    store_format = getattr(setup, 'store_format', 'json')
+    if store_format not in STORE_FORMATS:
+        raise ValueError(f'store format ({store_format}) is not one of {tuple(STORE_FORMATS)}')
+    return STORE_FORMATS[store_format](context=context, setup=setup, folder_path=folder_path)
+
+
+@no_type_check
+def load_store(path: Union[pathlib.Path, str]) -> Dict[str, object]:
+    """Load a store file of any format as meta data and events.
+
+    JSON lines files without trailer (e.g. of killed runs) are recovered: a torn last line is dropped,
+    the meta data is marked as recovered and concluded from the events that made it into the file.
+    Compressed files (e.g. run.jsonl.gz) are decompressed on the fly, a cut off stream counts as torn line.
+    Segmented runs are loaded from the given segment on through the last one (cf. run_records).
+    """
+    path = pathlib.Path(path)
+    if plain_suffix(path) != JsonLinesStore.suffix:
+        with open_text(path) as handle:
+            return json.load(handle)
+
+    meta, events, trailer = None, [], None
+    for record in run_records(path):
+        if '_meta' in record:
+            meta = {key: value for key, value in record['_meta'].items() if key != 'segment'} if meta is None else meta
+        elif '_trailer' in record:
+            trailer = record['_trailer']
+        elif '_rollover' not in record:
+            events.append(record)
+    meta = {} if meta is None else meta
+    if trailer is not None:
+        return {'_meta': {**meta, **trailer}, 'events': events}
+
+    meta['recovered'] = True
+    meta['event_count'] = len(events)
+    meta['has_failures_detected'] = any(not event['ok'] for event in events)
+    histograms: Dict[str, Histogram] = {}
+    for event in events:
+        histograms.setdefault(event['label'], Histogram()).record(event['duration_usecs'])
+    meta['histograms'] = as_dicts(histograms)
+    meta['end_ts'] = max((event['end_ts'] for event in events), default=meta.get('start_ts'))
+    if meta['end_ts']:
+        meta['total_secs'] = (parse_ts(meta['end_ts']) - parse_ts(meta['start_ts'])).total_seconds()
+    return {'_meta': meta, 'events': events}
+
+
+@no_type_check
+def records(path: Union[pathlib.Path, str]) -> Iterator[Dict[str, object]]:
+    """Parsed lines of a JSON lines store file - up to a torn last line of an interrupted write."""
+    with open_text(path) as handle:
+        try:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    return  # Torn line of an interrupted write - the last one of the append only file
+                yield record
+        except TRUNCATED:
+            return  # Compressed stream of a killed run ends without end marker - the lines before count
+
+
+@no_type_check
+def run_records(path: Union[pathlib.Path, str]) -> Iterator[Dict[str, object]]:
+    """Records of the run in order across the segments - following the rollover lines from segment to segment."""
+    path = pathlib.Path(path)
+    while path is not None:
+        following = None
+        for record in records(path):
+            if '_rollover' in record:
+                following = path.parent / record['_rollover']['next']
+            yield record
+        path = following
+
+
+@no_type_check
+def run_events(path: Union[pathlib.Path, str]) -> Iterator[Dict[str, object]]:
+    """Stream the events of the run one by one across the segments (memory stays flat, e.g. for 24 hour soaks)."""
+    for record in run_records(path):
+        if not any(marker in record for marker in RECORD_MARKERS):
+            yield record
+
+
+@no_type_check
+def is_later_segment(path: Union[pathlib.Path, str]) -> bool:
+    """Answer if the file continues a segmented run (readers of folders start at the first segment only)."""
+    return bool(SEGMENT_PATTERN.search(pathlib.Path(path).name))
+
+
+@no_type_check
+def catalog_row(meta: Dict[str, object]) -> Dict[str, object]:
+    """Compact catalog row of the run - the path is relative to the store folder."""
+    row = {key: meta.get(key) for key in CATALOG_KEYS}
+    row['path'] = pathlib.Path(meta.get('db_path') or meta['db_name']).name
+    return row
+
+
+@no_type_check
+def register_run(folder: Union[pathlib.Path, str], meta: Dict[str, object]) -> None:
+    """Append the catalog row of the run in a single write.
+
+    The file is opened for appending, so rows of runs ending at the same time never interleave
+    (cf. suhteita.catalog for reading, selecting, and rebuilding the catalog).
+    """
+    line = f'{json.dumps(catalog_row(meta))}\n'.encode(ENCODING)
+    descriptor = os.open(pathlib.Path(folder) / CATALOG_NAME, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(descriptor, line)
+    finally:
+        os.close(descriptor)
+
+
+@no_type_check
+def formatted(event: Dict[str, object]) -> Dict[str, object]:
+    """Format the timestamps (keys ending in _ts) still kept as nanoseconds since the epoch."""
+    return {key: format_ts(val) if key.endswith('_ts') and isinstance(val, int) else val for key, val in event.items()}
+
+
+@no_type_check
+def corrected_usecs(clk: Clocking, intended_ns: int) -> int:
+    """Latency from the intended start through the end of the transaction (coordinated omission corrected)."""
+    return (clk.end_ns - intended_ns) // NS_PER_USEC
+
+
+@no_type_check
+class Recorder:
+    """Relay events to the store tagged with the bound context (e.g. the virtual user identifier).
+
+    An optional pacer (cf. suhteita.scheduler.Schedule) turns the recorder into the clock of an open model:
+    every event is tagged with the time the transaction was scheduled and the next transaction is
+    held back until its arrival is due - independent of how long the recorded transaction took.
+
+    Under an open model every event also carries the intended start and the latency measured from
+    that intended start (corrected_usecs) so that stalls do not hide the requests that should have
+    happened meanwhile (coordinated omission). For scenario arrivals the lag between scheduled and
+    actual start of the virtual user shifts the intended start of all its transactions.
+
+    Callable tag values are evaluated whenever an event is added (e.g. the current stage of a load shape).
+    Operations split off a step share the intended start of the step and do not consume an arrival.
+    """
+
+    @no_type_check
+    def __init__(self, store: Store, pacer: object = None, lag: Union[dti.timedelta, None] = None, **tags: object):
+        self.store = store
+        self.pacer = pacer
+        self.lag = lag
+        self.lag_ns = usecs_of(lag) * NS_PER_USEC
+        self.tags = tags
+        self.user = '-'.join(str(tags[key]) for key in ('user', 'iteration') if key in tags)
+
+    @no_type_check
+    def tagged(self, clk: Clocking, extra: Dict[str, object]) -> Dict[str, object]:
+        """Tags of the event including the open model timings if any."""
+        tags = {**{key: value() if callable(value) else value for key, value in self.tags.items()}, **extra}
+        if self.pacer is None and self.lag is None:
+            return tags
+
+        if self.pacer is None:
+            intended_ns = clk.start_ns - self.lag_ns
+        else:
+            intended_ns = ns_of(self.pacer.intended())
+            tags['scheduled_ts'] = intended_ns
+        tags['intended_ts'] = intended_ns
+        tags['corrected_usecs'] = corrected_usecs(clk, intended_ns)
+        return tags
+
+    @no_type_check
+    def add(self, label: str, ok: bool, clk: Clocking, comment: str = '', **extra: object):
+        self.store.add(label, ok, clk, comment, **self.tagged(clk, extra))
+        if self.pacer is not None:
+            self.pacer.advance()
+            self.pacer.wait()
+
+    @no_type_check
+    def add_operation(self, label: str, clk: Clocking, comment: str = '', **extra: object):
+        self.store.add(label, True, clk, comment, **self.tagged(clk, extra))
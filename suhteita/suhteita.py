@@ -2,11 +2,12 @@
 
 import argparse
 import datetime as dti
-import json
 import secrets
-from typing import no_type_check
+import signal
+from typing import Dict, no_type_check
 
-import suhteita.ticket_system_actions as actions
+import suhteita.engine as engine
+import suhteita.issue_pool as issue_pool
 from suhteita import (
     APP_ALIAS,
     APP_ENV,
@@ -20,11 +21,25 @@ from suhteita import (
     TS_FORMAT_PAYLOADS,
     USER,
     __version__ as version,
-    extract_fields,
     log,
     two_sentences,
 )
-from suhteita.store import Store
+from suhteita.pool import DEFAULT_KEEPALIVE_SECS, DEFAULT_POOL_CONNECTIONS
+from suhteita.projects import DEFAULT_TTL_SECS, catalog_path
+from suhteita.scenario import (
+    DEFAULT_DEFINITION,
+    AsyncExecutor,
+    Definition,
+    Executor,
+    load_definition,
+    references_of,
+)
+from suhteita.shape import load_shape
+from suhteita.store import STORE_FORMATS, WRITER_QUEUE, Recorder, StreamingStore, open_store
+from suhteita.ticket_system_actions import FULL_FIELDS, login
+
+LEAN_JQL_FIELDS = 'description'  # The amendment of the description is the only use of the search result
+LEAN_LOAD_FIELDS = 'summary,status'  # The loaded issue is only logged (debug)
 
 
 @no_type_check
@@ -43,6 +58,36 @@ def setup_twenty_seven(options: argparse.Namespace) -> object:
     setup.scenario = options.scenario if options.scenario else 'unknown'
     setup.identity = options.identity if options.identity else IDENTITY
     setup.storage_path = options.out_path if options.out_path else STORE
+    setup.users = max(1, options.users) if options.users else 1
+    setup.backend = options.backend if options.backend else 'threads'
+    setup.processes = min(max(1, options.processes), setup.users) if options.processes else 1
+    setup.arrival_rate = max(0.0, options.arrival_rate) if options.arrival_rate else 0.0
+    setup.arrival_process = options.arrival_process if options.arrival_process else 'constant'
+    setup.arrival_scope = options.arrival_scope if options.arrival_scope else 'scenario'
+    setup.load_shape_path = options.load_shape if options.load_shape else ''
+    setup.load_shape = {}
+    setup.definition = options.definition if options.definition else DEFAULT_DEFINITION
+    setup.concurrent_steps = options.concurrent_steps if options.concurrent_steps else False
+    setup.store_format = options.store_format if options.store_format else 'json'
+    setup.fsync_every = max(0, options.fsync_every) if options.fsync_every else 0
+    setup.compression = options.compression if options.compression else ''
+    setup.segment_events = max(0, options.segment_events) if options.segment_events else 0
+    setup.segment_bytes = max(0, options.segment_bytes) if options.segment_bytes else 0
+    setup.segment_secs = max(0.0, options.segment_secs) if options.segment_secs else 0.0
+    setup.pool_scope = options.pool_scope if options.pool_scope else 'user'
+    setup.pool_connections = max(1, options.pool_connections) if options.pool_connections else DEFAULT_POOL_CONNECTIONS
+    setup.pool_maxsize = max(0, options.pool_maxsize) if options.pool_maxsize else 0
+    setup.keepalive_secs = max(0.0, options.keepalive_secs) if options.keepalive_secs else DEFAULT_KEEPALIVE_SECS
+    setup.lean_reads = options.lean_reads if options.lean_reads else False
+    setup.jql_fields = LEAN_JQL_FIELDS if setup.lean_reads else FULL_FIELDS
+    setup.load_fields = LEAN_LOAD_FIELDS if setup.lean_reads else FULL_FIELDS
+    setup.projects_ttl_secs = (
+        max(0.0, options.projects_ttl_secs) if options.projects_ttl_secs is not None else DEFAULT_TTL_SECS
+    )
+    setup.issue_pool = max(0, options.issue_pool) if options.issue_pool else 0
+    setup.issue_order = options.issue_order if options.issue_order else issue_pool.ISSUE_ORDERS[0]
+    setup.pooled_keys = []  # Provisioned before the run (cf. provision_issue_pool)
+    setup.writer_queue = max(0, options.writer_queue) if options.writer_queue is not None else WRITER_QUEUE
 
     log.info('=' * 84)
     log.info(f'Generator {APP_ALIAS} version {version}')
@@ -92,11 +137,124 @@ def setup_twenty_seven(options: argparse.Namespace) -> object:
         f'- Setup <14> Connect will be to upstream ({"cloud" if setup.is_cloud else "on-site"})'
         f' service ({setup.target_url}) per login ({setup.user})'
     )
+    log.info(f'- Setup <15> Virtual users executing the scenario in parallel will be ({setup.users})')
+    log.info(f'- Setup <16> Execution backend for the virtual users will be ({setup.backend})')
+    log.info(f'- Setup <17> Worker processes sharing the virtual users will be ({setup.processes})')
+    if setup.arrival_rate:
+        log.info(
+            f'- Setup <18> Open model arrivals of the {setup.arrival_scope} scope will be'
+            f' ({setup.arrival_process}) at ({setup.arrival_rate}) per second'
+        )
+    else:
+        log.info('- Setup <18> Closed model - every step starts when the previous step returns')
+    if setup.concurrent_steps:
+        log.info('- Setup <19> Steps start as soon as the steps they depend on returned (concurrent steps)')
+    else:
+        log.info('- Setup <19> Steps start one after the other in scenario order')
+    if setup.store_format == 'jsonl':
+        fsync = {0: 'on close', 1: 'after every event'}.get(
+            setup.fsync_every, f'after every {setup.fsync_every} events'
+        )
+        log.info(f'- Setup <20> Store format will be ({setup.store_format}) with fsync {fsync}')
+    elif setup.store_format == 'sqlite':
+        log.info(f'- Setup <20> Store format will be ({setup.store_format}) with a database shared across runs')
+    else:
+        log.info(f'- Setup <20> Store format will be ({setup.store_format})')
+    if not issubclass(STORE_FORMATS.get(setup.store_format, StreamingStore), StreamingStore):
+        log.info('- Setup <21> Events stay in memory until the store is dumped')
+    elif setup.writer_queue:
+        log.info(f'- Setup <21> Writer thread drains a queue of ({setup.writer_queue}) events into the store')
+    else:
+        log.info('- Setup <21> Virtual users write the events into the store (no writer queue)')
+    if setup.compression and setup.store_format != 'sqlite':
+        log.info(f'- Setup <22> Store file will be compressed with ({setup.compression}) while writing')
+    else:
+        log.info('- Setup <22> Store file will not be compressed')
+    limits = {
+        'events': setup.segment_events,
+        'bytes': setup.segment_bytes,
+        'seconds': setup.segment_secs,
+    }
+    limits = ', '.join(f'{value} {unit}' for unit, value in limits.items() if value)
+    if limits and setup.store_format == 'jsonl':
+        log.info(f'- Setup <23> Store rolls over to a new segment file after ({limits})')
+    elif limits:
+        log.warning(f'- Setup <23> Store format ({setup.store_format}) does not roll over - ignoring ({limits})')
+    else:
+        log.info('- Setup <23> Store writes a single file (no rollover)')
+    maxsize = setup.pool_maxsize if setup.pool_maxsize else 'auto'
+    log.info(
+        f'- Setup <24> Connection pools per ({setup.pool_scope}) with ({maxsize}) connections per host'
+        f' for ({setup.pool_connections}) hosts and keep-alive expiry ({setup.keepalive_secs} secs)'
+    )
+    log.info(
+        f'- Setup <25> Searches request the fields ({setup.jql_fields}) and loads of issues the fields'
+        f' ({setup.load_fields}){" (lean reads)" if setup.lean_reads else ""}'
+    )
+    if setup.projects_ttl_secs:
+        log.info(
+            f'- Setup <26> Project checks answer from the catalog ({catalog_path()})'
+            f' for ({setup.projects_ttl_secs} secs)'
+        )
+    else:
+        log.info('- Setup <26> Project checks request the project on every run (the catalog is only updated)')
+    if setup.issue_pool:
+        log.info(
+            f'- Setup <27> Pool of ({setup.issue_pool}) tagged issues ({issue_pool.POOL_LABEL}) handed out'
+            f' ({setup.issue_order}) as {issue_pool.POOLED_KEY}'
+        )
+    else:
+        log.info('- Setup <27> No issue pool (scenarios read the issues they create)')
     log.info('-' * 84)
 
     return setup
 
 
+@no_type_check
+def seed_twenty_seven(cfg: object, store: Recorder) -> Dict[str, object]:
+    """Bind the secret, the component name (unique per virtual user session), and a key of the issue pool."""
+    component_name = (
+        cfg.random_component if cfg.users == 1 and not cfg.load_shape else f'{cfg.random_component}-{store.user}'
+    )
+    seeds = {'token': TOKEN, 'component_name': component_name}
+    if cfg.pooled_keys:
+        seeds[issue_pool.POOLED_KEY] = issue_pool.pick(cfg.pooled_keys, cfg.issue_order)
+    return seeds
+
+
+@no_type_check
+def provision_issue_pool(cfg: object, definition: Definition) -> bool:
+    """Provide the keys of the issue pool before the run (ok unless the definition needs a pool it cannot get)."""
+    names = references_of([[step.args, step.expect, step.note, step.comment] for step in definition.steps])
+    if not cfg.issue_pool:
+        if issue_pool.POOLED_KEY in names:
+            log.error(f'The scenario definition ({definition.name}) reads pooled issues - please set --issue-pool')
+            return False
+        return True
+    _, service = login(target_url=cfg.target_url, user=cfg.user, password=TOKEN, is_cloud=cfg.is_cloud)
+    ts = dti.datetime.now(tz=dti.timezone.utc).strftime(TS_FORMAT_PAYLOADS)
+    try:
+        cfg.pooled_keys = issue_pool.provision(service, cfg.target_url, cfg.target_project, cfg.issue_pool, ts)
+    except Exception as err:  # noqa
+        log.error(f'Failed to provision the issue pool of ({cfg.target_project}) with ({err})')
+        return False
+    keys = cfg.pooled_keys
+    log.info(f'Issue pool of ({cfg.target_project}) provides ({len(keys)}) keys from ({keys[0]}) to ({keys[-1]})')
+    return True
+
+
+def executor_for(definition: Definition, backend: str = 'threads') -> Executor:
+    """Compile the scenario definition for the backend executing the virtual users."""
+    if backend == 'asyncio':
+        return AsyncExecutor(definition, seed_twenty_seven)
+    return Executor(definition, seed_twenty_seven)
+
+
+def interrupt(signum: int, _frame: object) -> None:
+    """Turn the termination signal into an interrupt so that the store can flush the events recorded so far."""
+    raise KeyboardInterrupt(f'signal ({signum})')
+
+
 def main(options: argparse.Namespace) -> int:
     """Drive the transactions."""
 
@@ -105,9 +263,38 @@ def main(options: argparse.Namespace) -> int:
         return 2
 
     cfg = setup_twenty_seven(options=options)
+    if cfg.arrival_rate and cfg.arrival_scope == 'transaction' and cfg.backend == 'asyncio':
+        log.error('Pacing the arrivals of transactions requires the threads backend')
+        return 2
 
-    # Belt and braces:
-    has_failures = False
+    if cfg.arrival_rate and cfg.arrival_scope == 'transaction' and cfg.concurrent_steps:
+        log.error('Pacing the arrivals of transactions requires the steps to run one after the other')
+        return 2
+
+    if cfg.load_shape_path:
+        if cfg.arrival_rate or cfg.backend != 'threads' or cfg.processes > 1:
+            log.error('Following a load shape requires the threads backend, one process, and no arrival rate')
+            return 2
+        try:
+            shape = load_shape(cfg.load_shape_path)
+        except (OSError, ValueError) as err:
+            log.error(f'Failed to load the load shape from ({cfg.load_shape_path}) with ({err})')
+            return 2
+        cfg.load_shape = shape.as_dict()
+        log.info(
+            f'Load shape of {len(shape.stages)} stages ({", ".join(stage.name for stage in shape.stages)})'
+            f' targets {shape.kind} over {shape.total_secs} seconds'
+        )
+
+    try:
+        definition = load_definition(cfg.definition)
+        scenario = executor_for(definition, cfg.backend)
+    except (OSError, ValueError) as err:
+        log.error(f'Failed to load the scenario definition ({cfg.definition}) with ({err})')
+        return 2
+
+    if not provision_issue_pool(cfg, definition):
+        return 2
 
     # Here we start the timer for the session:
     start_time = dti.datetime.now(tz=dti.timezone.utc)
@@ -118,221 +305,40 @@ def main(options: argparse.Namespace) -> int:
         'project': cfg.target_project,
         'scenario': cfg.scenario,
         'identity': cfg.identity,
+        'users': cfg.users,
+        'definition': definition.name,
         'start_time': start_time,
     }
-    store = Store(context=context, setup=cfg, folder_path=cfg.storage_path)
-    log.info(f'# Starting 27-steps scenario test execution at at ({start_ts})')
-    log.info('- Step <01> LOGIN')
-    clk, service = actions.login(cfg.target_url, cfg.user, password=TOKEN, is_cloud=cfg.is_cloud)
-    log.info(f'^ Connected to upstream service; CLK={clk}')
-    store.add('LOGIN', True, clk)
-
-    log.info('- Step <02> SERVER_INFO')
-    clk, server_info = actions.get_server_info(service)
-    log.info(f'^ Retrieved upstream server info cf. [SRV]; CLK={clk}')
-    store.add('SERVER_INFO', True, clk, str(server_info))
-
-    log.info('- Step <03> PROJECTS')
-    clk, projects = actions.get_all_projects(service)
-    log.info(f'^ Retrieved {len(projects)} unarchived projects; CLK={clk}')
-    store.add('PROJECTS', True, clk, f'count({len(projects)})')
-
-    proj_env_ok = False
-    if cfg.target_project:
-        proj_env_ok = any((cfg.target_project == project['key'] for project in projects))
-
-    if not proj_env_ok:
-        log.error('Belt and braces - verify project selection:')
-        log.info(json.dumps(sorted([project['key'] for project in projects]), indent=2))
-        return 1
-
-    first_proj_key = cfg.target_project if proj_env_ok else projects[0]['key']
-    log.info(
-        f'Verified target project from request ({cfg.target_project}) to be'
-        f' {"" if proj_env_ok else "not "}present and set target project to ({first_proj_key})'
-    )
-
-    log.info('- Step <04> CREATE_ISSUE')
-    clk, c_key = actions.create_issue(
-        service, first_proj_key, cfg.ts, description=f'{cfg.c_rand}\n{cfg.desc_core}\nCAUSALITY={cfg.node_indicator}'
-    )
-    log.info(f'^ Created original ({c_key}); CLK={clk}')
-    store.add('CREATE_ISSUE', True, clk, 'original')
-
-    log.info('- Step <05> ISSUE_EXISTS')
-    clk, c_e = actions.issue_exists(service, c_key)
-    log.info(f'^ Existence of original ({c_key}) verified with result ({c_e}); CLK={clk}')
-    store.add('ISSUE_EXISTS', bool(c_e), clk, 'original')
-
-    log.info('- Step <06> CREATE_ISSUE')
-    clk, d_key = actions.create_issue(
-        service, first_proj_key, cfg.ts, description=f'{cfg.d_rand}\n{cfg.desc_core}\nCAUSALITY={cfg.node_indicator}'
-    )
-    log.info(f'^ Created duplicate ({d_key}); CLK={clk}')
-    store.add('CREATE_ISSUE', True, clk, 'duplicate')
-
-    log.info('- Step <07> ISSUE_EXISTS')
-    clk, d_e = actions.issue_exists(service, d_key)
-    log.info(f'^ Existence of duplicate ({d_key}) verified with result ({d_e}); CLK={clk}')
-    store.add('ISSUE_EXISTS', bool(d_e), clk, 'duplicate')
-
-    query = f'issue = {c_key}'
-    log.info('- Step <08> EXECUTE_JQL')
-    clk, c_q = actions.execute_jql(service=service, query=query)
-    log.info(f'^ Executed JQL({query}); CLK={clk}')
-    store.add('EXECUTE_JQL', True, clk, f'query({query.replace(c_key, "original-key")})')
-
-    log.info('- Step <09> AMEND_ISSUE_DESCRIPTION')
-    clk = actions.amend_issue_description(service, c_key, amendment=cfg.amendment, issue_context=c_q)
-    log.info(f'^ Amended description of original {d_key} with ({cfg.amendment}); CLK={clk}')
-    store.add('AMEND_ISSUE_DESCRIPTION', True, clk, 'original')
-
-    log.info('- Step <10> ADD_COMMENT')
-    clk, _ = actions.add_comment(service=service, issue_key=d_key, comment=cfg.fake_comment)
-    log.info(f'^ Added comment ({cfg.fake_comment}) to duplicate {d_key}; CLK={clk}')
-    store.add('ADD_COMMENT', True, clk, 'duplicate')
-
-    log.info('- Step <11> UPDATE_ISSUE_FIELD')
-    clk = actions.update_issue_field(service, d_key, labels=cfg.duplicate_labels)
-    log.info(f'^ Updated duplicate {d_key} issue field of labels to ({cfg.duplicate_labels}); CLK={clk}')
-    store.add('UPDATE_ISSUE_FIELD', True, clk, 'duplicate')
-
-    log.info('- Step <12> UPDATE_ISSUE_FIELD')
-    clk = actions.update_issue_field(service, c_key, labels=cfg.original_labels)
-    log.info(f'^ Updated original {c_key} issue field of labels to ({cfg.original_labels}); CLK={clk}')
-    store.add('UPDATE_ISSUE_FIELD', True, clk, 'original')
-
-    log.info('- Step <13> CREATE_DUPLICATES_ISSUE_LINK')
-    clk, _ = actions.create_duplicates_issue_link(service, c_key, d_key)
-    log.info(f'^ Created link on duplicate stating it duplicates the original; CLK={clk}')
-    store.add('CREATE_DUPLICATES_ISSUE_LINK', True, clk, 'dublicate duplicates original')
-
-    log.info('- Step <14> GET_ISSUE_STATUS')
-    clk, d_iss_state = actions.get_issue_status(service, d_key)
-    d_is_todo = d_iss_state.lower() == cfg.todo
-    log.info(
-        f'^ Retrieved status of the duplicate {d_key} as ({d_iss_state})'
-        f' with result (is_todo == {d_is_todo}); CLK={clk}'
-    )
-    store.add('GET_ISSUE_STATUS', d_is_todo, clk, f'duplicate({d_iss_state})')
-
-    log.info('- Step <15> SET_ISSUE_STATUS')
-    clk, _ = actions.set_issue_status(service, d_key, cfg.in_progress)
-    log.info(f'^ Transitioned the duplicate {d_key} to ({cfg.in_progress}); CLK={clk}')
-    store.add('SET_ISSUE_STATUS', True, clk, f'duplicate ({cfg.todo})->({cfg.in_progress})')
-
-    log.info('- Step <16> SET_ISSUE_STATUS')
-    clk, _ = actions.set_issue_status(service, d_key, cfg.done)
-    log.info(f'^ Transitioned the duplicate {d_key} to ({cfg.done}); CLK={clk}')
-    store.add('SET_ISSUE_STATUS', True, clk, f'duplicate ({cfg.in_progress})->({cfg.done})')
-
-    log.info('- Step <17> GET_ISSUE_STATUS')
-    clk, d_iss_state_done = actions.get_issue_status(service, d_key)
-    d_is_done = d_iss_state_done.lower() == cfg.done
-    log.info(
-        f'^ Retrieved status of the duplicate {d_key} as ({d_iss_state_done})'
-        f' with result (d_is_done == {d_is_done}); CLK={clk}'
-    )
-    store.add('GET_ISSUE_STATUS', d_is_done, clk, f'duplicate({d_iss_state_done})')
-
-    log.info('- Step <18> ADD_COMMENT')
-    clk, response_step_18_add_comment = actions.add_comment(service, d_key, 'Closed as duplicate.')
-    log.info(f'^ Added comment on {d_key} with response extract cf. [RESP-STEP-18]; CLK={clk}')
-    store.add('ADD_COMMENT', True, clk, f'duplicate({response_step_18_add_comment["body"]})')
-
-    log.info('- Step <19> SET_ORIGINAL_ESTIMATE')
-    clk, ok = actions.set_original_estimate(service, c_key, hours=cfg.hours_value)
-    log.info(
-        f'^ Added ({cfg.hours_value}) hours as original estimate to original {c_key} with result ({ok}); CLK={clk}'
-    )
-    store.add('SET_ORIGINAL_ESTIMATE', ok, clk, 'original')
-
-    log.info('- Step <20> GET_ISSUE_STATUS')
-    clk, c_iss_state = actions.get_issue_status(service, c_key)
-    c_is_todo = c_iss_state.lower() == cfg.todo
-    log.info(
-        f'^ Retrieved status of the original {c_key} as ({c_iss_state})'
-        f' with result (c_is_todo == {c_is_todo}); CLK={clk}'
-    )
-    store.add('GET_ISSUE_STATUS', c_is_todo, clk, f'original({c_iss_state})')
-
-    log.info('- Step <21> SET_ISSUE_STATUS')
-    clk, _ = actions.set_issue_status(service, c_key, cfg.in_progress)
-    log.info(f'^ Transitioned the original {c_key} to ({cfg.in_progress}); CLK={clk}')
-    store.add('SET_ISSUE_STATUS', True, clk, f'original ({cfg.todo})->({cfg.in_progress})')
-
-    log.info('- Step <22> GET_ISSUE_STATUS')
-    clk, c_iss_state_in_progress = actions.get_issue_status(service, c_key)
-    c_is_in_progress = c_iss_state_in_progress.lower() == cfg.in_progress
-    log.info(
-        f'^ Retrieved status of the original {c_key} as ({c_iss_state_in_progress})'
-        f' with result (c_is_in_progress == {c_is_in_progress}); CLK={clk}'
-    )
-    store.add('GET_ISSUE_STATUS', c_is_in_progress, clk, f'original({c_iss_state_in_progress})')
-
-    log.info('- Step <23> CREATE_COMPONENT')
-    clk, comp_id, a_component, comp_resp = actions.create_component(
-        service=service, project=first_proj_key, name=cfg.random_component, description=cfg.c_rand
-    )
-    log.info(f'^ Created component ({a_component}) with response extract cf. [RESP-STEP-23]; CLK={clk}')
-    store.add('CREATE_COMPONENT', True, clk, f'component({comp_resp["description"]})')  # type: ignore
-
-    log.info('- Step <24> RELATE_ISSUE_TO_COMPONENT')
-    clk, ok = actions.relate_issue_to_component(service, c_key, comp_id, a_component)
-    log.info(
-        f'^ Attempted relation of original {c_key} issue to component ({a_component}) with result ({ok}); CLK={clk}'
-    )
-    store.add('RELATE_ISSUE_TO_COMPONENT', ok, clk, 'original')
-    if not ok:
-        has_failures = True
-
-    log.info('- Step <25> LOAD_ISSUE')
-    clk, x_iss = actions.load_issue(service, c_key)
-    log.info(f'^ Loaded issue {c_key}; CLK={clk}')
-    log.debug(json.dumps(x_iss, indent=2))
-    store.add('LOAD_ISSUE', True, clk, 'original')
-
-    log.info('- Step <26> ADD_COMMENT')
-    clk, response_step_26_add_comment = actions.add_comment(service=service, issue_key=c_key, comment=cfg.purge_me)
-    log.info(f'^ Added purge tag comment on original {c_key} with response extract cf. [RESP-STEP-26]; CLK={clk}')
-    store.add('ADD_COMMENT', True, clk, f'original({response_step_26_add_comment["body"]})')
-
-    log.info('- Step <27> ADD_COMMENT')
-    clk, response_step_27_add_comment = actions.add_comment(service=service, issue_key=d_key, comment=cfg.purge_me)
-    log.info(
-        f'^ Added purge tag comment on duplicate issue {d_key} with response extract cf. [RESP-STEP-27]; CLK={clk}'
-    )
-    store.add('ADD_COMMENT', True, clk, f'duplicate({response_step_27_add_comment["body"]})')
+    store = open_store(context=context, setup=cfg, folder_path=cfg.storage_path)
+    log.info(f'# Starting {definition.description} execution at at ({start_ts})')
+    previous_handler = signal.signal(signal.SIGTERM, interrupt)
+    try:
+        if cfg.processes > 1:
+            code, has_failures = engine.run_processes(
+                scenario, cfg, store, users=cfg.users, processes=cfg.processes, backend=cfg.backend
+            )
+        else:
+            code, has_failures = engine.dispatch(scenario, cfg, store, users=cfg.users, backend=cfg.backend)
+    except KeyboardInterrupt as err:
+        log.error(f'Interrupted ({err}) - dumping the records so far to store as failed execution')
+        store.dump(end_time=dti.datetime.now(tz=dti.timezone.utc), has_failures=True)
+        return 130
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
 
     # Here we stop the timer for the session:
     end_time = dti.datetime.now(tz=dti.timezone.utc)
     end_ts = end_time.strftime(TS_FORMAT_PAYLOADS)
-    log.info(f'# Ended execution of 27-steps scenario test at ({end_ts})')
-    log.info(f'Execution of 27-steps scenario test took {(end_time - start_time)} h:mm:ss.uuuuuu')
-    log.info('-' * 84)
-
-    log.info('# References:')
-    log.info(f'[SRV]          Server info is ({server_info})')
-    log.info(
-        f'[RESP-STEP-18] Add comment response is'
-        f' ({extract_fields(response_step_18_add_comment, fields=("self", "body"))})'
-    )
-    log.info(
-        f'[RESP-STEP-23] Create component response is ({extract_fields(comp_resp, fields=("self", "description"))})'
-    )
-    log.info(
-        f'[RESP-STEP-26] Add comment response is'
-        f' ({extract_fields(response_step_26_add_comment, fields=("self", "body"))})'
-    )
-    log.info(
-        f'[RESP-STEP-27] Add comment response is'
-        f' ({extract_fields(response_step_27_add_comment, fields=("self", "body"))})'
-    )
+    log.info(f'# Ended execution of {definition.description} at ({end_ts})')
+    log.info(f'Execution of {definition.description} took {(end_time - start_time)} h:mm:ss.uuuuuu')
     log.info('-' * 84)
 
     log.info('Dumping records to store...')
-    store.dump(end_time=end_time, has_failures=has_failures)
+    store.dump(end_time=end_time, has_failures=has_failures or bool(code))
     log.info('-' * 84)
+    if code:  # The records of all virtual users are kept even if one failed
+        log.error(f'Execution failed with code ({code})')
+        return code
 
     log.info('OK')
     log.info('=' * 84)
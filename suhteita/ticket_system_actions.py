@@ -1,51 +1,65 @@
 """Actions on ticket system instances."""
 
-import copy
-import datetime as dti
 from typing import Dict, List, Tuple, no_type_check
 
 from atlassian import Jira  # type: ignore
+from requests import HTTPError
 
-from suhteita import IS_CLOUD, TOKEN, TS_FORMAT_PAYLOADS, Clocking, log
+import suhteita.pool as pool
+import suhteita.projects as projects
+import suhteita.transitions as transitions
+from suhteita import IS_CLOUD, TOKEN, detach, log
+from suhteita.clock import Clocking, Stopwatch
+
+FULL_FIELDS = '*all'  # Projections of the read actions default to the full issues
 
 
 def login(target_url: str, user: str, password: str = TOKEN, is_cloud: bool = IS_CLOUD) -> Tuple[Clocking, Jira]:
     """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    service = Jira(url=target_url, username=user, password=password, cloud=is_cloud)
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, service
+    with Stopwatch() as watch:
+        service = Jira(
+            url=target_url, username=user, password=password, cloud=is_cloud, session=pool.session(target_url)
+        )
+    return watch.clocking, service
 
 
 def get_server_info(service: Jira) -> Tuple[Clocking, object]:
     """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    data = copy.deepcopy(service.get_server_info(True))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, data
+    with Stopwatch() as watch:
+        data = service.get_server_info(True)
+    return watch.clocking, detach(data)
 
 
 def get_all_projects(service: Jira) -> Tuple[Clocking, List[Dict[str, str]]]:
     """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    projects = copy.deepcopy(service.get_all_projects(included_archived=None))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, projects
+    with Stopwatch() as watch:
+        listed = service.get_all_projects(included_archived=None)
+    projects.update(service.url, found=[project['key'] for project in listed], complete=True)
+    return watch.clocking, detach(listed)
+
+
+def project_found(service: Jira, project: str) -> bool:
+    """Request the one project (a missing project is not an error)."""
+    try:
+        service.get_project(project)
+    except HTTPError as err:
+        if getattr(err.response, 'status_code', None) != 404:
+            raise
+        return False
+    return True
+
+
+def project_exists(service: Jira, project: str, ttl_secs: float = projects.DEFAULT_TTL_SECS) -> Tuple[Clocking, bool]:
+    """Verify the project per the local catalog while fresh and else per request (cf. suhteita.projects)."""
+    if projects.is_fresh(service.url, project, ttl_secs):
+        pool.qualify(projects.CACHED_SUFFIX)
+        with Stopwatch() as watch:
+            pass
+        return watch.clocking, True
+    with Stopwatch() as watch:
+        exists = project_found(service, project)
+    projects.update(service.url, found=[project] if exists else [], missing=[] if exists else [project])
+    return watch.clocking, exists
 
 
 @no_type_check
@@ -57,129 +71,105 @@ def create_issue(service: Jira, project: str, ts: str, description: str) -> Tupl
         'summary': f'From REST we create at {ts}',
         'description': description,
     }
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    created = copy.deepcopy(service.issue_create(fields=fields))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, created['key']
+    with Stopwatch() as watch:
+        created = service.issue_create(fields=fields)
+    transitions.remember(created['key'], issue_type=fields['issuetype']['name'])
+    return watch.clocking, created['key']
 
 
 @no_type_check
 def issue_exists(service: Jira, issue_key: str) -> Tuple[Clocking, bool]:
     """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    exists = copy.deepcopy(service.issue_exists(issue_key))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, exists
+    with Stopwatch() as watch:
+        exists = service.issue_exists(issue_key)
+    return watch.clocking, exists
 
 
 @no_type_check
 def get_issue_status(service: Jira, issue_key: str) -> Tuple[Clocking, str]:
     """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    status = copy.deepcopy(service.get_issue_status(issue_key))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, status
+    with Stopwatch() as watch:
+        status = service.get_issue_status(issue_key)
+    transitions.remember(issue_key, status)
+    return watch.clocking, status
+
+
+@no_type_check
+def lookup_transition(service: Jira, issue_key: str, key: transitions.Key, status: str) -> int:
+    """Look up the transitions of the issue as own operation of the step and cache them."""
+    with Stopwatch() as watch:
+        available = service.get_issue_transitions(issue_key)
+    pool.split_off(transitions.LOOKUP_LABEL, watch.clocking, issue_key)
+    transitions.learn(key, available)
+    return transitions.transition_id(available, status)
 
 
+@no_type_check
 def set_issue_status(service: Jira, issue_key: str, status: str) -> Tuple[Clocking, object]:
+    """Post the transition to the status - the clocking covers the post only (cf. suhteita.transitions).
+
+    The transition id comes from the cache, which is filled lazily on the first miss per key. Issues of
+    unknown status miss every time - these look the transitions up (recorded as own operation) before the post.
+    """
+    key = transitions.key_of(issue_key)
+    transition_id = transitions.lookup(key, status)
+    cached = transition_id is not None
+    if not cached:
+        transition_id = lookup_transition(service, issue_key, key, status)
+    try:
+        with Stopwatch() as watch:
+            response = service.set_issue_status_by_transition_id(issue_key, transition_id)
+    except HTTPError:
+        if not cached:
+            raise
+        log.warning(f'Transition ({transition_id}) of {issue_key} to ({status}) rejected - refreshing the cache')
+        transitions.forget(key)
+        transition_id = lookup_transition(service, issue_key, key, status)
+        with Stopwatch() as watch:
+            response = service.set_issue_status_by_transition_id(issue_key, transition_id)
+    transitions.remember(issue_key, status)
+    return watch.clocking, detach(response)
+
+
+def load_issue(service: Jira, issue_key: str, fields: str = FULL_FIELDS, expand: str = '') -> Tuple[Clocking, object]:
     """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    response = copy.deepcopy(service.set_issue_status(issue_key, status))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, response
-
-
-def load_issue(service: Jira, issue_key: str) -> Tuple[Clocking, object]:
-    """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    data = copy.deepcopy(service.issue(issue_key))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, data
+    with Stopwatch() as watch:
+        data = service.issue(issue_key, fields=fields, expand=expand or None)
+    return watch.clocking, detach(data)
 
 
 @no_type_check
-def execute_jql(service: Jira, query: str) -> Tuple[Clocking, object]:
+def execute_jql(service: Jira, query: str, fields: str = FULL_FIELDS, expand: str = '') -> Tuple[Clocking, object]:
     """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    data = copy.deepcopy(service.jql(query))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, data
+    with Stopwatch() as watch:
+        data = service.jql(query, fields=fields, expand=expand or None)
+    return watch.clocking, detach(data)
 
 
 @no_type_check
 def amend_issue_description(service: Jira, issue_key: str, amendment: str, issue_context) -> Clocking:
     """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    _ = copy.deepcopy(
+    with Stopwatch() as watch:
         service.update_issue_field(
             issue_key,
             fields={'description': f"{issue_context['issues'][0]['fields']['description']}\n{amendment}"},
         )
-    )
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking
+    return watch.clocking
 
 
 @no_type_check
 def add_comment(service: Jira, issue_key: str, comment: str) -> Tuple[Clocking, object]:
     """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    response = copy.deepcopy(service.issue_add_comment(issue_key, comment))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, response
+    with Stopwatch() as watch:
+        response = service.issue_add_comment(issue_key, comment)
+    return watch.clocking, detach(response)
 
 
 def update_issue_field(service: Jira, issue_key: str, labels: List[str]) -> Clocking:
     """DRY."""
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    _ = copy.deepcopy(service.update_issue_field(issue_key, fields={'labels': labels}))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking
+    with Stopwatch() as watch:
+        service.update_issue_field(issue_key, fields={'labels': labels})
+    return watch.clocking
 
 
 def create_duplicates_issue_link(
@@ -194,37 +184,23 @@ def create_duplicates_issue_link(
             'body': f'{duplicate_issue_key} truly duplicates {original_issue_key}!',
         },
     }
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    response = copy.deepcopy(service.create_issue_link(data))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, response
+    with Stopwatch() as watch:
+        response = service.create_issue_link(data)
+    return watch.clocking, detach(response)
 
 
 def set_original_estimate(service: Jira, issue_key: str, hours: int) -> Tuple[Clocking, bool]:
     """DRY."""
     ok = True
+    watch = Stopwatch()
     try:
-        start_time = dti.datetime.now(tz=dti.timezone.utc)
-        _ = copy.deepcopy(
+        with watch:
             service.update_issue_field(issue_key, fields={'timetracking': {'originalEstimate': f'{hours}h'}})
-        )
-        end_time = dti.datetime.now(tz=dti.timezone.utc)
     except Exception as err:  # noqa
-        end_time = dti.datetime.now(tz=dti.timezone.utc)
         ok = False
         log.error(f'Failed setting "{issue_key}".timetracking.originalEstimate to {hours} with (next error log line):')
         log.error(f'cont. ({err})')
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, ok
+    return watch.clocking, ok
 
 
 def create_component(service: Jira, project: str, name: str, description: str) -> Tuple[Clocking, str, str, object]:
@@ -235,33 +211,24 @@ def create_component(service: Jira, project: str, name: str, description: str) -
         'name': name,
         'assigneeType': 'UNASSIGNED',
     }
-    start_time = dti.datetime.now(tz=dti.timezone.utc)
-    comp_create_resp = copy.deepcopy(service.create_component(comp_data))
-    end_time = dti.datetime.now(tz=dti.timezone.utc)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
+    with Stopwatch() as watch:
+        comp_create_resp = service.create_component(comp_data)
     comp_id = comp_create_resp['id']
-    return clocking, comp_id, name, service.component(comp_id)
+    with pool.untracked():  # The follow-up read is not part of the clocked creation
+        component = service.component(comp_id)
+    return watch.clocking, comp_id, name, component
 
 
 def relate_issue_to_component(service: Jira, issue_key: str, comp_id: str, comp_name: str) -> Tuple[Clocking, bool]:
     """DRY."""
     ok = True
+    watch = Stopwatch()
     try:
-        start_time = dti.datetime.now(tz=dti.timezone.utc)
-        _ = copy.deepcopy(service.update_issue_field(issue_key, fields={'components': [{'name': comp_name}]}))
-        end_time = dti.datetime.now(tz=dti.timezone.utc)
+        with watch:
+            service.update_issue_field(issue_key, fields={'components': [{'name': comp_name}]})
     except Exception as err:  # noqa
         ok = False
-        end_time = dti.datetime.now(tz=dti.timezone.utc)
         log.error(f'Not able to set component for issue: ({err}) Cleaning up - deleting component ID={comp_id}')
-        service.delete_component(comp_id)
-    clocking: Clocking = (
-        start_time.strftime(TS_FORMAT_PAYLOADS),
-        (end_time - start_time).microseconds,
-        end_time.strftime(TS_FORMAT_PAYLOADS),
-    )
-    return clocking, ok
+        with pool.untracked():  # The clean-up is not part of the clocked update
+            service.delete_component(comp_id)
+    return watch.clocking, ok
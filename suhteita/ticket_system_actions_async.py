@@ -0,0 +1,376 @@
+"""Actions on ticket system instances executed per asyncio and an async HTTP client."""
+
+import asyncio
+from typing import Any, Dict, List, Tuple, Union, no_type_check
+
+import httpx
+
+import suhteita.pool as pool
+import suhteita.projects as projects
+import suhteita.transitions as transitions
+from suhteita import IS_CLOUD, TOKEN, detach, log
+from suhteita.clock import Clocking, Stopwatch
+
+API_ROOT = 'rest/api/2'
+DEFAULT_TIMEOUT_SECS = 75
+FULL_FIELDS = '*all'  # Projections of the read actions default to the full issues
+
+
+@no_type_check
+class AsyncJira:
+    """Minimal async JIRA REST client offering the subset of methods the actions use from atlassian.Jira."""
+
+    @no_type_check
+    def __init__(
+        self,
+        url: str,
+        username: str,
+        password: str,
+        cloud: bool = False,
+        timeout: float = DEFAULT_TIMEOUT_SECS,
+        transport: Union[httpx.AsyncBaseTransport, None] = None,
+    ):
+        self.url = url
+        self.cloud = cloud
+        self.owned = not pool.is_shared()  # Shared clients outlive the virtual user (cf. pool.aclose)
+        self.client = pool.async_client(
+            (url, username),
+            lambda: httpx.AsyncClient(
+                base_url=f'{url.rstrip("/")}/{API_ROOT}/',
+                auth=(username, password),
+                headers={'Accept': 'application/json', 'Content-Type': 'application/json'},
+                timeout=timeout,
+                transport=transport,
+                limits=pool.limits(),
+            ),
+        )
+
+    @no_type_check
+    async def _send(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """Send the request tallying the connections it opened and the bytes it received."""
+        pool.count_request()
+        response = await self.client.request(method, path, extensions={'trace': pool.trace}, **kwargs)
+        pool.count_bytes(response.num_bytes_downloaded or len(response.content))  # Mock transports download nothing
+        return response
+
+    @no_type_check
+    async def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        response = await self._send(method, path, **kwargs)
+        response.raise_for_status()
+        return response.json() if response.content else None
+
+    @no_type_check
+    async def close(self) -> None:
+        if self.owned:
+            await self.client.aclose()
+
+    @no_type_check
+    async def get_server_info(self, do_health_check: bool = False):
+        return await self._request('GET', 'serverInfo', params={'doHealthCheck': do_health_check})
+
+    @no_type_check
+    async def get_all_projects(self, included_archived=None):
+        params = {} if included_archived is None else {'includeArchived': included_archived}
+        return await self._request('GET', 'project', params=params)
+
+    @no_type_check
+    async def get_project(self, key: str, expand: Union[str, None] = None):
+        return await self._request('GET', f'project/{key}', params={'expand': expand} if expand else {})
+
+    @no_type_check
+    async def issue_create(self, fields):
+        return await self._request('POST', 'issue', json={'fields': fields})
+
+    @no_type_check
+    async def issue_exists(self, issue_key: str) -> bool:
+        response = await self._send('GET', f'issue/{issue_key}', params={'fields': '*none'})
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    @no_type_check
+    async def issue(self, key: str, fields: str = '*all', expand: Union[str, None] = None):
+        params = {'fields': fields, **({'expand': expand} if expand else {})}
+        return await self._request('GET', f'issue/{key}', params=params)
+
+    @no_type_check
+    async def jql(self, jql: str, fields: str = '*all', expand: Union[str, None] = None):
+        params = {'jql': jql, 'fields': fields, 'startAt': 0, **({'expand': expand} if expand else {})}
+        return await self._request('GET', 'search', params=params)
+
+    @no_type_check
+    async def get_issue_status(self, issue_key: str):
+        data = await self.issue(issue_key, fields='status')
+        return data['fields']['status']['name']
+
+    @no_type_check
+    async def get_issue_transitions(self, issue_key: str):
+        data = await self._request('GET', f'issue/{issue_key}/transitions')
+        return [{'name': t['name'], 'id': int(t['id']), 'to': t['to']['name']} for t in data['transitions']]
+
+    @no_type_check
+    async def set_issue_status(self, issue_key: str, status_name: str):
+        transition_id = transitions.transition_id(await self.get_issue_transitions(issue_key), status_name)
+        return await self.set_issue_status_by_transition_id(issue_key, transition_id)
+
+    @no_type_check
+    async def set_issue_status_by_transition_id(self, issue_key: str, transition_id: int):
+        data = {'transition': {'id': transition_id}}
+        return await self._request('POST', f'issue/{issue_key}/transitions', json=data)
+
+    @no_type_check
+    async def update_issue_field(self, key: str, fields):
+        return await self._request('PUT', f'issue/{key}', json={'fields': fields})
+
+    @no_type_check
+    async def issue_add_comment(self, issue_key: str, comment: str):
+        return await self._request('POST', f'issue/{issue_key}/comment', json={'body': comment})
+
+    @no_type_check
+    async def create_issue_link(self, data):
+        return await self._request('POST', 'issueLink', json=data)
+
+    @no_type_check
+    async def create_component(self, component):
+        return await self._request('POST', 'component', json=component)
+
+    @no_type_check
+    async def component(self, component_id: str):
+        return await self._request('GET', f'component/{component_id}')
+
+    @no_type_check
+    async def delete_component(self, component_id: str):
+        return await self._request('DELETE', f'component/{component_id}')
+
+
+async def login(
+    target_url: str, user: str, password: str = TOKEN, is_cloud: bool = IS_CLOUD
+) -> Tuple[Clocking, AsyncJira]:
+    """DRY."""
+    with Stopwatch() as watch:
+        service = AsyncJira(url=target_url, username=user, password=password, cloud=is_cloud)
+    return watch.clocking, service
+
+
+async def get_server_info(service: AsyncJira) -> Tuple[Clocking, object]:
+    """DRY."""
+    with Stopwatch() as watch:
+        data = await service.get_server_info(True)
+    return watch.clocking, detach(data)
+
+
+async def get_all_projects(service: AsyncJira) -> Tuple[Clocking, List[Dict[str, str]]]:
+    """DRY."""
+    with Stopwatch() as watch:
+        listed = await service.get_all_projects(included_archived=None)
+    keys = [project['key'] for project in listed]
+    await asyncio.to_thread(projects.update, service.url, found=keys, complete=True)
+    return watch.clocking, detach(listed)
+
+
+async def project_found(service: AsyncJira, project: str) -> bool:
+    """Request the one project (a missing project is not an error)."""
+    try:
+        await service.get_project(project)
+    except httpx.HTTPStatusError as err:
+        if err.response.status_code != 404:
+            raise
+        return False
+    return True
+
+
+async def project_exists(
+    service: AsyncJira, project: str, ttl_secs: float = projects.DEFAULT_TTL_SECS
+) -> Tuple[Clocking, bool]:
+    """Verify the project per the local catalog while fresh and else per request (cf. suhteita.projects)."""
+    if await asyncio.to_thread(projects.is_fresh, service.url, project, ttl_secs):  # Catalog file I/O
+        pool.qualify(projects.CACHED_SUFFIX)
+        with Stopwatch() as watch:
+            pass
+        return watch.clocking, True
+    with Stopwatch() as watch:
+        exists = await project_found(service, project)
+    found, missing = ([project], []) if exists else ([], [project])
+    await asyncio.to_thread(projects.update, service.url, found=found, missing=missing)
+    return watch.clocking, exists
+
+
+@no_type_check
+async def create_issue(service: AsyncJira, project: str, ts: str, description: str) -> Tuple[Clocking, str]:
+    """DRY."""
+    fields = {
+        'project': {'key': project},
+        'issuetype': {'name': 'Task'},
+        'summary': f'From REST we create at {ts}',
+        'description': description,
+    }
+    with Stopwatch() as watch:
+        created = await service.issue_create(fields=fields)
+    transitions.remember(created['key'], issue_type=fields['issuetype']['name'])
+    return watch.clocking, created['key']
+
+
+@no_type_check
+async def issue_exists(service: AsyncJira, issue_key: str) -> Tuple[Clocking, bool]:
+    """DRY."""
+    with Stopwatch() as watch:
+        exists = await service.issue_exists(issue_key)
+    return watch.clocking, exists
+
+
+@no_type_check
+async def get_issue_status(service: AsyncJira, issue_key: str) -> Tuple[Clocking, str]:
+    """DRY."""
+    with Stopwatch() as watch:
+        status = await service.get_issue_status(issue_key)
+    transitions.remember(issue_key, status)
+    return watch.clocking, status
+
+
+@no_type_check
+async def lookup_transition(service: AsyncJira, issue_key: str, key: transitions.Key, status: str) -> int:
+    """Look up the transitions of the issue as own operation of the step and cache them."""
+    with Stopwatch() as watch:
+        available = await service.get_issue_transitions(issue_key)
+    pool.split_off(transitions.LOOKUP_LABEL, watch.clocking, issue_key)
+    transitions.learn(key, available)
+    return transitions.transition_id(available, status)
+
+
+@no_type_check
+async def set_issue_status(service: AsyncJira, issue_key: str, status: str) -> Tuple[Clocking, object]:
+    """Post the transition to the status - the clocking covers the post only (cf. suhteita.transitions).
+
+    The transition id comes from the cache, which is filled lazily on the first miss per key. Issues of
+    unknown status miss every time - these look the transitions up (recorded as own operation) before the post.
+    """
+    key = transitions.key_of(issue_key)
+    transition_id = transitions.lookup(key, status)
+    cached = transition_id is not None
+    if not cached:
+        transition_id = await lookup_transition(service, issue_key, key, status)
+    try:
+        with Stopwatch() as watch:
+            response = await service.set_issue_status_by_transition_id(issue_key, transition_id)
+    except httpx.HTTPStatusError:
+        if not cached:
+            raise
+        log.warning(f'Transition ({transition_id}) of {issue_key} to ({status}) rejected - refreshing the cache')
+        transitions.forget(key)
+        transition_id = await lookup_transition(service, issue_key, key, status)
+        with Stopwatch() as watch:
+            response = await service.set_issue_status_by_transition_id(issue_key, transition_id)
+    transitions.remember(issue_key, status)
+    return watch.clocking, detach(response)
+
+
+async def load_issue(
+    service: AsyncJira, issue_key: str, fields: str = FULL_FIELDS, expand: str = ''
+) -> Tuple[Clocking, object]:
+    """DRY."""
+    with Stopwatch() as watch:
+        data = await service.issue(issue_key, fields=fields, expand=expand or None)
+    return watch.clocking, detach(data)
+
+
+@no_type_check
+async def execute_jql(
+    service: AsyncJira, query: str, fields: str = FULL_FIELDS, expand: str = ''
+) -> Tuple[Clocking, object]:
+    """DRY."""
+    with Stopwatch() as watch:
+        data = await service.jql(query, fields=fields, expand=expand or None)
+    return watch.clocking, detach(data)
+
+
+@no_type_check
+async def amend_issue_description(service: AsyncJira, issue_key: str, amendment: str, issue_context) -> Clocking:
+    """DRY."""
+    with Stopwatch() as watch:
+        await service.update_issue_field(
+            issue_key,
+            fields={'description': f"{issue_context['issues'][0]['fields']['description']}\n{amendment}"},
+        )
+    return watch.clocking
+
+
+@no_type_check
+async def add_comment(service: AsyncJira, issue_key: str, comment: str) -> Tuple[Clocking, object]:
+    """DRY."""
+    with Stopwatch() as watch:
+        response = await service.issue_add_comment(issue_key, comment)
+    return watch.clocking, detach(response)
+
+
+async def update_issue_field(service: AsyncJira, issue_key: str, labels: List[str]) -> Clocking:
+    """DRY."""
+    with Stopwatch() as watch:
+        await service.update_issue_field(issue_key, fields={'labels': labels})
+    return watch.clocking
+
+
+async def create_duplicates_issue_link(
+    service: AsyncJira, duplicate_issue_key: str, original_issue_key: str
+) -> Tuple[Clocking, object]:
+    """DRY."""
+    data = {
+        'type': {'name': 'Duplicate'},
+        'inwardIssue': {'key': duplicate_issue_key},
+        'outwardIssue': {'key': original_issue_key},
+        'comment': {
+            'body': f'{duplicate_issue_key} truly duplicates {original_issue_key}!',
+        },
+    }
+    with Stopwatch() as watch:
+        response = await service.create_issue_link(data)
+    return watch.clocking, detach(response)
+
+
+async def set_original_estimate(service: AsyncJira, issue_key: str, hours: int) -> Tuple[Clocking, bool]:
+    """DRY."""
+    ok = True
+    watch = Stopwatch()
+    try:
+        with watch:
+            await service.update_issue_field(issue_key, fields={'timetracking': {'originalEstimate': f'{hours}h'}})
+    except Exception as err:  # noqa
+        ok = False
+        log.error(f'Failed setting "{issue_key}".timetracking.originalEstimate to {hours} with (next error log line):')
+        log.error(f'cont. ({err})')
+    return watch.clocking, ok
+
+
+async def create_component(
+    service: AsyncJira, project: str, name: str, description: str
+) -> Tuple[Clocking, str, str, object]:
+    """DRY."""
+    comp_data = {
+        'project': project,
+        'description': description,
+        'name': name,
+        'assigneeType': 'UNASSIGNED',
+    }
+    with Stopwatch() as watch:
+        comp_create_resp = await service.create_component(comp_data)
+    comp_id = comp_create_resp['id']
+    with pool.untracked():  # The follow-up read is not part of the clocked creation
+        component = await service.component(comp_id)
+    return watch.clocking, comp_id, name, component
+
+
+async def relate_issue_to_component(
+    service: AsyncJira, issue_key: str, comp_id: str, comp_name: str
+) -> Tuple[Clocking, bool]:
+    """DRY."""
+    ok = True
+    watch = Stopwatch()
+    try:
+        with watch:
+            await service.update_issue_field(issue_key, fields={'components': [{'name': comp_name}]})
+    except Exception as err:  # noqa
+        ok = False
+        log.error(f'Not able to set component for issue: ({err}) Cleaning up - deleting component ID={comp_id}')
+        with pool.untracked():  # The clean-up is not part of the clocked update
+            await service.delete_component(comp_id)
+    return watch.clocking, ok
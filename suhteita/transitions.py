@@ -0,0 +1,76 @@
+"""Cache the workflow transition ids per project, issue type, and source status for the status changes.
+
+Changing the status of an issue by name costs two round trips - the lookup of the transitions available
+to the issue and the transition itself. The cache learns the transition ids on the first lookup per key
+and the statuses of the issues from the actions that see them (create, get status, set status), so that
+later status changes only post the transition. The actions record the lookups as own operation (cf. the
+LOOKUP_LABEL) and a rejected transition drops the key and looks the transitions up again.
+
+The cache warms lazily - there is no warm-up before the timed loop, the first status change per key and
+process pays the lookup (every worker process warms its own). Status changes of issues whose status no
+action of the process saw (e.g. issues read from elsewhere) have no key and look the transitions up every
+time, as the transitions of an unknown source status cannot be reused.
+"""
+
+import collections
+import threading
+from typing import Dict, List, Tuple, Union
+
+LOOKUP_LABEL = 'GET_ISSUE_TRANSITIONS'
+MAX_ISSUES = 10_000  # Statuses of the issues to remember (the least recently seen are forgotten first)
+
+Key = Tuple[str, str, str]  # project, issue type, source status (lower case)
+
+TRANSITIONS: Dict[Key, Dict[str, int]] = {}
+ISSUES: 'collections.OrderedDict[str, Tuple[str, str]]' = collections.OrderedDict()
+LOCK = threading.Lock()
+
+
+def project_of(issue_key: str) -> str:
+    return issue_key.rpartition('-')[0]
+
+
+def remember(issue_key: str, status: str = '', issue_type: str = '') -> None:
+    """Remember the status (and the issue type if given) an action saw the issue in."""
+    with LOCK:
+        known_type, known_status = ISSUES.pop(issue_key, ('', ''))
+        ISSUES[issue_key] = (issue_type or known_type, status.lower() if status else known_status)
+        while len(ISSUES) > MAX_ISSUES:
+            ISSUES.popitem(last=False)
+
+
+def key_of(issue_key: str) -> Union[Key, None]:
+    """Cache key of the issue in its current status (None if the status of the issue is unknown)."""
+    issue_type, status = ISSUES.get(issue_key, ('', ''))
+    return (project_of(issue_key), issue_type, status) if status else None
+
+
+def lookup(key: Union[Key, None], status: str) -> Union[int, None]:
+    """Transition id leading to the status (None if not cached)."""
+    return TRANSITIONS.get(key, {}).get(status.lower()) if key is not None else None
+
+
+def transition_id(transitions: List[Dict[str, object]], status: str) -> Union[int, None]:
+    """Transition id leading to the status from the available transitions (None if none leads there)."""
+    for transition in transitions:
+        if status.lower() == str(transition['to']).lower():
+            return int(transition['id'])  # type: ignore
+    return None
+
+
+def learn(key: Union[Key, None], transitions: List[Dict[str, object]]) -> None:
+    """Cache the available transitions per target status (transitions of unknown source statuses are not kept)."""
+    if key is not None:
+        with LOCK:
+            TRANSITIONS[key] = {str(transition['to']).lower(): int(transition['id']) for transition in transitions}
+
+
+def forget(key: Union[Key, None]) -> None:
+    with LOCK:
+        TRANSITIONS.pop(key, None)  # type: ignore
+
+
+def clear() -> None:
+    with LOCK:
+        TRANSITIONS.clear()
+        ISSUES.clear()
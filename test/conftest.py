@@ -0,0 +1,12 @@
+import pytest
+
+import suhteita.projects as projects
+
+
+@pytest.fixture(autouse=True)
+def project_catalog(tmp_path, monkeypatch):
+    """Keep the project catalog of the tests away from the cache folder of the user."""
+    monkeypatch.setattr(projects, 'CACHE_FOLDER', tmp_path / 'cache')
+    projects.forget()
+    yield projects
+    projects.forget()
@@ -0,0 +1,86 @@
+import datetime as dti
+import json
+
+import pytest
+
+import suhteita.archive as archive
+import suhteita.database as database
+from suhteita.clock import Clocking, ns_of
+from suhteita.store import Store
+
+START = dti.datetime(2026, 1, 2, 23, 59, 59, tzinfo=dti.timezone.utc)
+
+
+class Setup:
+    pass
+
+
+def dumped_store(folder, identity, start_time=START, stage=None):
+    store = Store(
+        context={'identity': identity, 'target': 'target', 'start_time': start_time}, setup=Setup(), folder_path=folder
+    )
+    tx = ns_of(start_time)
+    tags = {'stage': stage} if stage else {}
+    store.add('LOGIN', True, Clocking(tx, 42_000, tx + 42_000), **tags)
+    store.add('SERVER_INFO', False, Clocking(tx + 2_000_000_000, 1_000, tx + 2_000_001_000), 'comment', step=7)
+    store.dump(start_time + dti.timedelta(seconds=3))
+    return folder / store.db_name
+
+
+def test_compact_per_day_and_skip_archived(tmp_path):
+    stores = tmp_path / 'store'
+    dumped_store(stores, 'wun', stage='spike')
+    dumped_store(stores, 'two', start_time=START + dti.timedelta(seconds=2))
+    assert archive.compact([stores], tmp_path / 'archive') == {'2026-01-02': 2, '2026-01-03': 2}
+    assert archive.compact([stores], tmp_path / 'archive') == {'2026-01-02': 0, '2026-01-03': 0}
+    assert [path.name for path in archive.days(tmp_path / 'archive', since='2026-01-03')] == ['2026-01-03.cols']
+
+    with archive.Day(archive.day_path(tmp_path / 'archive', '2026-01-02')) as day:
+        assert day.count == 2
+        assert day.dictionaries['label'] == ['LOGIN', 'SERVER_INFO']
+        assert list(day.column('duration_ns')) == [42_000, 1_000]
+        assert list(day.column('start_ns')) == [ns_of(START), ns_of(START) + 2_000_000_000]
+        assert list(day.column('ok')) == [1, 0]
+        assert list(day.column('step')) == [1, 7]
+
+
+def test_compact_loads_one_day_at_a_time(tmp_path, monkeypatch):
+    stores = tmp_path / 'store'
+    first = dumped_store(stores, 'wun')
+    second = dumped_store(stores, 'two', start_time=START + dti.timedelta(seconds=2))
+    connection = database.connect(stores / database.DATABASE_NAME)
+    database.import_store(connection, archive.load_store(first))
+    renamed = archive.load_store(second)
+    renamed['_meta']['db_name'] = 'b'
+    database.import_store(connection, renamed)
+    connection.close()
+    loaded = []
+    load_store = archive.load_store
+    monkeypatch.setattr(archive, 'load_store', lambda path: loaded.append(path.name) or load_store(path))
+    per_day = archive.runs_per_day(archive.store_paths([stores]))
+    assert loaded == []  # The days come from the file names and the run metadata
+    assert {day: sorted(map(str, sources.values())) for day, sources in per_day.items()} == {
+        '2026-01-02': ['None', '{1}'],
+        '2026-01-03': ['None', '{2}'],
+    }
+    assert archive.compact([stores], tmp_path / 'archive') == {'2026-01-02': 2, '2026-01-03': 4}
+    assert loaded == [first.name, second.name]
+
+
+def test_load_runs_carries_nanoseconds(tmp_path):
+    path = dumped_store(tmp_path / 'store', 'wun', stage='spike')
+    archive.compact([path], tmp_path / 'archive')
+    (_, from_archive), (_, from_store) = list(archive.load_runs([tmp_path / 'archive', path]))
+    assert from_archive['_meta']['db_name'] == from_store['_meta']['db_name']
+    for key in ('rank', 'label', 'ok', 'start_ns', 'end_ns', 'duration_usecs', 'stage'):
+        assert [event.get(key) for event in from_archive['events']] == [
+            event.get(key) for event in from_store['events']
+        ]
+    assert from_archive['events'][0]['end_ns'] == ns_of(START) + 42_000
+
+
+def test_day_sad(tmp_path):
+    path = tmp_path / '2026-01-02.cols'
+    path.write_bytes(json.dumps({'not': 'an archive'}).encode())
+    with pytest.raises(ValueError, match=r'lacks the magic line'):
+        archive.Day(path)
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from suhteita.buffer import EventBuffer
+
+
+def event(rank, label='LOGIN', ok=True, **tags):
+    return {
+        'rank': rank,
+        'label': label,
+        'ok': ok,
+        'start_ts': 1_000 + rank,
+        'duration_usecs': 42,
+        'end_ts': 43_000 + rank,
+        'comment': tags.pop('comment', ''),
+        **tags,
+    }
+
+
+def test_event_buffer_round_trip():
+    events = [
+        event(1, user='u0001', step=1),
+        event(2, 'LOAD_ISSUE', False, comment='XYZ-1', user='u0001', step=2),
+        event(1, user='u0002', step=1),
+    ]
+    buffer = EventBuffer()
+    for item in events:
+        buffer.append(item)
+    assert len(buffer) == 3
+    assert buffer == events
+    assert buffer[-1] == events[-1]
+    assert buffer[1:] == events[1:]
+    assert buffer.labels.values == ['LOGIN', 'LOAD_ISSUE']
+    assert len(buffer.tag_sets.values) == 3
+    assert buffer.comments == {1: 'XYZ-1'}
+    assert buffer.has_failures()
+    assert json.dumps(list(buffer)) == json.dumps(events)
+
+
+def test_event_buffer_timings_and_dumped_timestamps():
+    buffer = EventBuffer()
+    buffer.append(event(1))
+    buffer.append(event(2, scheduled_ts=7, intended_ts=7, corrected_usecs=99))
+    buffer.append(event(3, intended_ts='1970-01-01 00:00:00.000001 UTC', corrected_usecs=5, worker='w01'))
+    assert sorted(buffer.timings) == ['corrected_usecs', 'intended_ts', 'scheduled_ts']
+    first, second, third = buffer
+    assert 'intended_ts' not in first
+    assert (second['scheduled_ts'], second['intended_ts'], second['corrected_usecs']) == (7, 7, 99)
+    assert 'scheduled_ts' not in third
+    assert (third['intended_ts'], third['worker']) == (1_000, 'w01')
+    assert not buffer.has_failures()
+
+
+def test_event_buffer_phases():
+    buffer = EventBuffer()
+    buffer.append(event(1, reused=True))
+    buffer.append(event(2, reused=False, phases={'connect_usecs': 120, 'ttfb_usecs': 900}, response_bytes=420))
+    buffer.append(event(3, reused=True, phases={'ttfb_usecs': 700, 'transfer_usecs': 15}, response_bytes=42))
+    assert list(buffer.phases) == ['connect_usecs', 'ttfb_usecs', 'transfer_usecs']
+    assert len(buffer.tag_sets.values) == 2  # The varying phases and byte counts stay out of the interned tag sets
+    first, second, third = buffer
+    assert 'phases' not in first and 'response_bytes' not in first
+    assert (second['response_bytes'], third['response_bytes']) == (420, 42)
+    assert second['phases'] == {'connect_usecs': 120, 'ttfb_usecs': 900}
+    assert third['phases'] == {'ttfb_usecs': 700, 'transfer_usecs': 15}
+
+
+def test_event_buffer_sad():
+    buffer = EventBuffer()
+    assert buffer == []
+    with pytest.raises(IndexError, match=r'event index out of range'):
+        buffer[0]
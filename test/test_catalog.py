@@ -0,0 +1,102 @@
+import datetime as dti
+import json
+
+import pytest
+
+import suhteita.catalog as catalog
+from suhteita.clock import Clocking, ns_of
+from suhteita.store import CATALOG_NAME, JsonLinesStore, SqliteStore, Store
+
+START = dti.datetime(2026, 10, 5, 8, 0, 0, tzinfo=dti.timezone.utc)
+
+
+class Setup:
+    fsync_every = 0
+    writer_queue = 0
+
+
+def dumped_store(folder, identity, scenario, target, start_time=START, ok=True, kind=Store, worker='', segments=0):
+    context = {
+        'identity': identity,
+        'scenario': scenario,
+        'target': target,
+        'mode': 'cloud',
+        'start_time': start_time,
+        'worker': worker,
+    }
+    setup = Setup()
+    setup.segment_events = segments
+    store = kind(context=context, setup=setup, folder_path=folder)
+    tx = ns_of(start_time)
+    store.add('LOGIN', True, Clocking(tx, 42_000, tx + 42_000))
+    store.add('SERVER_INFO', ok, Clocking(tx + 1_000, 1_000, tx + 2_000))
+    store.dump(start_time + dti.timedelta(seconds=3))
+    return store
+
+
+def test_dump_registers_runs(tmp_path):
+    dumped_store(tmp_path, 'wun', 'twins', 'https://prod.example.com/')
+    dumped_store(tmp_path, 'two', 'twins', 'https://test.example.com/', ok=False, kind=JsonLinesStore)
+    dumped_store(tmp_path, 'six', 'solo', 'https://prod.example.com/', kind=SqliteStore)
+    dumped_store(tmp_path, 'shard', 'twins', 'https://prod.example.com/', worker='w1')
+    rows = catalog.read_catalog(tmp_path)
+    assert [row['identity'] for row in rows] == ['wun', 'two', 'six']
+    assert [row['event_count'] for row in rows] == [2, 2, 2]
+    assert [row['has_failures_detected'] for row in rows] == [False, True, False]
+    assert rows[2]['path'] == 'suhteita.sqlite'
+    assert all((tmp_path / row['path']).exists() for row in rows)
+
+
+def test_select_twins_against_prod_last_week(tmp_path):
+    wanted = dumped_store(tmp_path, 'wun', 'twins', 'https://prod.example.com/')
+    dumped_store(tmp_path, 'two', 'twins', 'https://test.example.com/')
+    dumped_store(tmp_path, 'old', 'twins', 'https://prod.example.com/', start_time=START - dti.timedelta(days=7))
+    failed = dumped_store(tmp_path, 'bad', 'twins', 'https://prod.example.com/', ok=False, kind=JsonLinesStore)
+    found = catalog.paths(tmp_path, since='2026-10-05', until='2026-10-11', scenario='twins', target='*prod*')
+    assert [path.name for path in found] == [wanted.db_name, failed.db_name]
+    found = catalog.paths(tmp_path, since='2026-10-05', scenario='twins', target='*prod*', ok=True)
+    assert [path.name for path in found] == [wanted.db_name]
+    assert [row['identity'] for row in catalog.select(tmp_path, ok=False)] == ['bad']
+
+
+def test_rebuild_from_scratch(tmp_path):
+    dumped_store(tmp_path, 'wun', 'twins', 'https://prod.example.com/')
+    dumped_store(tmp_path, 'two', 'twins', 'https://test.example.com/', kind=JsonLinesStore)
+    dumped_store(tmp_path, 'six', 'solo', 'https://prod.example.com/', kind=SqliteStore)
+    registered = catalog.read_catalog(tmp_path)
+    (tmp_path / CATALOG_NAME).unlink()
+    assert catalog.read_catalog(tmp_path) == []
+    assert catalog.rebuild(tmp_path) == 3
+    assert sorted(row['db_name'] for row in catalog.read_catalog(tmp_path)) == sorted(
+        row['db_name'] for row in registered
+    )
+
+
+def test_rebuild_reads_segmented_runs_once(tmp_path):
+    store = dumped_store(tmp_path, 'wun', 'twins', 'https://prod.example.com/', kind=JsonLinesStore, segments=1)
+    assert len(list(tmp_path.glob('*.jsonl'))) == 3  # Two segments and the catalog
+    assert catalog.rebuild(tmp_path) == 1
+    (row,) = catalog.read_catalog(tmp_path)
+    assert (row['path'], row['event_count'], row['segments']) == (store.db_name, 2, 2)
+
+
+def test_torn_line_and_last_row_wins(tmp_path):
+    dumped_store(tmp_path, 'wun', 'twins', 'https://prod.example.com/')
+    with open(tmp_path / CATALOG_NAME, 'at') as handle:
+        handle.write(json.dumps({**catalog.read_catalog(tmp_path)[0], 'event_count': 3}) + '\n{"db_na')
+    (row,) = catalog.read_catalog(tmp_path)
+    assert row['event_count'] == 3
+
+
+def test_select_sad(tmp_path):
+    with pytest.raises(ValueError, match=r'catalog selection keys \(colour\)'):
+        catalog.select(tmp_path, colour='red')
+
+
+def test_main(tmp_path, capsys):
+    store = dumped_store(tmp_path, 'wun', 'twins', 'https://prod.example.com/')
+    (tmp_path / CATALOG_NAME).unlink()
+    assert catalog.main([str(tmp_path), '--rebuild', '--scenario', 'twins', '--ok']) == 0
+    assert capsys.readouterr().out.strip() == str(tmp_path / store.db_name)
+    assert catalog.main([str(tmp_path), '--failed']) == 0
+    assert capsys.readouterr().out == ''
@@ -42,3 +42,91 @@ def test_parse_request_mode():
     options = cli.parse_request(['--is-cloud'])
     assert options
     assert options.is_cloud
+
+
+def test_parse_request_users():
+    options = cli.parse_request(['--users', '3'])
+    assert options
+    assert options.users == 3
+
+
+def test_parse_request_backend():
+    options = cli.parse_request(['--backend', 'asyncio'])
+    assert options
+    assert options.backend == 'asyncio'
+
+
+def test_parse_request_processes():
+    options = cli.parse_request(['--processes', '4', '--users', '16'])
+    assert options
+    assert options.processes == 4
+
+
+def test_parse_request_arrivals():
+    options = cli.parse_request(['--arrival-rate', '2.5', '--arrival-process', 'poisson'])
+    assert options
+    assert options.arrival_rate == 2.5
+    assert options.arrival_process == 'poisson'
+    assert options.arrival_scope == 'scenario'
+
+
+def test_parse_request_load_shape():
+    options = cli.parse_request(['--load-shape', 'shape.toml'])
+    assert options
+    assert options.load_shape == 'shape.toml'
+
+
+def test_parse_request_definition():
+    options = cli.parse_request(['--definition', 'ping'])
+    assert options
+    assert options.definition == 'ping'
+
+
+def test_parse_request_concurrent_steps():
+    assert cli.parse_request([]).concurrent_steps is False
+    assert cli.parse_request(['--concurrent-steps']).concurrent_steps is True
+
+
+def test_parse_request_store_format():
+    options = cli.parse_request(['--store-format', 'jsonl', '--fsync-every', '10'])
+    assert options.store_format == 'jsonl'
+    assert options.fsync_every == 10
+    assert cli.parse_request([]).store_format == 'json'
+
+
+def test_parse_request_compression():
+    assert cli.parse_request([]).compression == ''
+    assert cli.parse_request(['--compress', 'gzip']).compression == 'gzip'
+
+
+def test_parse_request_segments():
+    options = cli.parse_request(['--segment-events', '1000', '--segment-secs', '3600'])
+    assert (options.segment_events, options.segment_bytes, options.segment_secs) == (1000, 0, 3600.0)
+
+
+def test_parse_request_pool():
+    options = cli.parse_request(['--pool-scope', 'shared', '--pool-maxsize', '64'])
+    assert (options.pool_scope, options.pool_maxsize, options.pool_connections) == ('shared', 64, 10)
+    assert cli.parse_request([]).pool_scope == 'user'
+
+
+def test_parse_request_lean_reads():
+    assert cli.parse_request(['--lean-reads']).lean_reads is True
+    assert cli.parse_request([]).lean_reads is False
+
+
+def test_parse_request_projects_ttl_secs():
+    assert cli.parse_request([]).projects_ttl_secs == 86_400.0
+    assert cli.parse_request(['--projects-ttl-secs', '0']).projects_ttl_secs == 0.0
+
+
+def test_parse_request_issue_pool():
+    options = cli.parse_request([])
+    assert (options.issue_pool, options.issue_order) == (0, 'round-robin')
+    options = cli.parse_request(['--issue-pool', '50', '--issue-order', 'random'])
+    assert (options.issue_pool, options.issue_order) == (50, 'random')
+
+
+def test_parse_request_writer_queue():
+    assert cli.parse_request([]).writer_queue == 10_000
+    assert cli.parse_request(['--writer-queue', '0']).writer_queue == 0
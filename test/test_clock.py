@@ -0,0 +1,46 @@
+import datetime as dti
+
+import pytest
+
+import suhteita.clock as clock
+from suhteita.clock import Clocking, Stopwatch, format_ts, ns_of, usecs_of
+
+MOMENT = dti.datetime(2023, 6, 18, 12, 34, 56, 789012, tzinfo=dti.timezone.utc)
+
+
+def test_format_ts():
+    assert format_ts(ns_of(MOMENT)) == '2023-06-18 12:34:56.789012 UTC'
+    assert format_ts(ns_of(MOMENT) + 999) == '2023-06-18 12:34:56.789012 UTC'
+    assert format_ts(0) == '1970-01-01 00:00:00.000000 UTC'
+
+
+def test_usecs_of_keeps_whole_seconds():
+    assert usecs_of(dti.timedelta(seconds=2, microseconds=300_000)) == 2_300_000
+    assert usecs_of(None) == 0
+
+
+def test_clocking():
+    clk = Clocking(ns_of(MOMENT), 2_300_000_123, ns_of(MOMENT) + 2_300_000_123)
+    assert clk.duration_usecs() == 2_300_000
+    assert clk.start_ts() == '2023-06-18 12:34:56.789012 UTC'
+    assert clk.end_ts() == '2023-06-18 12:34:59.089012 UTC'
+    assert str(clk) == "('2023-06-18 12:34:56.789012 UTC', 2300000, '2023-06-18 12:34:59.089012 UTC')"
+
+
+def test_stopwatch_long_call(monkeypatch):
+    counter = iter([1_000, 2_300_001_000])
+    monkeypatch.setattr(clock.time, 'perf_counter_ns', lambda: next(counter))
+    monkeypatch.setattr(clock.time, 'time_ns', lambda: ns_of(MOMENT))
+    with Stopwatch() as watch:
+        pass
+    assert watch.clocking == (ns_of(MOMENT), 2_300_000_000, ns_of(MOMENT) + 2_300_000_000)
+    assert watch.clocking.duration_usecs() == 2_300_000
+
+
+def test_stopwatch_clocks_failing_block():
+    watch = Stopwatch()
+    with pytest.raises(RuntimeError):
+        with watch:
+            raise RuntimeError('You asked for it!')
+    assert watch.clocking.duration_ns >= 0
+    assert watch.clocking.start_ns <= watch.clocking.end_ns
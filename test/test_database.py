@@ -0,0 +1,51 @@
+import datetime as dti
+
+import pytest
+
+import suhteita.database as database
+from suhteita.clock import ns_of
+
+START = dti.datetime(2026, 1, 2, 3, 4, 5, tzinfo=dti.timezone.utc)
+
+
+def store_data(target='target', node='node', durations=(10, 20, 30, 40, 50, 60, 70, 80, 90, 100), name='a'):
+    ts = START.strftime('%Y-%m-%d %H:%M:%S.%f UTC')
+    events = [
+        {'rank': rank, 'label': 'LOGIN', 'ok': True, 'start_ts': ts, 'duration_usecs': duration, 'end_ts': ts}
+        for rank, duration in enumerate(durations, start=1)
+    ]
+    events.append(
+        {'rank': 0, 'label': 'SERVER_INFO', 'ok': False, 'start_ts': ts, 'duration_usecs': 1, 'end_ts': ts, 'user': 'u'}
+    )
+    meta = {'db_name': name, 'target': target, 'node_indicator': node, 'scenario': 'scenario', 'start_ts': ts}
+    return {'_meta': meta, 'events': events}
+
+
+def test_connect_wal(tmp_path):
+    connection = database.connect(tmp_path / database.DATABASE_NAME)
+    assert connection.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+    connection.close()
+
+
+def test_import_store_and_percentiles(tmp_path):
+    connection = database.connect(tmp_path / database.DATABASE_NAME)
+    run_id = database.import_store(connection, store_data())
+    database.import_store(connection, store_data(target='other', node='elsewhere', durations=(1_000,), name='b'))
+    assert run_id == 1
+    assert database.labels(connection) == ['LOGIN', 'SERVER_INFO']
+    assert database.percentiles(connection, 'LOGIN', target='target') == {'p50': 50, 'p90': 90, 'p95': 100, 'p99': 100}
+    assert database.percentiles(connection, 'LOGIN', points=(100,)) == {'p100': 1_000}
+    assert database.percentiles(connection, 'LOGIN', points=(50,), node_indicator='elsewhere') == {'p50': 1_000}
+    assert database.percentiles(connection, 'SERVER_INFO', points=(50,)) == {'p50': None}
+    assert database.durations(connection, 'SERVER_INFO', ok_only=False) == [1, 1]
+    start_ns = ns_of(START)
+    assert database.durations(connection, 'LOGIN', since_ns=start_ns + 1) == []
+    assert len(database.durations(connection, 'LOGIN', since_ns=start_ns, until_ns=start_ns + 1)) == 11
+    tags = connection.execute("SELECT tags FROM events WHERE label = 'SERVER_INFO' LIMIT 1").fetchone()
+    assert tags == ('{"user": "u"}',)
+    connection.close()
+
+
+def test_where_sad():
+    with pytest.raises(ValueError, match=r'unknown filters \(label\)'):
+        database.where({'label': 'LOGIN'})
@@ -0,0 +1,197 @@
+import datetime as dti
+import threading
+
+import suhteita.database as database
+import suhteita.engine as engine
+from suhteita.clock import Stopwatch
+from suhteita.store import Store, load_store, open_store
+
+CONTEXT = {
+    'target': 'target',
+    'mode': 'mode',
+    'project': 'project',
+    'scenario': 'scenario',
+    'identity': 'identity',
+    'start_time': dti.datetime.now(tz=dti.timezone.utc),
+}
+
+
+class Setup:
+    pass
+
+
+def clocking():
+    with Stopwatch() as watch:
+        pass
+    return watch.clocking
+
+
+def two_steps(cfg, store):
+    store.add('LOGIN', True, clocking())
+    store.add('SERVER_INFO', True, clocking(), threading.current_thread().name)
+    return 0, False
+
+
+def test_user_ids():
+    assert engine.user_ids(3) == ['u0001', 'u0002', 'u0003']
+
+
+def test_merge_outcomes():
+    assert engine.merge_outcomes([(0, False), (1, False), (0, True)]) == (1, True)
+    assert engine.merge_outcomes([]) == (0, False)
+
+
+def test_run_users_single():
+    store = Store(context=CONTEXT, setup=Setup(), folder_path='/tmp/away')
+    assert engine.run_users(two_steps, Setup(), store, users=1) == (0, False)
+    assert [event['user'] for event in store.db['events']] == ['u0001', 'u0001']
+    assert [event['rank'] for event in store.db['events']] == [1, 2]
+
+
+def test_run_users_many():
+    store = Store(context=CONTEXT, setup=Setup(), folder_path='/tmp/away')
+    assert engine.run_users(two_steps, Setup(), store, users=5) == (0, False)
+    events = store.db['events']
+    assert len(events) == 10
+    assert {event['user'] for event in events} == set(engine.user_ids(5))
+    for user_id in engine.user_ids(5):
+        assert [event['rank'] for event in events if event['user'] == user_id] == [1, 2]
+
+
+def test_run_users_failing_user():
+    def flaky(cfg, store):
+        if cfg.user_id == 'u0002':
+            raise RuntimeError('You asked for it!')
+        return two_steps(cfg, store)
+
+    store = Store(context=CONTEXT, setup=Setup(), folder_path='/tmp/away')
+    assert engine.run_users(flaky, Setup(), store, users=3) == (1, True)
+    assert len(store.db['events']) == 4
+
+
+def test_run_users_async():
+    async def two_steps_async(cfg, store):
+        if cfg.user_id == 'u0003':
+            raise RuntimeError('You asked for it!')
+        return two_steps(cfg, store)
+
+    store = Store(context=CONTEXT, setup=Setup(), folder_path='/tmp/away')
+    assert engine.run_users_async(two_steps_async, Setup(), store, users=4) == (1, True)
+    assert len(store.db['events']) == 6
+    assert {event['user'] for event in store.db['events']} == {'u0001', 'u0002', 'u0004'}
+
+
+def test_shard_users():
+    assert engine.worker_ids(2) == ['w01', 'w02']
+    assert engine.shard_users(engine.user_ids(5), 2) == [['u0001', 'u0003', 'u0005'], ['u0002', 'u0004']]
+    assert engine.shard_users(engine.user_ids(1), 3) == [['u0001']]
+
+
+def test_run_processes(tmp_path):
+    cfg = Setup()
+    cfg.storage_path = str(tmp_path)
+    store = Store(context=CONTEXT, setup=cfg, folder_path=tmp_path)
+    assert engine.run_processes(two_steps, cfg, store, users=5, processes=2) == (0, False)
+    events = store.db['events']
+    assert len(events) == 10
+    assert {event['user'] for event in events} == set(engine.user_ids(5))
+    assert {event['worker'] for event in events} == {'w01', 'w02'}
+    workers = store.db['_meta']['workers']
+    assert [worker['worker'] for worker in workers] == ['w01', 'w02']
+    assert [worker['event_count'] for worker in workers] == [6, 4]
+    assert not list((tmp_path / engine.SHARDS_FOLDER).glob('*.json'))
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    assert store.db['_meta']['has_failures_detected'] is False
+
+
+def test_run_processes_jsonl(tmp_path):
+    cfg = Setup()
+    cfg.storage_path, cfg.store_format = str(tmp_path), 'jsonl'
+    store = open_store(context=CONTEXT, setup=cfg, folder_path=tmp_path)
+    assert engine.run_processes(two_steps, cfg, store, users=3, processes=2) == (0, False)
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    db = load_store(tmp_path / store.db_name)
+    assert len(db['events']) == 6
+    assert {event['worker'] for event in db['events']} == {'w01', 'w02'}
+    assert [worker['event_count'] for worker in db['_meta']['workers']] == [4, 2]
+    assert {label: data['count'] for label, data in db['_meta']['histograms'].items()} == {'LOGIN': 3, 'SERVER_INFO': 3}
+    assert not list((tmp_path / engine.SHARDS_FOLDER).glob('*.jsonl'))
+
+
+def test_run_processes_sqlite(tmp_path):
+    cfg = Setup()
+    cfg.storage_path, cfg.store_format = str(tmp_path), 'sqlite'
+    store = open_store(context=CONTEXT, setup=cfg, folder_path=tmp_path)
+    assert engine.run_processes(two_steps, cfg, store, users=3, processes=2) == (0, False)
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    connection = database.connect(tmp_path / database.DATABASE_NAME)
+    workers = connection.execute("SELECT json_extract(tags, '$.worker'), count(*) FROM events GROUP BY 1").fetchall()
+    assert sorted(workers) == [('w01', 4), ('w02', 2)]
+    assert connection.execute('SELECT count(*) FROM runs').fetchone() == (1,)
+    connection.close()
+    assert not list((tmp_path / engine.SHARDS_FOLDER).glob('*.jsonl'))
+
+
+def test_run_arrivals_open_model():
+    cfg = Setup()
+    cfg.arrival_rate, cfg.arrival_process, cfg.arrival_scope = 50.0, 'constant', 'scenario'
+    store = Store(context=CONTEXT, setup=cfg, folder_path='/tmp/away')
+    assert engine.dispatch(two_steps, cfg, store, users=3) == (0, False)
+    events = store.db['events']
+    assert len(events) == 6
+    scheduled = sorted({event['scheduled_ts'] for event in events})
+    assert len(scheduled) == 3
+    assert all(event['scheduled_ts'] <= event['started_ts'] <= event['start_ts'] for event in events)
+    assert all(event['intended_ts'] <= event['start_ts'] for event in events)
+    assert all(event['corrected_usecs'] >= 0 for event in events)
+
+
+def test_run_users_paced_transactions():
+    cfg = Setup()
+    cfg.arrival_rate, cfg.arrival_process, cfg.arrival_scope = 50.0, 'constant', 'transaction'
+    store = Store(context=CONTEXT, setup=cfg, folder_path='/tmp/away')
+    assert engine.dispatch(two_steps, cfg, store, users=2) == (0, False)
+    for user_id in engine.user_ids(2):
+        wun, two = [event for event in store.db['events'] if event['user'] == user_id]
+        assert wun['scheduled_ts'] < two['scheduled_ts'] <= two['start_ts']
+
+
+def test_run_users_async_open_model():
+    async def two_steps_async(cfg, store):
+        return two_steps(cfg, store)
+
+    cfg = Setup()
+    cfg.arrival_rate, cfg.arrival_process, cfg.arrival_scope = 100.0, 'poisson', 'scenario'
+    store = Store(context=CONTEXT, setup=cfg, folder_path='/tmp/away')
+    assert engine.dispatch(two_steps_async, cfg, store, users=3, backend='asyncio') == (0, False)
+    assert len({event['scheduled_ts'] for event in store.db['events']}) == 3
+
+
+def test_run_user_shape():
+    cfg = Setup()
+    cfg.load_shape = {
+        'stages': [
+            {'name': 'step', 'duration_secs': 0.3, 'users': 1, 'ramp': False},
+            {'name': 'spike', 'duration_secs': 0.6, 'users': 3, 'ramp': False},
+        ]
+    }
+    store = Store(context=CONTEXT, setup=cfg, folder_path='/tmp/away')
+    assert engine.dispatch(two_steps, cfg, store) == (0, False)
+    events = store.db['events']
+    assert {event['stage'] for event in events} == {'step', 'spike'}
+    assert {event['user'] for event in events if event['stage'] == 'step'} == {'u0001'}
+    assert {event['user'] for event in events if event['stage'] == 'spike'} == set(engine.user_ids(3))
+    assert all(event['rank'] in (1, 2) for event in events)
+    assert max(event['iteration'] for event in events) > 1
+
+
+def test_run_rate_shape():
+    cfg = Setup()
+    cfg.users = 4
+    cfg.load_shape = {'stages': [{'name': 'steady', 'duration_secs': 0.25, 'rate': 20, 'ramp': False}]}
+    store = Store(context=CONTEXT, setup=cfg, folder_path='/tmp/away')
+    assert engine.dispatch(two_steps, cfg, store) == (0, False)
+    events = store.db['events']
+    assert len({event['user'] for event in events}) == 4
+    assert {event['stage'] for event in events} == {'steady'}
+    assert all(event['corrected_usecs'] >= 0 for event in events)
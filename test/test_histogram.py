@@ -0,0 +1,56 @@
+import math
+import random
+
+import pytest
+
+from suhteita.histogram import Histogram, merged, summary
+
+
+def nearest_rank(values, point):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(round(len(ordered) * point / 100, 9))) - 1]
+
+
+def test_histogram_small_values_exact():
+    histogram = Histogram()
+    for value in range(256):
+        histogram.record(value)
+    assert histogram.percentiles((1, 50, 100)) == {'p1': 2, 'p50': 127, 'p100': 255}
+    assert (histogram.count, histogram.min, histogram.max, histogram.mean()) == (256, 0, 255, 127.5)
+
+
+def test_histogram_relative_error_and_buckets():
+    histogram = Histogram()
+    for value in (256, 257, 1_000_000, 2**62):
+        index = histogram.index(value)
+        assert value <= histogram.highest(index) <= value * (1 + 2**-histogram.sub_bucket_bits)
+    assert histogram.index(2**63 - 1) < 8192
+
+
+def test_histogram_merge_is_exact():
+    rng = random.Random(42)
+    values = [int(rng.lognormvariate(10, 1.5)) for _ in range(10_000)]
+    whole, wun, two = Histogram(), Histogram(), Histogram()
+    for n, value in enumerate(values):
+        whole.record(value)
+        (wun if n % 3 else two).record(value)
+    assert Histogram().merge(wun).merge(two) == whole
+    assert merged([{'histograms': {'X': wun.as_dict()}}, {'histograms': {'X': two.as_dict()}}, {}]) == {'X': whole}
+    for point in (50, 90, 99, 99.9):
+        exact = nearest_rank(values, point)
+        assert exact <= whole.percentile(point) <= exact * (1 + 2**-whole.sub_bucket_bits)
+    assert summary({'X': whole}, points=(100,)) == [['X', 10_000, max(values), max(values)]]
+
+
+def test_histogram_round_trip():
+    histogram = Histogram()
+    histogram.record(42, count=3)
+    assert Histogram.from_dict(histogram.as_dict()) == histogram
+    assert Histogram().percentile(50) is None
+
+
+def test_histogram_sad():
+    with pytest.raises(ValueError, match=r'histogram value \(-1\) is negative'):
+        Histogram().record(-1)
+    with pytest.raises(ValueError, match=r'histogram sub-bucket bits \(3\) differ from \(7\)'):
+        Histogram().merge(Histogram(3))
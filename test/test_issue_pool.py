@@ -0,0 +1,60 @@
+import pytest
+
+import suhteita.issue_pool as issue_pool
+
+
+class Service(dict):
+    def __init__(self, tagged=()):
+        super().__init__(tagged=list(tagged), created=[])
+
+    def jql(self, query, fields='*all', start=0, limit=None):
+        self['query'] = query
+        self['pages'] = self.get('pages', 0) + 1
+        return {'issues': [{'key': key} for key in self['tagged'][start : start + limit]]}
+
+    def issue_create(self, fields):
+        assert fields['labels'] == [issue_pool.POOL_LABEL]
+        key = f'{fields["project"]["key"]}-{100 + len(self["created"])}'
+        self['created'].append(key)
+        self['tagged'].append(key)
+        return {'key': key}
+
+
+def test_provision_adopts_tagged_and_creates_the_rest(project_catalog):
+    service = Service(tagged=['ABC-1', 'ABC-2'])
+    keys = issue_pool.provision(service, 'target', 'ABC', 3, ts='now')
+    assert keys == ['ABC-1', 'ABC-2', 'ABC-100']
+    assert service['query'] == 'project = "ABC" AND labels = "suhteita-pool" ORDER BY key ASC'
+    assert issue_pool.load('target', 'ABC') == keys
+    assert issue_pool.load('target', 'XYZ') == []
+
+
+def test_provision_reuses_persisted_keys(project_catalog):
+    issue_pool.persist('target', 'ABC', ['ABC-9', 'ABC-7', 'ABC-8'])
+    service = Service(tagged=['ABC-7', 'ABC-8', 'ABC-9'])
+    assert issue_pool.provision(service, 'target', 'ABC', 2, ts='now') == ['ABC-9', 'ABC-7']
+    assert service['created'] == []
+    assert issue_pool.load('target', 'ABC') == ['ABC-9', 'ABC-7', 'ABC-8']  # A smaller pool keeps the spare keys
+
+
+def test_provision_drops_stale_keys(project_catalog):
+    issue_pool.persist('target', 'ABC', ['ABC-1', 'ABC-2', 'ABC-3'])
+    service = Service(tagged=['ABC-2'])  # ABC-1 was deleted and ABC-3 lost the label
+    assert issue_pool.provision(service, 'target', 'ABC', 3, ts='now') == ['ABC-2', 'ABC-100', 'ABC-101']
+    assert issue_pool.load('target', 'ABC') == ['ABC-2', 'ABC-100', 'ABC-101']
+
+
+def test_tagged_pages_through_the_search(monkeypatch):
+    monkeypatch.setattr(issue_pool, 'PAGE_SIZE', 2)
+    service = Service(tagged=['ABC-1', 'ABC-2', 'ABC-3', 'ABC-4'])
+    assert issue_pool.tagged(service, 'ABC') == ['ABC-1', 'ABC-2', 'ABC-3', 'ABC-4']
+    assert service['pages'] == 3
+
+
+def test_pick():
+    keys = ['A-1', 'A-2', 'A-3']
+    turns = [issue_pool.pick(keys) for _ in range(6)]
+    assert turns[:3] == turns[3:] and sorted(turns[:3]) == keys
+    assert issue_pool.pick(keys, 'random') in keys
+    with pytest.raises(ValueError, match='is not one of'):
+        issue_pool.pick(keys, 'sorted')
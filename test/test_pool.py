@@ -0,0 +1,121 @@
+import http.server
+import threading
+import types
+
+import httpx
+import pytest
+
+import suhteita.pool as pool
+import suhteita.ticket_system_actions_async as actions_async
+
+
+class KeepAlive(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), KeepAlive)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def settings():
+    yield
+    pool.configure(types.SimpleNamespace())
+    pool.close()
+
+
+def test_configure():
+    assert pool.configure(types.SimpleNamespace(), users=50)['maxsize'] == 10
+    assert pool.configure(types.SimpleNamespace(pool_scope='shared'), users=50)['maxsize'] == 50
+    assert pool.configure(types.SimpleNamespace(pool_scope='shared', pool_maxsize=8), users=50)['maxsize'] == 8
+    assert pool.configure(types.SimpleNamespace(keepalive_secs=30))['keepalive_secs'] == 30
+
+
+def test_configure_sad():
+    with pytest.raises(ValueError, match=r'pool scope \(process\) is not one of'):
+        pool.configure(types.SimpleNamespace(pool_scope='process'))
+
+
+def test_session_scope(server):
+    assert pool.session(server) is not pool.session(server)
+    pool.configure(types.SimpleNamespace(pool_scope='shared', pool_maxsize=3))
+    shared = pool.session(server)
+    assert shared is pool.session(server)
+    assert shared.get_adapter(server)._pool_maxsize == 3
+    pool.close()
+    assert pool.session(server) is not shared
+
+
+def test_tally_reused_connections(server):
+    session = pool.session(server)
+    tallies = []
+    for _ in range(2):
+        tallies.append(pool.track())
+        assert session.get(f'{server}/rest').status_code == 200
+    first, second = (tally.tags() for tally in tallies)
+    assert (first['reused'], first['new_connections']) == (False, 1)
+    assert (second['reused'], second['new_connections']) == (True, 0)
+    assert first['response_bytes'] == second['response_bytes'] == 2
+    assert sorted(first['phases']) == ['connect_usecs', 'dns_usecs', 'transfer_usecs', 'ttfb_usecs']
+    assert sorted(second['phases']) == ['transfer_usecs', 'ttfb_usecs']  # No handshakes on a kept-alive connection
+    assert pool.track().tags() == {}  # Steps without requests are not tagged
+    session.close()
+
+
+def test_tally_per_thread(server):
+    session = pool.session(server)
+    tally = pool.track()
+    other = []
+    thread = threading.Thread(target=lambda: other.append(session.get(server).status_code))
+    thread.start()
+    thread.join()
+    assert other == [200]
+    assert (tally.requests, tally.connections, tally.phases) == (0, 0, {})
+    session.close()
+
+
+@pytest.mark.asyncio
+async def test_async_tally_and_shared_client(server):
+    pool.configure(types.SimpleNamespace(pool_scope='shared'))
+    jira = actions_async.AsyncJira(server, 'user', 'token')
+    other = actions_async.AsyncJira(server, 'user', 'token')
+    assert jira.client is other.client
+    tallies = []
+    for _ in range(2):
+        tallies.append(pool.track())
+        await jira._send('GET', 'serverInfo')
+    assert [tally.tags()['reused'] for tally in tallies] == [False, True]
+    assert sorted(tallies[0].tags()['phases']) == ['connect_usecs', 'transfer_usecs', 'ttfb_usecs']
+    assert sorted(tallies[1].tags()['phases']) == ['transfer_usecs', 'ttfb_usecs']
+    await jira.close()
+    assert not jira.client.is_closed
+    await pool.aclose()
+    assert jira.client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_async_client_per_user():
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+    jira = actions_async.AsyncJira('https://example.com/', 'user', 'token', transport=transport)
+    tally = pool.track()
+    assert await jira.get_server_info() == {}
+    assert tally.tags() == {'reused': True, 'new_connections': 0, 'response_bytes': 2}  # The mock connects nowhere
+    await jira.close()
+    assert jira.client.is_closed
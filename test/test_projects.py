@@ -0,0 +1,31 @@
+import time
+
+import suhteita.projects as projects
+
+
+def test_update_and_freshness(project_catalog):
+    assert project_catalog.read_catalog() == {}
+    assert not projects.is_fresh('target', 'ABC')
+    projects.update('target', found=['ABC', 'XYZ'])
+    assert projects.is_fresh('target', 'ABC')
+    assert not projects.is_fresh('target', 'ABC', ttl_secs=0)
+    assert not projects.is_fresh('other', 'ABC')
+    projects.update('target', missing=['XYZ'])
+    assert sorted(projects.read_catalog()['target']) == ['ABC']
+    projects.update('target', found=['NEW'], complete=True)
+    assert sorted(projects.read_catalog()['target']) == ['NEW']
+
+
+def test_stale_entries_are_not_fresh(project_catalog):
+    projects.write_catalog({'target': {'ABC': time.time() - 2 * projects.DEFAULT_TTL_SECS}})
+    assert not projects.is_fresh('target', 'ABC')
+    assert projects.is_fresh('target', 'ABC', ttl_secs=3 * projects.DEFAULT_TTL_SECS)
+
+
+def test_unreadable_catalog_reads_empty(project_catalog):
+    projects.catalog_path().parent.mkdir(parents=True)
+    projects.catalog_path().write_text('{not json', encoding='utf-8')
+    assert projects.read_catalog() == {}
+    projects.update('target', found=['ABC'])
+    assert list(projects.read_catalog()) == ['target']
+    assert [path.name for path in projects.CACHE_FOLDER.iterdir()] == ['projects.json']
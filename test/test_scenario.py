@@ -0,0 +1,324 @@
+import asyncio
+import datetime as dti
+import pickle
+import types
+
+import pytest
+
+import suhteita.pool as pool
+import suhteita.ticket_system_actions as actions
+import suhteita.ticket_system_actions_async as actions_async
+from suhteita.clock import Stopwatch
+from suhteita.scenario import (
+    AsyncExecutor,
+    Bindings,
+    Executor,
+    available_definitions,
+    compile_require,
+    compile_steps,
+    compile_value,
+    dependencies,
+    load_definition,
+    parse_definition,
+    width,
+)
+from suhteita.store import Store
+
+CONTEXT = {
+    'target': 'target',
+    'mode': 'mode',
+    'project': 'project',
+    'scenario': 'scenario',
+    'identity': 'identity',
+    'start_time': dti.datetime.now(tz=dti.timezone.utc),
+}
+
+
+def clocking():
+    with Stopwatch() as watch:
+        pass
+    return watch.clocking
+
+
+def seed(cfg, store):
+    return {'token': 'secret'}
+
+
+def setup(project='XYZ', concurrent_steps=False):
+    return types.SimpleNamespace(
+        concurrent_steps=concurrent_steps,
+        target_url='https://example.com',
+        user='someone',
+        is_cloud=False,
+        target_project=project,
+        ts='now',
+        c_rand='random',
+        desc_core='core',
+        node_indicator='node',
+    )
+
+
+def test_available_definitions():
+    assert available_definitions() == ['creator', 'ping', 'reader', 'twenty_seven']
+
+
+def test_load_definition_reader():
+    definition = load_definition('reader')
+    assert definition.labels() == ['LOGIN', 'ISSUE_EXISTS', 'GET_ISSUE_STATUS', 'EXECUTE_JQL', 'LOAD_ISSUE']
+    assert compile_steps(definition, actions)
+    assert compile_steps(definition, actions_async)
+
+
+def test_load_definition_twenty_seven():
+    definition = load_definition()
+    assert definition.name == 'twenty_seven'
+    assert len(definition.labels()) == 27
+    assert definition.step_map()[13] == 'CREATE_DUPLICATES_ISSUE_LINK'
+    assert definition.label_map()['ADD_COMMENT'] == [10, 18, 26, 27]
+    assert definition.label_map()['SET_ISSUE_STATUS'] == [15, 16, 21]
+    assert definition.step_map()[3] == 'PROJECT_EXISTS'  # Listing all projects stays in the creator scenario
+    assert list(definition.label_map()) == sorted(set(definition.labels()))
+    assert compile_steps(definition, actions)
+    assert compile_steps(definition, actions_async)
+
+
+def test_load_definition_sad(tmp_path):
+    with pytest.raises(ValueError, match=r'scenario definition \(nope\) is neither a file nor one of'):
+        load_definition('nope')
+    with pytest.raises(ValueError, match='requires at least one step'):
+        parse_definition({'name': 'empty'})
+    with pytest.raises(ValueError, match='step 1 requires a label and an action'):
+        parse_definition({'steps': [{'label': 'X'}]})
+    path = tmp_path / 'typo.json'
+    path.write_text('{"steps": [{"label": "X", "action": "no_such_action"}]}', encoding='utf-8')
+    with pytest.raises(ValueError, match=r'references unknown action \(no_such_action\)'):
+        compile_steps(load_definition(path), actions)
+
+
+def test_compile_value():
+    bindings = Bindings(key='XYZ-1', items=[1, 2, 3], response={'body': 'text'}, flag=True)
+    assert compile_value('$flag')(bindings) is True
+    assert compile_value('issue = {key}')(bindings) == 'issue = XYZ-1'
+    assert compile_value('count({#items}) of ({response[body]})')(bindings) == 'count(3) of (text)'
+    assert compile_value(['$key', {'nested': '$items'}, 42])(bindings) == ['XYZ-1', {'nested': [1, 2, 3]}, 42]
+    with pytest.raises(KeyError):
+        compile_value('$missing')(bindings)
+
+
+def test_compile_require():
+    bindings = Bindings({'found': True, 'gone': False, 'projects': [{'key': 'ABC'}], 'target_project': 'ABC'})
+    assert compile_require({})(bindings) == (True, None, [])
+    assert compile_require({'binding': 'found'})(bindings) == (True, True, [])
+    assert compile_require({'binding': 'gone'})(bindings) == (False, False, [])
+    contains = {'binding': 'projects', 'key': 'key', 'contains': '$target_project'}
+    assert compile_require(contains)(bindings) == (True, 'ABC', ['ABC'])
+
+
+def test_dependencies():
+    assert dependencies(load_definition('ping')) == [frozenset(), {1}]
+    assert dependencies(load_definition('creator')) == [frozenset(), {1}, {1, 2}, {1, 3}]
+    afters = dependencies(load_definition())
+    assert afters[3] == {1, 3}  # The first issue only needs the login and the verified project
+    assert afters[5] == {1, 3}  # ... as does the duplicate
+    assert afters[22] == {1, 3}
+    assert afters[26] == {1, 3, 6, 18}
+
+
+def test_width():
+    assert width([frozenset(), frozenset(), frozenset({1}), frozenset({2})]) == 2
+    assert width([frozenset(), frozenset({1}), frozenset({1}), frozenset({2, 3})]) == 2
+    assert width(dependencies(load_definition('creator'))) == 1
+    assert width(dependencies(load_definition('reader'))) == 4
+    assert width(dependencies(load_definition())) == 3  # Threads per virtual user instead of the 27 steps
+
+
+def patch_creator(monkeypatch):
+    monkeypatch.setattr(actions, 'login', lambda **kwargs: (clocking(), 'service'))
+    monkeypatch.setattr(actions, 'get_server_info', lambda service: (clocking(), {}))
+    monkeypatch.setattr(actions, 'get_all_projects', lambda service: (clocking(), [{'key': 'ABC'}, {'key': 'XYZ'}]))
+    monkeypatch.setattr(actions, 'create_issue', lambda **kwargs: (clocking(), f'{kwargs["project"]}-1'))
+
+
+def test_executor_ping(monkeypatch):
+    calls = []
+
+    def login(target_url, user, password, is_cloud):
+        calls.append((target_url, user, password, is_cloud))
+        return clocking(), 'service'
+
+    monkeypatch.setattr(actions, 'login', login)
+    monkeypatch.setattr(actions, 'get_server_info', lambda service: (clocking(), {'version': service}))
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert Executor(load_definition('ping'), seed)(setup(), store) == (0, False)
+    assert calls == [('https://example.com', 'someone', 'secret', False)]
+    assert [(e['label'], e['ok'], e['comment']) for e in store.db['events']] == [
+        ('LOGIN', True, ''),
+        ('SERVER_INFO', True, "{'version': 'service'}"),
+    ]
+
+
+def test_executor_tags_connection_reuse(monkeypatch):
+    def get_server_info(service):
+        pool.count_request()
+        pool.count_connection()
+        return clocking(), {}
+
+    monkeypatch.setattr(actions, 'login', lambda **kwargs: (clocking(), 'service'))
+    monkeypatch.setattr(actions, 'get_server_info', get_server_info)
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert Executor(load_definition('ping'), seed)(setup(), store) == (0, False)
+    login, server_info = store.db['events']
+    assert 'reused' not in login
+    assert (server_info['reused'], server_info['new_connections']) == (False, 1)
+
+
+def test_executor_records_split_off_operations(monkeypatch):
+    def get_server_info(service):
+        pool.count_request()
+        pool.count_connection()
+        pool.split_off('LOOKUP', clocking(), 'ahead')
+        pool.count_request()
+        return clocking(), {}
+
+    monkeypatch.setattr(actions, 'login', lambda **kwargs: (clocking(), 'service'))
+    monkeypatch.setattr(actions, 'get_server_info', get_server_info)
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert Executor(load_definition('ping'), seed)(setup(), store) == (0, False)
+    _, lookup, server_info = store.db['events']
+    assert (lookup['label'], lookup['comment'], lookup['step'], lookup['reused']) == ('LOOKUP', 'ahead', 2, False)
+    assert (server_info['label'], server_info['step'], server_info['reused']) == ('SERVER_INFO', 2, True)
+
+
+def test_executor_qualifies_labels(monkeypatch):
+    def get_server_info(service):
+        pool.qualify('_CACHED')
+        return clocking(), {}
+
+    monkeypatch.setattr(actions, 'login', lambda **kwargs: (clocking(), 'service'))
+    monkeypatch.setattr(actions, 'get_server_info', get_server_info)
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert Executor(load_definition('ping'), seed)(setup(), store) == (0, False)
+    assert [event['label'] for event in store.db['events']] == ['LOGIN', 'SERVER_INFO_CACHED']
+
+
+def test_executor_creator_requires_project(monkeypatch):
+    patch_creator(monkeypatch)
+    executor = Executor(load_definition('creator'), seed)
+
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert executor(setup(), store) == (0, False)
+    assert store.db['events'][2]['comment'] == 'count(2)'
+    assert len(store.db['events']) == 4
+
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert executor(setup('NOPE'), store) == (1, True)
+    assert len(store.db['events']) == 3
+
+
+def test_executor_concurrent_steps(monkeypatch):
+    patch_creator(monkeypatch)
+    executor = Executor(load_definition('creator'), seed)
+
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert executor(setup(concurrent_steps=True), store) == (0, False)
+    assert sorted(e['step'] for e in store.db['events']) == [1, 2, 3, 4]
+    assert store.db['events'][-1]['label'] == 'CREATE_ISSUE'
+
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert executor(setup('NOPE', concurrent_steps=True), store) == (1, True)
+    assert 'CREATE_ISSUE' not in [e['label'] for e in store.db['events']]
+
+
+def test_async_executor_concurrent_steps(monkeypatch):
+    class Service:
+        async def close(self):
+            pass
+
+    async def login(**kwargs):
+        return clocking(), Service()
+
+    async def get_server_info(service):
+        return clocking(), {}
+
+    async def get_all_projects(service):
+        return clocking(), [{'key': 'XYZ'}]
+
+    async def create_issue(**kwargs):
+        return clocking(), 'XYZ-1'
+
+    for function in (login, get_server_info, get_all_projects, create_issue):
+        monkeypatch.setattr(actions_async, function.__name__, function)
+    executor = AsyncExecutor(load_definition('creator'), seed)
+
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert asyncio.run(executor(setup(concurrent_steps=True), store)) == (0, False)
+    assert sorted(e['step'] for e in store.db['events']) == [1, 2, 3, 4]
+
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert asyncio.run(executor(setup('NOPE', concurrent_steps=True), store)) == (1, True)
+    assert len(store.db['events']) == 3
+
+
+def test_async_executor_starts_no_step_after_stop(monkeypatch):
+    class Service:
+        async def close(self):
+            pass
+
+    async def login(**kwargs):
+        return clocking(), Service()
+
+    async def get_all_projects(service):
+        return clocking(), [{'key': 'XYZ'}]
+
+    monkeypatch.setattr(actions_async, 'login', login)
+    monkeypatch.setattr(actions_async, 'get_all_projects', get_all_projects)
+    definition = parse_definition(
+        {
+            'steps': [
+                {'label': 'LOGIN', 'action': 'login', 'args': {'target_url': '$target_url'}, 'bind': ['service']},
+                {
+                    'label': 'PROJECTS',
+                    'action': 'get_all_projects',
+                    'args': {'service': '$service'},
+                    'bind': ['projects'],
+                    'require': {'binding': 'projects', 'key': 'key', 'contains': '$target_project'},
+                },
+                {'label': 'SIBLING', 'action': 'get_all_projects', 'args': {'service': '$service'}},
+            ]
+        }
+    )
+    executor = AsyncExecutor(definition, seed)
+    executor.steps = [compiled._replace(after=frozenset({1})) for compiled in executor.steps]  # Siblings
+    executor.steps[0] = executor.steps[0]._replace(after=frozenset())
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    assert asyncio.run(executor(setup('NOPE', concurrent_steps=True), store)) == (1, True)
+    assert [e['label'] for e in store.db['events']] == ['LOGIN', 'PROJECTS']
+
+
+def test_executor_pickles_as_definition():
+    executor = pickle.loads(pickle.dumps(Executor(load_definition('ping'), seed)))
+    assert executor.definition == load_definition('ping')
+    assert len(executor.steps) == 2
+
+
+def test_async_executor_closes_service(monkeypatch):
+    class Service:
+        closed = False
+
+        async def close(self):
+            self.closed = True
+
+    service = Service()
+
+    async def login(target_url, user, password, is_cloud):
+        return clocking(), service
+
+    async def get_server_info(service):
+        raise RuntimeError('You asked for it!')
+
+    monkeypatch.setattr(actions_async, 'login', login)
+    monkeypatch.setattr(actions_async, 'get_server_info', get_server_info)
+    store = Store(context=CONTEXT, setup=setup(), folder_path='/tmp/away')
+    with pytest.raises(RuntimeError):
+        asyncio.run(AsyncExecutor(load_definition('ping'), seed)(setup(), store))
+    assert service.closed
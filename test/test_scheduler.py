@@ -0,0 +1,54 @@
+import itertools
+import random
+import time
+
+import pytest
+
+from suhteita.scheduler import Schedule, inter_arrival_gaps
+
+
+def test_inter_arrival_gaps_constant():
+    assert list(itertools.islice(inter_arrival_gaps(4.0), 3)) == [0.25, 0.25, 0.25]
+
+
+def test_inter_arrival_gaps_poisson():
+    gaps = list(itertools.islice(inter_arrival_gaps(100.0, 'poisson', random.Random(42)), 10_000))
+    assert all(gap > 0 for gap in gaps)
+    assert 0.009 < sum(gaps) / len(gaps) < 0.011
+
+
+def test_inter_arrival_gaps_sad():
+    with pytest.raises(ValueError, match=r'arrival rate must be positive but is \(0\)'):
+        next(inter_arrival_gaps(0))
+    with pytest.raises(ValueError, match=r'arrival process \(bursty\) is not one of'):
+        next(inter_arrival_gaps(1.0, 'bursty'))
+
+
+def test_schedule_holds_back_early_arrivals():
+    schedule = Schedule(20.0)
+    first = schedule.intended()
+    schedule.advance()
+    assert (schedule.intended() - first).total_seconds() == pytest.approx(0.05)
+    start = time.monotonic()
+    schedule.wait()
+    assert time.monotonic() - start >= 0.04
+    assert schedule.remaining() <= 0
+
+
+def test_schedule_ignores_late_arrivals():
+    schedule = Schedule(1000.0)
+    time.sleep(0.01)
+    schedule.advance()
+    assert schedule.remaining() < 0
+    start = time.monotonic()
+    schedule.wait()
+    assert time.monotonic() - start < 0.005
+
+
+def test_schedule_finite_gaps():
+    schedule = Schedule(gaps=iter([0.5]))
+    schedule.advance()
+    assert schedule.offset == 0.5
+    assert not schedule.exhausted
+    schedule.advance()
+    assert schedule.exhausted
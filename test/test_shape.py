@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from suhteita.shape import LoadShape, Stage, load_shape, parse_stages
+
+STAGES = {
+    'stages': [
+        {'name': 'ramp-up', 'duration_secs': 10, 'users': 50},
+        {'name': 'plateau', 'duration_secs': 20, 'users': 50},
+        {'name': 'spike', 'duration_secs': 5, 'users': 200, 'ramp': False},
+        {'name': 'ramp-down', 'duration_secs': 10, 'users': 0},
+    ]
+}
+
+
+def test_parse_stages():
+    shape = parse_stages(STAGES)
+    assert shape.kind == 'users'
+    assert shape.total_secs == 45
+    assert shape.peak() == 200
+    assert shape.stages[2] == Stage('spike', 5.0, 200.0, False)
+    assert shape.as_dict() == parse_stages(shape.as_dict()).as_dict()
+
+
+def test_load_shape_levels():
+    shape = parse_stages(STAGES)
+    assert shape.at(0) == ('ramp-up', 0)
+    assert shape.at(5) == ('ramp-up', 25)
+    assert shape.at(15) == ('plateau', 50)
+    assert shape.at(31) == ('spike', 200)
+    assert shape.at(40) == ('ramp-down', 100)
+    assert shape.at(99) == ('ramp-down', 0)
+
+
+def test_load_shape_rate_gaps():
+    shape = LoadShape([Stage('idle', 1, 0, False), Stage('steady', 1, 10, False)], kind='rate')
+    gaps = list(shape.gaps())
+    assert gaps[0] == pytest.approx(1.1)
+    assert gaps[1:] == pytest.approx([0.1] * 8)
+
+
+def test_load_shape_rate_ramp_arrivals():
+    shape = LoadShape([Stage('ramp-up', 300, 50), Stage('hold', 60, 50, False)], kind='rate')
+    offsets, elapsed = [], 0.0
+    for gap in shape.gaps():
+        elapsed += gap
+        offsets.append(elapsed)
+    assert offsets[0] == pytest.approx(12**0.5)  # The cumulative rate of the ramp is t * t / 12
+    assert sum(1 for offset in offsets if offset <= 60 + 1e-9) == pytest.approx(300, abs=1)
+    assert len(offsets) == pytest.approx(10_500, abs=1)
+    ramp_down = LoadShape([Stage('steady', 10, 10, False), Stage('ramp-down', 10, 0)], kind='rate')
+    assert len(list(ramp_down.gaps())) == pytest.approx(150, abs=1)
+
+
+def test_load_shape_files(tmp_path):
+    toml_path = tmp_path / 'shape.toml'
+    toml_path.write_text('[[stages]]\nname = "steady"\nduration_secs = 60\nrate = 2.5\n', encoding='utf-8')
+    assert load_shape(toml_path).as_dict() == {
+        'stages': [{'name': 'steady', 'duration_secs': 60.0, 'rate': 2.5, 'ramp': True}]
+    }
+    json_path = tmp_path / 'shape.json'
+    json_path.write_text(json.dumps(STAGES), encoding='utf-8')
+    assert load_shape(json_path).peak() == 200
+
+
+def test_parse_stages_sad():
+    with pytest.raises(ValueError, match='at least one stage'):
+        parse_stages({})
+    with pytest.raises(ValueError, match='exactly one target'):
+        parse_stages({'stages': [{'duration_secs': 1, 'users': 1, 'rate': 1}]})
+    with pytest.raises(ValueError, match='positive duration_secs'):
+        parse_stages({'stages': [{'users': 1}]})
+    with pytest.raises(ValueError, match='cannot mix'):
+        parse_stages({'stages': [{'duration_secs': 1, 'users': 1}, {'duration_secs': 1, 'rate': 1}]})
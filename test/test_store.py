@@ -1,6 +1,14 @@
 import datetime as dti
+import gzip
+import json
+import threading
 
-from suhteita.store import Store
+import pytest
+
+import suhteita.store as store_module
+from suhteita.clock import Clocking, ns_of
+import suhteita.database as database
+from suhteita.store import JsonLinesStore, SqliteStore, Store, is_later_segment, load_store, open_store, run_events
 
 
 def test_store_class():
@@ -19,5 +27,339 @@ def test_store_class():
     store = Store(context=context, setup=Setup(), folder_path='/tmp/away')
     assert store.db
     tx = dti.datetime.now(tz=dti.timezone.utc)
-    store.add('x', True, (str(tx), 42.0, str(tx)), 'yes')
+    store.add('x', True, Clocking(ns_of(tx), 2_300_000_000, ns_of(tx) + 2_300_000_000), 'yes')
+    assert store.db['events'][0]['start_ts'] == ns_of(tx)
+    assert store.db['events'][0]['duration_usecs'] == 2_300_000
     store.dump(tx, has_failures=True)
+    with open(store.store / store.db_name, 'rt', encoding='utf-8') as handle:
+        event = json.load(handle)['events'][0]
+    assert event['start_ts'] == tx.strftime('%Y-%m-%d %H:%M:%S.%f UTC')
+    assert event['end_ts'] == (tx + dti.timedelta(seconds=2.3)).strftime('%Y-%m-%d %H:%M:%S.%f UTC')
+
+
+def test_store_recorder():
+    context = {
+        'target': 'target',
+        'mode': 'mode',
+        'project': 'project',
+        'scenario': 'scenario',
+        'identity': 'identity',
+        'users': 2,
+        'start_time': dti.datetime.now(tz=dti.timezone.utc),
+    }
+
+    class Setup:
+        pass
+
+    store = Store(context=context, setup=Setup(), folder_path='/tmp/away')
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    clk = Clocking(tx, 42_000, tx + 42_000)
+    wun, two = store.recorder(user='u0001'), store.recorder(user='u0002')
+    wun.add('x', True, clk)
+    two.add('x', True, clk)
+    wun.add('y', False, clk)
+    assert [(e['user'], e['rank']) for e in store.db['events']] == [('u0001', 1), ('u0002', 1), ('u0001', 2)]
+    assert store.db['_meta']['users'] == 2
+    assert wun.user == 'u0001'
+
+    stages = iter(['ramp-up', 'plateau'])
+    again = store.recorder(user='u0001', iteration=2, stage=lambda: next(stages))
+    again.add('x', True, clk)
+    again.add('y', True, clk)
+    assert [(e['rank'], e['stage']) for e in store.db['events'][3:]] == [(1, 'ramp-up'), (2, 'plateau')]
+    assert again.user == 'u0001-2'
+
+
+def test_store_recorder_corrects_coordinated_omission():
+    context = {
+        'target': 'target',
+        'mode': 'mode',
+        'project': 'project',
+        'scenario': 'scenario',
+        'identity': 'identity',
+        'start_time': dti.datetime.now(tz=dti.timezone.utc),
+    }
+
+    class Setup:
+        pass
+
+    class Pacer:
+        def __init__(self, intended):
+            self.due = intended
+            self.waits = 0
+
+        def intended(self):
+            return self.due
+
+        def advance(self):
+            self.due += dti.timedelta(seconds=1)
+
+        def wait(self):
+            self.waits += 1
+
+    store = Store(context=context, setup=Setup(), folder_path='/tmp/away')
+    t0 = dti.datetime(2023, 6, 18, 12, 0, 0, tzinfo=dti.timezone.utc)
+    start, end = t0 + dti.timedelta(seconds=20), t0 + dti.timedelta(seconds=21, microseconds=500_000)
+    clk = Clocking(ns_of(start), 1_500_000_000, ns_of(end))
+
+    store.recorder(lag=dti.timedelta(seconds=2), user='u0001').add('x', True, clk)
+    pacer = Pacer(t0)
+    paced = store.recorder(pacer=pacer, user='u0002')
+    paced.add('x', True, clk)
+    paced.add('y', True, clk)
+    lagged, first, second = store.db['events']
+    assert lagged['corrected_usecs'] == 3_500_000
+    assert lagged['intended_ts'] == ns_of(t0 + dti.timedelta(seconds=18))
+    assert first['corrected_usecs'] == 21_500_000
+    assert first['scheduled_ts'] == first['intended_ts'] == ns_of(t0)
+    assert second['corrected_usecs'] == 20_500_000
+    assert pacer.waits == 2
+
+
+def jsonl_setup(fsync_every=0, writer_queue=0, compression=''):
+    class Setup:
+        pass
+
+    setup = Setup()
+    setup.store_format, setup.fsync_every, setup.writer_queue = 'jsonl', fsync_every, writer_queue
+    setup.compression = compression
+    return setup
+
+
+def test_jsonl_store_streams_events(tmp_path, monkeypatch):
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    syncs = []
+    monkeypatch.setattr(store_module.os, 'fsync', syncs.append)
+    store = open_store(context=context, setup=jsonl_setup(fsync_every=2), folder_path=tmp_path)
+    assert isinstance(store, JsonLinesStore)
+    assert store.db_name.endswith('.jsonl')
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    recorder = store.recorder(user='u0001')
+    for label, ok in (('x', True), ('y', False), ('z', True)):
+        recorder.add(label, ok, Clocking(tx, 42_000, tx + 42_000))
+    assert store.db['events'] == []
+    assert len(syncs) == 1
+    lines = (tmp_path / store.db_name).read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 4
+    assert json.loads(lines[1])['start_ts'] == Clocking(tx, 0, tx).start_ts()
+
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    assert len(syncs) == 2
+    trailer = json.loads((tmp_path / store.db_name).read_text(encoding='utf-8').splitlines()[-1])['_trailer']
+    assert trailer['event_count'] == 3
+    assert trailer['has_failures_detected'] is True
+    assert {label: data['count'] for label, data in trailer['histograms'].items()} == {'x': 1, 'y': 1, 'z': 1}
+    db = load_store(tmp_path / store.db_name)
+    assert [event['label'] for event in db['events']] == ['x', 'y', 'z']
+    assert db['_meta']['event_count'] == 3
+    assert 'recovered' not in db['_meta']
+
+
+def test_load_store_recovers_torn_jsonl(tmp_path):
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    store = open_store(context=context, setup=jsonl_setup(), folder_path=tmp_path)
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    store.add('x', True, Clocking(tx, 2_000_000_000, tx + 2_000_000_000))
+    store.add('y', False, Clocking(tx, 42_000, tx + 42_000))
+    store.handle.write('{"rank": 3, "label": "z", "o')  # Killed in the middle of writing an event
+    store.handle.close()
+    db = load_store(tmp_path / store.db_name)
+    assert [event['label'] for event in db['events']] == ['x', 'y']
+    assert db['_meta']['recovered'] is True
+    assert db['_meta']['histograms']['x']['max'] == 2_000_000
+    assert db['_meta']['has_failures_detected'] is True
+    assert db['_meta']['total_secs'] >= 2
+
+
+def test_store_compressed_json(tmp_path):
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    setup = jsonl_setup(compression='gzip')
+    setup.store_format = 'json'
+    store = open_store(context=context, setup=setup, folder_path=tmp_path)
+    assert store.db_name.endswith('.json.gz')
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    for rank in range(100):
+        store.add('x', True, Clocking(tx, 42_000, tx + 42_000))
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    with gzip.open(tmp_path / store.db_name, 'rt', encoding='utf-8') as handle:
+        assert len(json.load(handle)['events']) == 100
+    db = load_store(tmp_path / store.db_name)
+    assert [event['label'] for event in db['events']] == ['x'] * 100
+    assert db['_meta']['event_count'] == 100
+
+
+def test_jsonl_store_compressed_recovers_killed_run(tmp_path, monkeypatch):
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    syncs = []
+    monkeypatch.setattr(store_module.os, 'fsync', syncs.append)
+    store = open_store(context=context, setup=jsonl_setup(fsync_every=2, compression='gzip'), folder_path=tmp_path)
+    assert store.db_name.endswith('.jsonl.gz')
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    for label in ('x', 'y', 'z'):
+        store.add(label, True, Clocking(tx, 42_000, tx + 42_000))
+    assert len(syncs) == 1  # Killed now - the compressor was flushed at the sync only
+    db = load_store(tmp_path / store.db_name)
+    assert [event['label'] for event in db['events']] == ['x', 'y']
+    assert db['_meta']['recovered'] is True
+
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    db = load_store(tmp_path / store.db_name)
+    assert [event['label'] for event in db['events']] == ['x', 'y', 'z']
+    assert 'recovered' not in db['_meta']
+
+
+def test_jsonl_store_rolls_over_by_events(tmp_path):
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    setup = jsonl_setup(compression='gzip')
+    setup.segment_events = 2
+    store = open_store(context=context, setup=setup, folder_path=tmp_path)
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    for label in 'vwxyz':
+        store.add(label, label != 'x', Clocking(tx, 42_000, tx + 42_000))
+    names = [store.segment_name(segment) for segment in range(3)]
+    assert names[1].endswith('.0001.jsonl.gz')
+    assert [is_later_segment(name) for name in names] == [False, True, True]
+    live = [event['label'] for event in run_events(tmp_path / store.db_name)]
+    assert live == list('vwxy')  # The compressor of the open segment holds z until the sync
+    assert load_store(tmp_path / store.db_name)['_meta']['recovered'] is True  # Analyzed while still running
+
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    assert sorted(path.name for path in tmp_path.glob('*.gz')) == sorted(names)
+    db = load_store(tmp_path / store.db_name)
+    assert [event['label'] for event in db['events']] == list('vwxyz')
+    assert db['_meta']['run_id'] == store.db_name
+    assert db['_meta']['segments'] == 3
+    assert db['_meta']['has_failures_detected'] is True
+    assert 'recovered' not in db['_meta']
+    with gzip.open(tmp_path / names[2], 'rt', encoding='utf-8') as handle:
+        header = json.loads(handle.readline())['_meta']
+    assert (header['run_id'], header['segment']) == (store.db_name, 2)
+    assert [event['label'] for event in load_store(tmp_path / names[1])['events']] == list('xyz')
+
+
+def test_jsonl_store_rolls_over_by_bytes_and_time(tmp_path, monkeypatch):
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    setup = jsonl_setup()
+    setup.segment_bytes = 1
+    store = open_store(context=context, setup=setup, folder_path=tmp_path)
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    store.add('x', True, Clocking(tx, 42_000, tx + 42_000))
+    assert store.segment == 0  # Rolls over only when the next event arrives
+    store.add('y', True, Clocking(tx, 42_000, tx + 42_000))
+    assert store.segment == 1
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+
+    now = [0.0]
+    monkeypatch.setattr(store_module.time, 'monotonic', lambda: now[0])
+    setup = jsonl_setup()
+    setup.segment_secs = 60
+    store = open_store(context={**context, 'identity': 'other'}, setup=setup, folder_path=tmp_path)
+    store.add('x', True, Clocking(tx, 42_000, tx + 42_000))
+    now[0] = 61.0
+    store.add('y', True, Clocking(tx, 42_000, tx + 42_000))
+    store.add('z', True, Clocking(tx, 42_000, tx + 42_000))
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    assert store.segment == 1
+    assert load_store(tmp_path / store.db_name)['_meta']['segments'] == 2
+
+
+def test_store_compression_sad():
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    with pytest.raises(ValueError, match=r'compression \(brotli\) is not one of'):
+        Store(context=context, setup=jsonl_setup(compression='brotli'), folder_path='/tmp/away')
+
+
+def test_jsonl_store_writer_thread(tmp_path):
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    store = open_store(context=context, setup=jsonl_setup(writer_queue=100), folder_path=tmp_path)
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    for rank in range(250):
+        store.add('x', True, Clocking(tx, 42_000, tx + 42_000))
+    assert store.writer.is_alive()
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    assert store.writer is None
+    store.add('late', True, Clocking(tx, 42_000, tx + 42_000))
+    db = load_store(tmp_path / store.db_name)
+    assert len(db['events']) == db['_meta']['event_count'] == 250
+    assert db['_meta']['dropped_events'] == 0
+    assert store.dropped_events == 1
+
+
+def test_jsonl_store_writer_drops_when_full(tmp_path, monkeypatch):
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    monkeypatch.setattr(store_module, 'WRITER_BLOCK_SECS', 0.01)
+    store = open_store(context=context, setup=jsonl_setup(writer_queue=2), folder_path=tmp_path)
+    blocked = threading.Event()
+    emit_batch = store.emit_batch
+    monkeypatch.setattr(store, 'emit_batch', lambda events: blocked.wait() and emit_batch(events))
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    for rank in range(5):
+        store.add('x', rank != 4, Clocking(tx, 42_000, tx + 42_000))
+    blocked.set()
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    db = load_store(tmp_path / store.db_name)
+    assert 0 < db['_meta']['dropped_events'] <= 3
+    assert len(db['events']) == db['_meta']['event_count'] == 5 - db['_meta']['dropped_events']
+    assert db['_meta']['has_failures_detected'] is True
+
+
+def test_jsonl_store_writer_failure_does_not_block(tmp_path, monkeypatch):
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    monkeypatch.setattr(store_module, 'WRITER_BLOCK_SECS', 0.01)
+    store = open_store(context=context, setup=jsonl_setup(writer_queue=2), folder_path=tmp_path)
+
+    def fail(events):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(store, 'emit_batch', fail)
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    for rank in range(20):
+        store.add('x', True, Clocking(tx, 42_000, tx + 42_000))
+    store.writer.join(timeout=1)
+    assert isinstance(store.writer_error, OSError)
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+    db = load_store(tmp_path / store.db_name)
+    assert (db['_meta']['event_count'], db['_meta']['dropped_events']) == (0, 20)
+    assert db['_meta']['has_failures_declared'] is True
+
+
+def test_sqlite_store_inserts_batches(tmp_path, monkeypatch):
+    context = {'identity': 'identity', 'target': 'target', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    setup = jsonl_setup()
+    setup.store_format = 'sqlite'
+    monkeypatch.setattr(SqliteStore, 'batch_size', 2)
+    store = open_store(context=context, setup=setup, folder_path=tmp_path)
+    assert isinstance(store, SqliteStore)
+    tx = ns_of(dti.datetime.now(tz=dti.timezone.utc))
+    for label, ok in (('x', True), ('y', False), ('x', True)):
+        store.add(label, ok, Clocking(tx, 42_000, tx + 42_000))
+    assert store.db['events'] == []
+    assert len(store.pending) == 1
+    store.dump(dti.datetime.now(tz=dti.timezone.utc))
+
+    connection = database.connect(tmp_path / database.DATABASE_NAME)
+    assert database.labels(connection, target='target') == ['x', 'y']
+    assert database.percentiles(connection, 'x', points=(50,)) == {'p50': 42}
+    run = connection.execute('SELECT db_name, has_failures_detected, start_ns FROM runs').fetchone()
+    assert run[:2] == (store.db_name, 1)
+    assert run[2] <= tx
+    connection.close()
+
+
+def test_open_store_sad():
+    class Setup:
+        store_format = 'nope'
+
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    with pytest.raises(ValueError, match=r'store format \(nope\) is not one of'):
+        open_store(context=context, setup=Setup(), folder_path='/tmp/away')
+
+
+def test_streaming_store_requires_emit_batch_and_finish(tmp_path):
+    class Incomplete(store_module.StreamingStore):
+        def finish(self):
+            pass
+
+    context = {'identity': 'identity', 'start_time': dti.datetime.now(tz=dti.timezone.utc)}
+    with pytest.raises(TypeError, match='emit_batch'):
+        Incomplete(context=context, setup=jsonl_setup(), folder_path=tmp_path)
@@ -1,5 +1,14 @@
+import types
+
+import pytest
+
 import suhteita.cli as cli
+import suhteita.issue_pool as issue_pool
 import suhteita.suhteita as run
+from suhteita import extract_fields
+from suhteita.clock import Clocking
+from suhteita.scenario import load_definition
+from suhteita.store import CATALOG_NAME, load_store
 
 
 def test_two_sentences():
@@ -21,10 +30,54 @@ def test_two_sentences_default():
 def test_extract_fields():
     fields = ('a', 'b')
     expectation = {field: 'x' for field in fields}
-    assert expectation == run.extract_fields(expectation, fields)
+    assert expectation == extract_fields(expectation, fields)
 
 
 def test_setup_twenty_seven():
     options = cli.parse_request([])
     cfg = run.setup_twenty_seven(options)
     assert cfg.duplicate_labels == ['du', 'pli', 'ca', 'te']
+    assert (cfg.jql_fields, cfg.load_fields) == ('*all', '*all')
+    assert cfg.projects_ttl_secs == 86_400.0
+    assert run.setup_twenty_seven(cli.parse_request(['--projects-ttl-secs', '0'])).projects_ttl_secs == 0.0
+
+
+def test_setup_twenty_seven_lean_reads():
+    cfg = run.setup_twenty_seven(cli.parse_request(['--lean-reads']))
+    assert (cfg.jql_fields, cfg.load_fields) == ('description', 'summary,status')
+
+
+def test_seed_binds_pooled_keys():
+    cfg = run.setup_twenty_seven(cli.parse_request(['--users', '2']))
+    store = types.SimpleNamespace(user='1')
+    assert issue_pool.POOLED_KEY not in run.seed_twenty_seven(cfg, store)
+    cfg.pooled_keys = ['P-1', 'P-2']
+    picked = [run.seed_twenty_seven(cfg, store)[issue_pool.POOLED_KEY] for _ in range(4)]
+    assert sorted(picked) == ['P-1', 'P-1', 'P-2', 'P-2']
+
+
+def test_provision_issue_pool_required_by_reader():
+    cfg = run.setup_twenty_seven(cli.parse_request([]))
+    assert run.provision_issue_pool(cfg, load_definition()) is True
+    assert run.provision_issue_pool(cfg, load_definition('reader')) is False
+    assert cfg.pooled_keys == []
+
+
+def test_interrupt():
+    with pytest.raises(KeyboardInterrupt, match=r'signal \(15\)'):
+        run.interrupt(15, None)
+
+
+def test_main_dumps_the_records_of_a_failed_execution(tmp_path, monkeypatch):
+    def dispatch(scenario, cfg, store, users, backend):
+        store.add('LOGIN', True, Clocking(0, 1_000, 1_000))
+        return 1, True
+
+    monkeypatch.setattr(run, 'TOKEN', 'secret')
+    monkeypatch.setattr(run.engine, 'dispatch', dispatch)
+    options = cli.parse_request(['--out-path', str(tmp_path), '--store-format', 'jsonl'])
+    assert run.main(options) == 1
+    (path,) = [path for path in tmp_path.glob('*.jsonl') if path.name != CATALOG_NAME]
+    data = load_store(path)
+    assert [event['label'] for event in data['events']] == ['LOGIN']
+    assert data['_meta']['has_failures_declared'] is True
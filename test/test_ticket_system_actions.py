@@ -1,15 +1,25 @@
 import pytest
+from requests import HTTPError
 
+import suhteita
+import suhteita.pool as pool
 import suhteita.ticket_system_actions as actions
+import suhteita.transitions as transitions
 from suhteita import extract_fields
 
 
+class Gone:
+    status_code = 404
+
+
 class Arij(dict):
     def factory(self, url='target_url', username='user', password='password', cloud=False):
         self['fake'] = 'yes'
 
-    def __init__(self, url='target_url', username='user', password='password', cloud=False):
+    def __init__(self, url='target_url', username='user', password='password', cloud=False, session=None):
         self.factory(url, username, password, cloud)
+        self.url = url
+        self.session = session
 
     def get_server_info(self, foo: bool):
         return {'everything': 'fine', 'foo': foo}
@@ -20,6 +30,12 @@ class Arij(dict):
         else:
             return [{'key': 'this'}, {'key': 'that'}, {'key': 'attic'}]
 
+    def get_project(self, key, expand=None):
+        self['project_requests'] = self.get('project_requests', 0) + 1
+        if key == 'GONE':
+            raise HTTPError('No project could be found with key GONE.', response=Gone())
+        return {'key': key}
+
     def issue_create(self, fields):
         project = fields['project']['key']
         return {'key': f'{project}-42' if project else ''}
@@ -27,11 +43,11 @@ class Arij(dict):
     def issue_exists(self, key: str):
         return bool(key)
 
-    def issue(self, key: str):
-        return {'key': key}
+    def issue(self, key: str, fields='*all', expand=None):
+        return {'key': key, 'fields': fields, 'expand': expand}
 
-    def jql(self, query: str):
-        return {'issues': [{'key': 'FOO-42'}]}
+    def jql(self, query: str, fields='*all', expand=None):
+        return {'issues': [{'key': 'FOO-42', 'fields': fields}]}
 
     def issue_add_comment(self, key: str, comment: str):
         return {'key': key, 'body': comment}
@@ -59,6 +75,16 @@ class Arij(dict):
     def set_issue_status(self, issue_key, status):
         return None
 
+    def get_issue_transitions(self, issue_key):
+        self['lookups'] = self.get('lookups', 0) + 1
+        return [{'name': 'Start', 'id': 21, 'to': 'In Progress'}]
+
+    def set_issue_status_by_transition_id(self, issue_key, transition_id):
+        if transition_id == 666:
+            raise HTTPError('Transition id 666 is not valid for this issue.')
+        self['posted'] = transition_id
+        return None
+
 
 def test_login():
     actions.Jira = Arij
@@ -91,6 +117,32 @@ def test_get_all_projects():
     assert projects[1]['key'] == 'that'
 
 
+def test_project_exists(project_catalog):
+    actions.Jira = Arij
+    _, service = actions.login(target_url='target_url', user='user')
+    tally = pool.track()
+    clk, exists = actions.project_exists(service, 'THIS')
+    assert len(clk) == 3
+    assert (exists, service['project_requests'], tally.suffix) == (True, 1, '')
+    tally = pool.track()
+    assert actions.project_exists(service, 'THIS')[1] is True
+    assert (service['project_requests'], tally.suffix) == (1, '_CACHED')  # Answered from the catalog
+    assert actions.project_exists(service, 'THIS', ttl_secs=0)[1] is True
+    assert service['project_requests'] == 2
+    assert actions.project_exists(service, 'GONE')[1] is False
+    assert sorted(project_catalog.read_catalog()['target_url']) == ['THIS']
+
+
+def test_get_all_projects_refreshes_catalog(project_catalog):
+    actions.Jira = Arij
+    _, service = actions.login(target_url='target_url', user='user')
+    project_catalog.update('target_url', found=['GONE'])
+    actions.get_all_projects(service)
+    assert sorted(project_catalog.read_catalog()['target_url']) == ['that', 'this']
+    assert actions.project_exists(service, 'that')[1] is True
+    assert 'project_requests' not in service
+
+
 def test_create_issue():
     actions.Jira = Arij
     _, service = actions.login(target_url='target_url', user='user')
@@ -136,6 +188,17 @@ def test_execute_jql():
     assert results['issues'][0]['key'] == 'FOO-42'
 
 
+def test_projected_reads():
+    actions.Jira = Arij
+    _, service = actions.login(target_url='target_url', user='user')
+    _, issue = actions.load_issue(service, 'QUUX-1')
+    assert (issue['fields'], issue['expand']) == ('*all', None)
+    _, issue = actions.load_issue(service, 'QUUX-1', fields='status', expand='names')
+    assert (issue['fields'], issue['expand']) == ('status', 'names')
+    _, results = actions.execute_jql(service, 'key = FOO-42', fields='description')
+    assert results['issues'][0]['fields'] == 'description'
+
+
 def test_add_comment():
     actions.Jira = Arij
     _, service = actions.login(target_url='target_url', user='user')
@@ -242,3 +305,48 @@ def test_set_issue_status():
     assert int(clk[1]) >= 0
     assert clk[0] <= clk[2]
     assert response is None
+
+
+def test_set_issue_status_cached_transitions():
+    transitions.clear()
+    actions.Jira = Arij
+    _, service = actions.login(target_url='target_url', user='user')
+    tally = pool.track()
+    actions.get_issue_status(service, 'BAR-42')
+    actions.set_issue_status(service, issue_key='BAR-42', status='in progress')
+    assert [op[0] for op in tally.operations] == ['GET_ISSUE_TRANSITIONS']
+    assert transitions.TRANSITIONS == {('BAR', '', 'status-value'): {'in progress': 21}}
+    tally = pool.track()
+    actions.get_issue_status(service, 'BAR-43')
+    actions.set_issue_status(service, issue_key='BAR-43', status='In Progress')
+    assert (service['lookups'], service['posted'], tally.operations) == (1, 21, [])
+    assert transitions.key_of('BAR-43') == ('BAR', '', 'in progress')
+    transitions.clear()
+
+
+def test_set_issue_status_refreshes_rejected_transition():
+    transitions.clear()
+    actions.Jira = Arij
+    _, service = actions.login(target_url='target_url', user='user')
+    transitions.remember('BAR-42', 'To Do')
+    transitions.learn(('BAR', '', 'to do'), [{'id': 666, 'to': 'In Progress'}])
+    tally = pool.track()
+    clk, response = actions.set_issue_status(service, issue_key='BAR-42', status='In Progress')
+    assert (service['lookups'], service['posted'], len(tally.operations)) == (1, 21, 1)
+    assert transitions.lookup(('BAR', '', 'to do'), 'in progress') == 21
+    transitions.clear()
+
+
+def test_load_issue_zero_copy(monkeypatch):
+    actions.Jira = Arij
+    _, service = actions.login(target_url='target_url', user='user')
+    payload = {'key': 'BAR-42', 'fields': {'labels': ['a', 'b']}}
+    monkeypatch.setattr(service, 'issue', lambda key, **kwargs: payload, raising=False)
+    _, data = actions.load_issue(service, issue_key='BAR-42')
+    assert data is payload
+
+    monkeypatch.setattr(suhteita, 'COPY_RESPONSES', True)
+    _, data = actions.load_issue(service, issue_key='BAR-42')
+    assert data == payload
+    assert data is not payload
+    assert data['fields'] is not payload['fields']
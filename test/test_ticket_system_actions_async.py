@@ -0,0 +1,192 @@
+import json
+
+import httpx
+import pytest
+
+import suhteita.pool as pool
+import suhteita.ticket_system_actions_async as actions
+import suhteita.transitions as transitions
+from suhteita import extract_fields
+
+TRANSITIONS = {'transitions': [{'name': 'Start', 'id': '21', 'to': {'name': 'In Progress'}}]}
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    path, method = request.url.path, request.method
+    assert path.startswith('/rest/api/2/')
+    resource = path[len('/rest/api/2/') :]
+    payload = json.loads(request.content) if request.content else None
+    if resource == 'serverInfo':
+        return httpx.Response(200, json={'everything': 'fine', 'check': request.url.params['doHealthCheck']})
+    if resource == 'project':
+        return httpx.Response(200, json=[{'key': 'this'}, {'key': 'that'}])
+    if resource.startswith('project/'):
+        key = resource.split('/')[1]
+        if key == 'GONE':
+            return httpx.Response(404, json={'errorMessages': ['No project could be found with key GONE.']})
+        return httpx.Response(200, json={'key': key})
+    if resource == 'issue' and method == 'POST':
+        return httpx.Response(201, json={'key': f'{payload["fields"]["project"]["key"]}-42'})
+    if resource == 'search':
+        issue = {'key': request.url.params['jql'].split()[-1], 'fields': {'description': 'D'}}
+        if request.url.params['fields'] != 'description':
+            issue['fields'].update(summary='S', labels=['original'], comment={'comments': [], 'total': 0})
+        if 'expand' in request.url.params:
+            issue['expand'] = request.url.params['expand']
+        return httpx.Response(200, json={'issues': [issue]})
+    if resource == 'issueLink':
+        return httpx.Response(201)
+    if resource == 'component' and method == 'POST':
+        return httpx.Response(201, json={'id': '123', **payload})
+    if resource.startswith('component/') and method == 'GET':
+        return httpx.Response(200, json={'self': 'https://example.com/component/123', 'description': 'ABC'})
+    if resource.startswith('component/') and method == 'DELETE':
+        return httpx.Response(204)
+    if resource.endswith('/transitions') and method == 'GET':
+        return httpx.Response(200, json=TRANSITIONS)
+    if resource.endswith('/transitions') and method == 'POST':
+        if payload == {'transition': {'id': 666}}:
+            return httpx.Response(400, json={'errorMessages': ['Transition id 666 is not valid for this issue.']})
+        assert payload == {'transition': {'id': 21}}
+        return httpx.Response(204)
+    if resource.endswith('/comment'):
+        return httpx.Response(201, json={'self': 'https://example.com/comment/1', 'body': payload['body']})
+    key = resource.split('/')[1]
+    if key.startswith('MISSING'):
+        return httpx.Response(404, json={'errorMessages': ['Issue does not exist']})
+    if method == 'PUT':
+        return httpx.Response(400 if key == 'raise' else 204)
+    if request.url.params['fields'] == 'status':
+        return httpx.Response(200, json={'key': key, 'fields': {'status': {'name': 'To Do'}}})
+    return httpx.Response(200, json={'key': key, 'fields': {}})
+
+
+def service():
+    return actions.AsyncJira('https://example.com/', 'user', 'token', transport=httpx.MockTransport(handler))
+
+
+def assert_clocking(clk):
+    assert len(clk) == 3
+    assert int(clk[1]) >= 0
+    assert clk[0] <= clk[2]
+
+
+@pytest.mark.asyncio
+async def test_login():
+    clk, jira = await actions.login(target_url='https://example.com', user='user', password='token')
+    assert_clocking(clk)
+    assert isinstance(jira, actions.AsyncJira)
+    assert str(jira.client.base_url) == 'https://example.com/rest/api/2/'
+    await jira.close()
+
+
+@pytest.mark.asyncio
+async def test_reads():
+    jira = service()
+    clk, info = await actions.get_server_info(jira)
+    assert_clocking(clk)
+    assert info == {'everything': 'fine', 'check': 'true'}
+    clk, projects = await actions.get_all_projects(jira)
+    assert [project['key'] for project in projects] == ['this', 'that']
+    clk, exists = await actions.issue_exists(jira, 'FOO-1')
+    assert exists is True
+    clk, exists = await actions.issue_exists(jira, 'MISSING-1')
+    assert exists is False
+    clk, status = await actions.get_issue_status(jira, 'FOO-1')
+    assert status == 'To Do'
+    clk, issue = await actions.load_issue(jira, 'QUUX-1')
+    assert issue['key'] == 'QUUX-1'
+    clk, results = await actions.execute_jql(jira, 'issue = FOO-42')
+    assert_clocking(clk)
+    assert results['issues'][0]['key'] == 'FOO-42'
+    await jira.close()
+
+
+@pytest.mark.asyncio
+async def test_project_exists(project_catalog):
+    jira = service()
+    tally = pool.track()
+    clk, exists = await actions.project_exists(jira, 'THIS')
+    assert_clocking(clk)
+    assert (exists, tally.requests) == (True, 1)
+    assert tally.suffix == ''
+    tally = pool.track()
+    assert (await actions.project_exists(jira, 'THIS'))[1] is True
+    assert (tally.requests, tally.suffix) == (0, '_CACHED')  # Answered from the catalog
+    assert (await actions.project_exists(jira, 'GONE'))[1] is False
+    assert list(project_catalog.read_catalog()['https://example.com/']) == ['THIS']
+    await jira.close()
+
+
+@pytest.mark.asyncio
+async def test_writes():
+    jira = service()
+    clk, key = await actions.create_issue(jira, project='FOO', ts='so-what', description='nothing')
+    assert_clocking(clk)
+    assert key == 'FOO-42'
+    ctx = {'issues': [{'fields': {'description': 'D'}}]}
+    assert_clocking(await actions.amend_issue_description(jira, 'FOO-42', amendment='A', issue_context=ctx))
+    assert_clocking(await actions.update_issue_field(jira, 'FOO-42', labels=['yes']))
+    clk, response = await actions.add_comment(jira, 'FOO-42', 'no-comment')
+    assert extract_fields(response, fields=['body']) == {'body': 'no-comment'}
+    clk, response = await actions.create_duplicates_issue_link(jira, 'FOO-43', 'FOO-42')
+    assert response is None
+    clk, response = await actions.set_issue_status(jira, 'FOO-42', 'in progress')
+    assert response is None
+    await jira.close()
+
+
+@pytest.mark.asyncio
+async def test_projected_reads_count_response_bytes():
+    jira = service()
+    tally = pool.track()
+    clk, full = await actions.execute_jql(jira, 'issue = FOO-42')
+    full_bytes = tally.tags()['response_bytes']
+    tally = pool.track()
+    clk, lean = await actions.execute_jql(jira, 'issue = FOO-42', fields='description', expand='names')
+    assert lean['issues'][0] == {'key': 'FOO-42', 'fields': {'description': 'D'}, 'expand': 'names'}
+    assert 0 < tally.tags()['response_bytes'] < full_bytes
+    await jira.close()
+
+
+@pytest.mark.asyncio
+async def test_set_issue_status_cached_transitions():
+    transitions.clear()
+    jira = service()
+    tally = pool.track()
+    await actions.get_issue_status(jira, 'FOO-42')
+    await actions.set_issue_status(jira, 'FOO-42', 'In Progress')
+    assert [op[0] for op in tally.operations] == ['GET_ISSUE_TRANSITIONS']
+    tally = pool.track()
+    await actions.get_issue_status(jira, 'FOO-43')
+    clk, response = await actions.set_issue_status(jira, 'FOO-43', 'In Progress')
+    assert_clocking(clk)
+    assert (tally.requests, tally.operations) == (2, [])  # Status and transition - no lookup
+    transitions.remember('FOO-44', 'To Do')
+    transitions.learn(('FOO', '', 'to do'), [{'id': 666, 'to': 'In Progress'}])
+    tally = pool.track()
+    await actions.set_issue_status(jira, 'FOO-44', 'In Progress')  # Rejected, looked up, and posted again
+    assert (tally.requests, len(tally.operations)) == (1, 1)
+    assert transitions.lookup(('FOO', '', 'to do'), 'In Progress') == 21
+    await jira.close()
+    transitions.clear()
+
+
+@pytest.mark.asyncio
+async def test_sad_writes():
+    jira = service()
+    clk, ok = await actions.set_original_estimate(jira, 'FOO-42', hours=42)
+    assert ok
+    clk, ok = await actions.set_original_estimate(jira, 'raise', hours=-1)
+    assert_clocking(clk)
+    assert not ok
+    tally = pool.track()
+    clk, comp_id, name, response = await actions.create_component(jira, project='X', name='Y', description='Z')
+    assert (comp_id, name, response['description']) == ('123', 'Y', 'ABC')
+    assert tally.requests == 1  # The follow-up read of the component stays out of the tally
+    clk, ok = await actions.relate_issue_to_component(jira, 'FOO-42', comp_id='123', comp_name='Y')
+    assert ok
+    clk, ok = await actions.relate_issue_to_component(jira, 'raise', comp_id='123', comp_name='Y')
+    assert_clocking(clk)
+    assert not ok
+    await jira.close()